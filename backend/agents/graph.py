@@ -15,6 +15,7 @@ from .state import AgentState
 from .supervisor import supervisor_node
 from .subagents.interviewer import interviewer_node
 from .subagents.chat import chat_node
+from .speculation import SpeculativeStream, SPECULATIVE_INTENT
 
 # LangSmith 追踪
 try:
@@ -161,17 +162,59 @@ def get_interview_graph() -> StateGraph:
     return _graph_instance
 
 
+def _start_speculative_stream(
+    session_id: str,
+    user_input: str,
+    input_type: str,
+    resume_text: str | None,
+    jd_text: str | None,
+    current_question: str | None,
+    message_context: dict | None,
+    context_summary: str | None
+) -> SpeculativeStream | None:
+    """
+    判断是否需要投机执行，需要时预启动 interview_chat 流
+
+    只有会走到 Supervisor LLM 的文本消息才值得投机：
+    音频、面试中的回答、带消息上下文的请求，以及本地路由可以直接判定的输入都跳过。
+    """
+    from config import settings
+    from .intent_router import intent_router
+    from .subagents.chat import chat_subagent
+
+    if not settings.speculative_chat_enabled:
+        return None
+    if input_type != "text" or not user_input or current_question or message_context:
+        return None
+    if intent_router.route(user_input) is not None:
+        return None
+
+    generator = chat_subagent.get_stream_generator({
+        "session_id": session_id,
+        "user_input": user_input,
+        "resume_text": resume_text or "",
+        "jd_text": jd_text or "",
+        "intent": SPECULATIVE_INTENT,
+        "context_summary": context_summary
+    })
+    return SpeculativeStream(generator, intent=SPECULATIVE_INTENT)
+
+
 async def process_message(
     session_id: str,
     user_input: str,
     input_type: str = "text",
-    audio_data: str | None = None,
+    audio_data: bytes | bytearray | None = None,
+    audio_key: str | None = None,
+    audio_content_hash: str | None = None,
+    asr_use_cache: bool = True,
     resume_text: str | None = None,
     jd_text: str | None = None,
     practice_questions: list | None = None,
     project_id: str | None = None,
     current_question: str | None = None,
-    message_context: dict | None = None  # 消息上下文（用于逐字稿修改）
+    message_context: dict | None = None,  # 消息上下文（用于逐字稿修改）
+    transcript: str | None = None  # 实时识别得到的转写文本
 ) -> dict:
     """
     处理用户消息的便捷函数
@@ -180,25 +223,37 @@ async def process_message(
         session_id: 会话ID
         user_input: 用户输入
         input_type: 输入类型 (text/audio/command)
-        audio_data: Base64编码的音频数据
+        audio_data: 原始音频字节（登记到注册表，state 中只保存引用）
+        audio_key: 浏览器已直传到 OSS 的音频 key（提供时不再经过本服务中转音频）
+        audio_content_hash: 浏览器计算的直传音频 SHA-256（校验一致后用于结果缓存和去重）
+        asr_use_cache: 是否复用相同录音的转写结果（False 时强制重新转写）
         resume_text: 简历文本
         jd_text: 职位描述
         practice_questions: 练习问题列表
         project_id: 项目ID
         current_question: 当前练习的问题
         message_context: 消息上下文，包含 question, original_transcript, asset_id
+        transcript: 实时识别已完成的转写文本（提供时跳过批量 ASR）
 
     Returns:
         处理结果字典，包含response_text, response_type, response_metadata等
     """
     from services.context_manager import context_manager
+    from services.audio_upload import register_audio, discard_audio
 
     graph = get_interview_graph()
 
-    # 获取历史消息和摘要
-    history = context_manager.get_history(session_id)
+    # 音频字节不进入 state，避免在节点之间复制大对象
+    audio_ref = register_audio(audio_data) if audio_data else None
+
+    # 获取历史消息和摘要（缓存被淘汰时从数据库重新加载）
+    await context_manager.load_session(session_id)
+    history = list(context_manager.get_history(session_id))
     context_summary = context_manager.get_summary(session_id)
 
+    # 先把本轮用户消息写入历史，投机流和图内节点看到的是同一份上下文
+    await context_manager.add_message(session_id, "user", user_input, timestamp=datetime.now().strftime("%m-%d %H:%M"))
+
     # 构建输入状态
     # 如果有消息上下文，提取其中的问题和原始逐字稿
     context_question = message_context.get("question") if message_context else None
@@ -216,8 +271,11 @@ async def process_message(
         "input_type": input_type,
         "current_mode": "idle",
         "current_question": current_question,
-        "audio_data": audio_data,
-        "transcript": None,
+        "audio_ref": audio_ref,
+        "audio_key": audio_key,
+        "audio_content_hash": audio_content_hash,
+        "asr_use_cache": asr_use_cache,
+        "transcript": transcript,
         "feedback": None,
         "next_agent": "supervisor",
         "response_text": None,
@@ -246,13 +304,26 @@ async def process_message(
             "project_id": project_id,
             "input_type": input_type,
             "user_input_preview": user_input[:100] if user_input else "",
-            "has_audio": audio_data is not None,
+            "has_audio": audio_data is not None or audio_key is not None,
+            "realtime_asr": transcript is not None,
             "history_count": len(history)
         },
         "run_id": run_id,
         "run_name": f"interview_session_{session_id[:8]}"
     }
 
+    # 投机执行：需要 LLM 路由的文本消息，同时预启动最可能的对话流
+    speculative = _start_speculative_stream(
+        session_id=session_id,
+        user_input=user_input,
+        input_type=input_type,
+        resume_text=resume_text,
+        jd_text=jd_text,
+        current_question=current_question,
+        message_context=message_context,
+        context_summary=context_summary
+    )
+
     # 执行图
     result = None
     langsmith_trace_id = None
@@ -285,6 +356,19 @@ async def process_message(
             "response_type": "error",
             "response_metadata": None
         }
+    finally:
+        discard_audio(audio_ref)
+        # 路由确认命中时保留投机流，否则取消
+        if speculative and not (
+            result
+            and result.get("stream_enabled")
+            and result.get("intent") == speculative.intent
+        ):
+            await speculative.cancel()
+            speculative = None
+
+    if speculative:
+        speculative.confirm()
 
     if result is None:
         return {
@@ -293,16 +377,18 @@ async def process_message(
             "response_metadata": None
         }
 
-    # 保存消息到历史
-    context_manager.add_message(session_id, "user", user_input, timestamp=datetime.now().strftime("%m-%d %H:%M"))
+    # 保存回复到历史（用户消息已在执行图之前写入）
     if result.get("response_text"):
-        context_manager.add_message(
+        await context_manager.add_message(
             session_id,
             "assistant",
             result["response_text"],
             result.get("response_type"),
             timestamp=datetime.now().strftime("%m-%d %H:%M")
         )
+    # 流式回复在输出完成后由 WebSocket 层写入历史并触发摘要
+    if not result.get("stream_enabled"):
+        context_manager.schedule_summary(session_id)
 
     # 调试：打印最终结果中的关键字段
     logger.info(f"process_message 最终结果: audio_file_id={result.get('audio_file_id')}, asset_id={result.get('asset_id')}, response_type={result.get('response_type')}")
@@ -324,10 +410,13 @@ async def process_message(
         "save_asset": result.get("save_asset", False),
         "intent": result.get("intent"),
         "extracted_question": result.get("extracted_question"),
+        "routing_tier": result.get("routing_tier"),
         "user_input": result.get("user_input"),
         "resume_text": result.get("resume_text"),
         "jd_text": result.get("jd_text"),
         "context_summary": result.get("context_summary"),
+        # 投机执行命中时的预启动流（由 WebSocket 层直接消费）
+        "speculative_stream": speculative,
         # 消息上下文相关字段（用于逐字稿修改）
         "original_transcript": result.get("original_transcript"),
         "context_question": result.get("context_question"),
@@ -0,0 +1,354 @@
+"""
+分层意图路由
+
+在调用 Supervisor LLM 之前先尝试本地判定：
+1. rules      - 预编译的关键词/正则规则，处理明确的请求（开始练习、优化简历、问候等）
+2. classifier - 可选的本地 TF-IDF + 线性模型，由 LLM 的历史路由决策训练得到
+3. llm        - 前两层置信度都不足时，才交给 Supervisor LLM
+
+每次决策都会记录命中的层级和耗时，用于衡量节省的路由延迟与调用成本。
+"""
+
+import json
+import logging
+import os
+import pickle
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Pattern
+
+from config import settings
+
+# 可选依赖：scikit-learn（本地分类器）
+try:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import Pipeline
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    SKLEARN_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 练习请求关键词（Interviewer 也使用）
+PRACTICE_KEYWORDS = ["练习", "模拟", "开始", "录音", "语音"]
+
+# 意图 → 目标 Agent
+INTENT_TO_AGENT = {
+    "voice_practice": "interviewer",
+    "answer_optimization": "chat",
+    "question_research": "chat",
+    "resume_optimization": "chat",
+    "script_writing": "chat",
+    "interview_chat": "chat",
+    "general": "end",
+}
+
+# 询问方法/技巧类的输入不走规则（交给分类器或 LLM 判断是否为 interview_chat）
+_NOT_ADVICE = r"(?!.*(技巧|方法|怎么准备|注意|建议|简历))"
+
+# 否定句不走规则："我不想修改简历"
+_NOT_NEGATED = r"(?!.*(不想|不要|不用|不需要|先不|别))"
+
+# 提问、抱怨句不走带问题的练习规则："练习了很久还是紧张怎么办"
+# （"为什么" 常出现在要练习的题目中，不算提问）
+_NOT_QUESTION = r"(?!.*((?<!为)什么|怎么办|怎么|吗|呢|[？?]))"
+
+# 带转折、原因从句的不走规则："我要练习，但是有点紧张"（后半句才是用户真正想说的）
+_NOT_CLAUSE = r"(?!.*(但是|可是|不过|因为))"
+
+# 指代之前的题目不走规则："练习一下刚才那道题"（题目要结合上下文由 LLM 解析）
+_NOT_DEICTIC = r"(?!.*(刚才|刚刚|上一题|上一道|上个问题|那道题|那个问题|之前的题))"
+
+# 提取的问题须以文字开头，不能是标点或语气词："开始练习吧我准备好了"
+_QUESTION_START = r"(?![吧呢啊])[\w\u4e00-\u9fff]"
+
+GREETING_RESPONSE = "你好！我是你的面试助手，可以陪你做语音练习、优化回答、撰写逐字稿或修改简历。你想从哪里开始？"
+
+
+@dataclass
+class RoutingDecision:
+    """路由决策结果"""
+    intent: str
+    next_agent: str
+    confidence: float
+    tier: str                                   # "rules" | "classifier" | "llm"
+    extracted_question: Optional[str] = None
+    response: Optional[str] = None
+    reasoning: Optional[str] = None
+    latency_ms: float = 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "intent": self.intent,
+            "next_agent": self.next_agent,
+            "extracted_question": self.extracted_question,
+            "response": self.response,
+            "reasoning": self.reasoning,
+        }
+
+
+@dataclass
+class RoutingRule:
+    """单条路由规则"""
+    intent: str
+    pattern: Pattern
+    confidence: float
+    question_group: Optional[str] = None        # 提取问题的命名分组
+    response: Optional[str] = None
+
+
+def _compile_rules() -> List[RoutingRule]:
+    """预编译规则（按优先级排序，先匹配先返回）"""
+    return [
+        # 问候
+        RoutingRule(
+            intent="general",
+            pattern=re.compile(r"^\s*(你好|您好|hi|hello|嗨|哈喽|在吗)[\s!！。.~～?？]*$", re.IGNORECASE),
+            confidence=0.95,
+            response=GREETING_RESPONSE,
+        ),
+        # 不带具体问题的练习请求："开始练习"、"我想模拟面试"
+        RoutingRule(
+            intent="voice_practice",
+            pattern=re.compile(r"^\s*(我想|我要|帮我|请)?(开始)?(语音)?(练习|模拟面试|模拟|练一下|考考我)(吧|一下)?[\s!！。.~～]*$"),
+            confidence=0.95,
+        ),
+        # 带具体问题的练习请求："我想练习自我介绍"、"练习一下：为什么离职"
+        # （"练习了/练习过" 是在叙述经历，不是请求）
+        RoutingRule(
+            intent="voice_practice",
+            pattern=re.compile(
+                r"^" + _NOT_ADVICE + _NOT_QUESTION + _NOT_CLAUSE + _NOT_DEICTIC
+                + r"\s*(我想|我要|帮我|请|开始)?(语音)?(练习|练一下|考考我)(?![了过得])(一下)?(这道题|这个问题)?[：:\s]*"
+                r"(?P<question>" + _QUESTION_START + r".{1,199}?)[\s。.!！]*$"
+            ),
+            confidence=0.9,
+            question_group="question",
+        ),
+        # 简历优化：整句就是请求（"帮我优化一下简历"、"简历怎么改"）
+        RoutingRule(
+            intent="resume_optimization",
+            pattern=re.compile(
+                r"^" + _NOT_NEGATED + r"\s*((我想|我要|帮我|请|麻烦)?(帮我)?(优化|修改|改改|改一下|润色|完善|看看|诊断)(一下)?(我的|这份)?简历"
+                r"|(我的|这份)?简历(该|要)?(怎么改|怎么写|怎么优化|(帮我)?(优化|修改|润色|完善|看看)(一下)?))"
+                r"(吧|一下)?[\s!！。.~～?？]*$"
+            ),
+            confidence=0.9,
+        ),
+        # 写自我介绍："帮我写一个自我介绍"
+        RoutingRule(
+            intent="script_writing",
+            pattern=re.compile(r"^" + _NOT_ADVICE + _NOT_CLAUSE + r"\s*(帮我|给我|请)?(写|生成|准备)(一个|一份|个|一段)?(?P<question>.{0,20}自我介绍)的?(逐字稿|回答|答案)?[\s。.!！]*$"),
+            confidence=0.85,
+            question_group="question",
+        ),
+        # 写逐字稿：须以 逐字稿/回答/答案 结尾，"生成对抗网络的原理是什么" 不匹配；
+        # "准备明天面试的回答" 说的是整场面试而不是某道题，交给 LLM
+        RoutingRule(
+            intent="script_writing",
+            pattern=re.compile(
+                r"^" + _NOT_ADVICE + _NOT_CLAUSE + _NOT_DEICTIC + r"(?!.*面试(这道题)?的(逐字稿|回答|答案))"
+                r"\s*(帮我|给我|请)?(写|生成|准备)(一个|一份|个|一段)?"
+                r"(?P<question>" + _QUESTION_START + r".{1,99}?)(这道题)?的(逐字稿|回答|答案)[\s。.!！]*$"
+            ),
+            confidence=0.85,
+            question_group="question",
+        ),
+    ]
+
+
+class IntentClassifier:
+    """
+    本地意图分类器（字符级 TF-IDF + 逻辑回归）
+
+    训练数据来自 LLM 路由日志，见 train_intent_classifier.py。
+    """
+
+    def __init__(self, pipeline=None):
+        self.pipeline = pipeline
+
+    @classmethod
+    def train(cls, texts: List[str], intents: List[str]) -> "IntentClassifier":
+        """训练分类器"""
+        if not SKLEARN_AVAILABLE:
+            raise RuntimeError("未安装 scikit-learn，无法训练本地意图分类器")
+        pipeline = Pipeline([
+            ("tfidf", TfidfVectorizer(analyzer="char_wb", ngram_range=(1, 3), sublinear_tf=True)),
+            ("clf", LogisticRegression(max_iter=1000, class_weight="balanced")),
+        ])
+        pipeline.fit(texts, intents)
+        return cls(pipeline)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["IntentClassifier"]:
+        """加载已训练的分类器，不存在或依赖缺失时返回 None"""
+        if not SKLEARN_AVAILABLE or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                return cls(pickle.load(f))
+        except Exception as e:
+            logger.warning(f"加载意图分类器失败: {e}")
+            return None
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            pickle.dump(self.pipeline, f)
+
+    def predict(self, text: str) -> tuple:
+        """
+        Returns:
+            tuple: (intent, confidence)
+        """
+        probabilities = self.pipeline.predict_proba([text])[0]
+        best = probabilities.argmax()
+        return self.pipeline.classes_[best], float(probabilities[best])
+
+
+@dataclass
+class TierStats:
+    """单层路由统计"""
+    count: int = 0
+    total_ms: float = 0.0
+
+
+class TieredIntentRouter:
+    """
+    分层意图路由器
+
+    route() 返回 None 表示本地无法确定，需要调用 LLM。
+    """
+
+    def __init__(
+        self,
+        threshold: float = settings.intent_router_threshold,
+        classifier_path: str = settings.intent_classifier_path,
+        log_path: Optional[str] = settings.routing_log_path
+    ):
+        self.threshold = threshold
+        self.rules = _compile_rules()
+        self.classifier = IntentClassifier.load(classifier_path)
+        self.log_path = log_path
+        self._stats: Dict[str, TierStats] = {
+            tier: TierStats() for tier in ("rules", "classifier", "llm")
+        }
+
+        if self.classifier:
+            logger.info(f"已加载本地意图分类器: {classifier_path}")
+
+    def route(self, user_input: str, has_message_context: bool = False) -> Optional[RoutingDecision]:
+        """
+        本地路由（规则 → 分类器）
+
+        Args:
+            user_input: 用户输入
+            has_message_context: 是否携带消息上下文（逐字稿修改等场景交给 LLM）
+
+        Returns:
+            置信度达到阈值的决策，否则 None
+        """
+        text = (user_input or "").strip()
+        if not text or has_message_context:
+            return None
+
+        start = time.perf_counter()
+
+        decision = self._match_rules(text)
+        if decision is None and self.classifier:
+            decision = self._classify(text)
+
+        if decision is None or decision.confidence < self.threshold:
+            return None
+
+        decision.latency_ms = (time.perf_counter() - start) * 1000
+        return decision
+
+    def _match_rules(self, text: str) -> Optional[RoutingDecision]:
+        for rule in self.rules:
+            match = rule.pattern.search(text)
+            if not match:
+                continue
+            question = None
+            if rule.question_group:
+                question = (match.group(rule.question_group) or "").strip() or None
+            return RoutingDecision(
+                intent=rule.intent,
+                next_agent=INTENT_TO_AGENT[rule.intent],
+                confidence=rule.confidence,
+                tier="rules",
+                extracted_question=question,
+                response=rule.response,
+                reasoning=f"规则匹配: {rule.pattern.pattern[:40]}",
+            )
+        return None
+
+    def _classify(self, text: str) -> Optional[RoutingDecision]:
+        try:
+            intent, confidence = self.classifier.predict(text)
+        except Exception as e:
+            logger.warning(f"本地意图分类失败: {e}")
+            return None
+
+        # 分类器只负责路由，问题提取和直接回复仍需 LLM
+        if intent not in INTENT_TO_AGENT or intent in ("voice_practice", "script_writing", "general"):
+            return None
+
+        return RoutingDecision(
+            intent=intent,
+            next_agent=INTENT_TO_AGENT[intent],
+            confidence=confidence,
+            tier="classifier",
+            reasoning=f"本地分类器: {confidence:.2f}",
+        )
+
+    def record(self, decision: RoutingDecision, user_input: str = ""):
+        """记录决策统计；LLM 决策同时写入训练日志"""
+        stats = self._stats[decision.tier]
+        stats.count += 1
+        stats.total_ms += decision.latency_ms
+
+        logger.info(
+            f"路由层级: tier={decision.tier}, intent={decision.intent}, "
+            f"confidence={decision.confidence:.2f}, latency={decision.latency_ms:.1f}ms"
+        )
+
+        if decision.tier == "llm" and self.log_path and user_input:
+            self._append_log(user_input, decision)
+
+    def _append_log(self, user_input: str, decision: RoutingDecision):
+        try:
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    "text": user_input,
+                    "intent": decision.intent,
+                    "next_agent": decision.next_agent,
+                    "timestamp": datetime.now().isoformat()
+                }, ensure_ascii=False) + "\n")
+        except Exception as e:
+            logger.warning(f"写入路由日志失败: {e}")
+
+    def stats(self) -> Dict[str, Dict]:
+        """
+        各层命中统计
+
+        Returns:
+            {tier: {"count", "ratio", "avg_ms"}}，avg_ms 可与 llm 层对比得出节省的延迟
+        """
+        total = sum(s.count for s in self._stats.values()) or 1
+        return {
+            tier: {
+                "count": s.count,
+                "ratio": s.count / total,
+                "avg_ms": s.total_ms / s.count if s.count else 0.0,
+            }
+            for tier, s in self._stats.items()
+        }
+
+
+# 全局实例
+intent_router = TieredIntentRouter()
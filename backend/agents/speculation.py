@@ -0,0 +1,133 @@
+"""
+投机执行：路由与对话生成并行
+
+文本消息需要先经过 Supervisor LLM 判断意图，再开始 Chat 流式生成，
+首 token 延迟是两次 LLM 往返之和。投机模式在意图分析的同时，
+预先启动最可能的对话流（interview_chat），把 token 缓存起来：
+- 路由确认命中 → 立即输出已缓存的 token，并继续转发后续 token
+- 路由未命中 → 取消预启动的流
+
+统计命中率和节省的首 token 时间，用于评估投机收益。
+"""
+
+import asyncio
+import logging
+import time
+from typing import AsyncGenerator, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 预测的意图（其流式输入不依赖路由结果）
+SPECULATIVE_INTENT = "interview_chat"
+
+_DONE = object()
+
+
+class SpeculationStats:
+    """投机执行统计"""
+
+    def __init__(self):
+        self.attempts = 0
+        self.hits = 0
+        self.misses = 0
+        self.total_saved_ms = 0.0
+        self.saved_samples = 0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / self.attempts if self.attempts else 0.0,
+            "avg_ttft_saved_ms": self.total_saved_ms / self.saved_samples if self.saved_samples else 0.0,
+        }
+
+
+speculation_stats = SpeculationStats()
+
+
+class SpeculativeStream:
+    """
+    预启动的对话流
+
+    后台任务持续消费生成器并缓存 token；确认命中后通过 stream() 读取。
+    """
+
+    def __init__(self, generator: AsyncGenerator[str, None], intent: str = SPECULATIVE_INTENT):
+        self.intent = intent
+        self.started_at = time.perf_counter()
+        self.confirmed_at: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._error: Optional[BaseException] = None
+        self._task = asyncio.create_task(self._pump(generator))
+        speculation_stats.attempts += 1
+
+    async def _pump(self, generator: AsyncGenerator[str, None]):
+        try:
+            async for chunk in generator:
+                if self.first_token_at is None:
+                    self.first_token_at = time.perf_counter()
+                self._queue.put_nowait(chunk)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._error = e
+        finally:
+            self._queue.put_nowait(_DONE)
+
+    def confirm(self):
+        """路由确认命中"""
+        self.confirmed_at = time.perf_counter()
+        speculation_stats.hits += 1
+        logger.info(
+            f"投机命中: intent={self.intent}, 路由耗时={(self.confirmed_at - self.started_at) * 1000:.0f}ms, "
+            f"已缓存 {self._queue.qsize()} 个 chunk"
+        )
+
+    async def cancel(self, miss: bool = True):
+        """
+        取消预启动的流
+
+        Args:
+            miss: 是否计为未命中（命中后用户取消时传 False）
+        """
+        if miss:
+            speculation_stats.misses += 1
+            logger.info(f"投机未命中，取消预启动的 {self.intent} 流")
+        if not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    async def stream(self) -> AsyncGenerator[str, None]:
+        """输出已缓存及后续的 token"""
+        first = True
+        while True:
+            item = await self._queue.get()
+            if item is _DONE:
+                if self._error:
+                    raise self._error
+                return
+            if first:
+                first = False
+                self._record_saving()
+            yield item
+
+    def _record_saving(self):
+        """
+        节省的首 token 时间
+
+        非投机时首 token 出现在 路由耗时 + LLM 首 token 耗时 之后；
+        投机时为 max(路由耗时, LLM 首 token 耗时)，差值即节省量。
+        """
+        if self.confirmed_at is None or self.first_token_at is None:
+            return
+        routing_ms = (self.confirmed_at - self.started_at) * 1000
+        llm_ttft_ms = (self.first_token_at - self.started_at) * 1000
+        saved_ms = min(routing_ms, llm_ttft_ms)
+        speculation_stats.total_saved_ms += saved_ms
+        speculation_stats.saved_samples += 1
+        logger.info(f"投机节省首 token 时间: {saved_ms:.0f}ms")
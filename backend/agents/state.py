@@ -34,7 +34,10 @@ class AgentState(TypedDict):
 
     # === 面试相关 ===
     current_question: Optional[str]              # 当前练习的问题
-    audio_data: Optional[str]                    # Base64音频数据
+    audio_ref: Optional[str]                     # 音频引用（字节保存在 services.audio_upload 注册表）
+    audio_key: Optional[str]                     # 浏览器直传到 OSS 的音频 key
+    audio_content_hash: Optional[str]            # 浏览器计算的直传音频 SHA-256（使用前须校验）
+    asr_use_cache: Optional[bool]                # 是否复用相同录音的转写结果
     transcript: Optional[str]                    # ASR转录结果
     transcript_sentences: Optional[List[dict]]   # ASR句子级时间戳
     feedback: Optional[dict]                     # STAR分析结果
@@ -51,6 +54,7 @@ class AgentState(TypedDict):
         "general"                # 通用面试对话
     ]]
     extracted_question: Optional[str]  # 从用户输入提取的面试问题
+    routing_tier: Optional[str]        # 路由决策来源: rules / classifier / llm
 
     # === 消息上下文（用于逐字稿修改）===
     message_context: Optional[dict]           # 完整的消息上下文
@@ -111,7 +115,10 @@ def create_initial_state(
         current_mode="idle",
         # 面试相关
         current_question=None,
-        audio_data=None,
+        audio_ref=None,
+        audio_key=None,
+        audio_content_hash=None,
+        asr_use_cache=True,
         transcript=None,
         transcript_sentences=None,
         feedback=None,
@@ -120,6 +127,7 @@ def create_initial_state(
         # 意图路由
         intent=None,
         extracted_question=None,
+        routing_tier=None,
         # 消息上下文（用于逐字稿修改）
         message_context=None,
         context_question=None,
@@ -173,7 +173,7 @@ class ChatSubAgent:
             {"role": "user", "content": prompt}
         ]
 
-        return await llm_service.chat_completion(messages=messages, temperature=0.7)
+        return await llm_service.chat_completion(messages=messages, temperature=0.7, usage_tag="answer_optimization")
 
     async def _research_question(
         self,
@@ -203,7 +203,7 @@ class ChatSubAgent:
             {"role": "user", "content": prompt}
         ]
 
-        return await llm_service.chat_completion(messages=messages, temperature=0.7)
+        return await llm_service.chat_completion(messages=messages, temperature=0.7, usage_tag="question_research")
 
     async def _optimize_resume(
         self,
@@ -229,7 +229,7 @@ class ChatSubAgent:
             {"role": "user", "content": prompt}
         ]
 
-        return await llm_service.chat_completion(messages=messages, temperature=0.7)
+        return await llm_service.chat_completion(messages=messages, temperature=0.7, usage_tag="resume_optimization")
 
     # ========== 流式输出方法 ==========
 
@@ -342,7 +342,7 @@ class ChatSubAgent:
             {"role": "user", "content": prompt}
         ]
 
-        async for chunk in llm_service.chat_completion_stream(messages=messages, temperature=0.7):
+        async for chunk in llm_service.chat_completion_stream(messages=messages, temperature=0.7, usage_tag="answer_optimization"):
             yield chunk
 
     async def _research_question_stream(
@@ -368,7 +368,7 @@ class ChatSubAgent:
             {"role": "user", "content": prompt}
         ]
 
-        async for chunk in llm_service.chat_completion_stream(messages=messages, temperature=0.7):
+        async for chunk in llm_service.chat_completion_stream(messages=messages, temperature=0.7, usage_tag="question_research"):
             yield chunk
 
     async def _optimize_resume_stream(
@@ -394,7 +394,7 @@ class ChatSubAgent:
             {"role": "user", "content": prompt}
         ]
 
-        async for chunk in llm_service.chat_completion_stream(messages=messages, temperature=0.7):
+        async for chunk in llm_service.chat_completion_stream(messages=messages, temperature=0.7, usage_tag="resume_optimization"):
             yield chunk
 
     async def _write_script_stream(
@@ -423,7 +423,7 @@ class ChatSubAgent:
             {"role": "user", "content": prompt}
         ]
 
-        async for chunk in llm_service.chat_completion_stream(messages=messages, temperature=0.7):
+        async for chunk in llm_service.chat_completion_stream(messages=messages, temperature=0.7, usage_tag="script_writing"):
             yield chunk
 
     async def _interview_chat_stream(
@@ -462,7 +462,8 @@ class ChatSubAgent:
 
         async for chunk in llm_service.chat_completion_stream(
             messages=context_result.messages,
-            temperature=0.7
+            temperature=0.7,
+            usage_tag="interview_chat"
         ):
             yield chunk
 
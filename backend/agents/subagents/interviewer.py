@@ -4,11 +4,16 @@ Interviewer SubAgent (面试官)
 负责语音练习全流程：提问→录音→ASR→STAR分析→反馈
 """
 
+import asyncio
+import hashlib
 import json
 import logging
+import os
 from typing import Dict, Any, Optional
+from uuid import UUID
 
 from agents.state import AgentState
+from agents.intent_router import PRACTICE_KEYWORDS
 from agents.prompts.interviewer import INTERVIEWER_SYSTEM_PROMPT, STAR_ANALYSIS_PROMPT
 from services.llm_service import llm_service
 from services.asr_service import asr_service, build_context_text
@@ -38,14 +43,14 @@ class InterviewerSubAgent:
             更新后的状态
         """
         input_type = state.get("input_type", "text")
-        audio_data = state.get("audio_data")
+        audio_ref = state.get("audio_ref")
         current_question = state.get("current_question")
         user_input = state.get("user_input", "")
 
-        logger.info(f"Interviewer 收到: input_type={input_type}, has_audio={bool(audio_data)}, audio_len={len(audio_data) if audio_data else 0}, current_question={current_question}")
+        logger.info(f"Interviewer 收到: input_type={input_type}, audio_ref={audio_ref}, current_question={current_question}")
 
         # 情况1: 收到音频数据 - 进行转录和分析
-        if input_type == "audio" and audio_data:
+        if input_type == "audio" and (audio_ref or state.get("audio_key") or state.get("transcript")):
             logger.info("进入音频处理流程...")
             return await self._process_audio(state)
 
@@ -74,8 +79,7 @@ class InterviewerSubAgent:
 
     def _is_practice_request(self, user_input: str) -> bool:
         """判断是否是练习请求"""
-        practice_keywords = ["练习", "模拟", "开始", "录音", "语音"]
-        return any(kw in user_input for kw in practice_keywords)
+        return any(kw in user_input for kw in PRACTICE_KEYWORDS)
 
     def _extract_question_from_input(self, user_input: str) -> str | None:
         """
@@ -137,11 +141,7 @@ class InterviewerSubAgent:
 
     async def _process_audio(self, state: AgentState) -> AgentState:
         """处理音频：转录 + STAR分析 + 自动保存资产 + 保存音频文件"""
-        import base64
-        from datetime import datetime, timedelta
-        from uuid import UUID
-
-        audio_data = state.get("audio_data", "")
+        audio_ref = state.get("audio_ref")
         current_question = state.get("current_question", "")
         resume_text = state.get("resume_text", "")
         jd_text = state.get("jd_text", "")
@@ -157,37 +157,31 @@ class InterviewerSubAgent:
             }
 
         try:
-            # 1. 解码音频
-            audio_bytes = base64.b64decode(audio_data)
-
-            # 检测音频格式
-            audio_format = "unknown"
-            if audio_bytes[:4] == b'RIFF':
-                audio_format = "WAV"
-            elif audio_bytes[:4] == b'\x1a\x45\xdf\xa3':
-                audio_format = "WebM"
-            elif audio_bytes[:3] == b'ID3' or audio_bytes[:2] == b'\xff\xfb':
-                audio_format = "MP3"
-
-            logger.info(f"音频大小: {len(audio_bytes)} bytes, 格式: {audio_format}")
-
-            # 2. ASR转录（paraformer-v2 原生支持 WebM，无需转换）
-            logger.info("开始ASR转录（持久化模式）...")
-            context_text = build_context_text(
-                resume_text=resume_text,
-                jd_text=jd_text,
-                question=current_question
-            )
-
-            asr_result, oss_info = await asr_service.transcribe_audio_bytes(
-                audio_data=audio_bytes,  # 直接传原始 WebM 数据
-                context_text=context_text,
-                language="zh",
-                persist_audio=True  # 持久化保存音频
-            )
+            realtime_transcript = state.get("transcript")
+            if realtime_transcript:
+                # 1. 实时识别已在录音过程中完成，跳过上传与批量转写
+                transcript = realtime_transcript
+                transcript_sentences = state.get("transcript_sentences") or []
+                logger.info(f"使用实时识别结果: {transcript[:100]}...")
+                audio_file_id = await self._save_realtime_recording(
+                    audio_ref=audio_ref,
+                    transcript=transcript,
+                    transcript_sentences=transcript_sentences,
+                    session_id=session_id
+                )
+            else:
+                # 1-4. 批量转写并保存 AudioFile
+                transcript, transcript_sentences, audio_file_id = await self._transcribe_recording(
+                    audio_ref=audio_ref,
+                    audio_key=state.get("audio_key"),
+                    audio_hash=state.get("audio_content_hash"),
+                    use_cache=state.get("asr_use_cache", True),
+                    current_question=current_question,
+                    resume_text=resume_text,
+                    jd_text=jd_text,
+                    session_id=session_id
+                )
 
-            transcript = asr_result.transcript
-            transcript_sentences = asr_result.sentences  # 获取句子时间戳
             if not transcript:
                 return {
                     **state,
@@ -196,44 +190,6 @@ class InterviewerSubAgent:
                     "next_agent": "end"
                 }
 
-            logger.info(f"转录完成: {transcript[:100]}...")
-            logger.info(f"句子数: {len(transcript_sentences)}")
-
-            # 4. 保存 AudioFile 记录
-            audio_file_id = None
-            logger.info(f"检查 OSS 信息: oss_info={oss_info is not None}, session_id={session_id}")
-            if oss_info and session_id:
-                oss_key, oss_url = oss_info
-                logger.info(f"OSS 信息: oss_key={oss_key}, oss_url={oss_url[:50] if oss_url else None}...")
-                try:
-                    from models.audio_file import AudioFile
-                    from database import SessionLocal
-
-                    db = SessionLocal()
-                    try:
-                        audio_file = AudioFile(
-                            session_id=UUID(session_id) if isinstance(session_id, str) else session_id,
-                            file_path=oss_url,  # 使用 OSS URL 作为 file_path
-                            oss_key=oss_key,
-                            oss_url=oss_url,
-                            file_size=len(audio_bytes),
-                            format="wav",
-                            asr_status="completed",
-                            asr_result={"transcript": transcript, "sentences": transcript_sentences},
-                            expires_at=datetime.utcnow() + timedelta(days=30)  # 30天后过期
-                        )
-                        db.add(audio_file)
-                        db.commit()
-                        db.refresh(audio_file)
-                        audio_file_id = str(audio_file.id)
-                        logger.info(f"AudioFile 已保存: {audio_file_id}, oss_key={oss_key}")
-                    finally:
-                        db.close()
-                except Exception as e:
-                    logger.error(f"保存 AudioFile 失败: {e}")
-            else:
-                logger.warning(f"跳过 AudioFile 保存: oss_info={oss_info}, session_id={session_id}")
-
             # 5. 立即发送转录结果（在 STAR 分析之前）
             # 使用回调注册表，避免将函数放入 state（无法序列化）
             from services.callback_registry import invoke_callback
@@ -262,29 +218,35 @@ class InterviewerSubAgent:
             if project_id and feedback:
                 try:
                     from models.asset import Asset
-                    from database import SessionLocal
+                    from database import db_unit_of_work
                     from services.markdown_formatter import format_transcript
+                    from services.asset_lineage import asset_lineage_service
+                    from services.transcript_delta import transcript_version_store
 
-                    db = SessionLocal()
-                    try:
+                    project_uuid = UUID(project_id) if isinstance(project_id, str) else project_id
+                    async with db_unit_of_work() as db:
                         # 格式化逐字稿为 Markdown
                         formatted_transcript = format_transcript(transcript)
 
+                        # 同一问题的录音挂到同一版本谱系下
+                        lineage_id, version = await asset_lineage_service.anext_version(
+                            db, project_uuid, current_question
+                        )
                         asset = Asset(
-                            project_id=project_id,
+                            project_id=project_uuid,
                             question=current_question,
                             transcript=formatted_transcript,
                             star_structure={"analysis": feedback.get("analysis", "")},
-                            version=1,
+                            lineage_id=lineage_id,
+                            version=version,
                             version_type="recording"  # 标记为录音版本
                         )
                         db.add(asset)
-                        db.commit()
-                        db.refresh(asset)
+                        # 前一个版本改存为相对本版本的差异
+                        await transcript_version_store.acompress_previous(db, asset)
+                        await db.commit()
                         asset_id = str(asset.id)
                         logger.info(f"资产已保存: {asset_id}")
-                    finally:
-                        db.close()
                 except Exception as e:
                     logger.error(f"保存资产失败: {e}")
 
@@ -307,7 +269,8 @@ class InterviewerSubAgent:
                     "audio_file_id": audio_file_id  # 新增
                 },
                 "current_question": None,  # 重置问题
-                "audio_data": None,  # 清除音频数据
+                "audio_ref": None,  # 清除音频引用
+                "audio_key": None,
                 "current_mode": "idle",
                 "next_agent": "end"
             }
@@ -321,6 +284,265 @@ class InterviewerSubAgent:
                 "next_agent": "end"
             }
 
+    async def _transcribe_recording(
+        self,
+        audio_ref: str,
+        current_question: str,
+        resume_text: str,
+        jd_text: str,
+        session_id: str,
+        audio_key: Optional[str] = None,
+        audio_hash: Optional[str] = None,
+        use_cache: bool = True
+    ) -> tuple:
+        """
+        批量转写录音并保存 AudioFile 记录
+
+        audio_key 不为空时音频已由浏览器直传到 OSS，直接从该对象发起转写；
+        audio_hash 为浏览器计算的内容 SHA-256，校验一致后参与结果缓存和内容寻址去重。
+        否则从注册表取出 WebSocket 上传的音频字节。
+        use_cache=False 时不复用相同录音的转写结果，强制重新转写。
+
+        Returns:
+            tuple: (转写文本, 句子时间戳列表, audio_file_id 或 None)
+        """
+        from services.audio_upload import pop_audio
+        from services.audio_storage import detect_audio_format
+
+        context_text = build_context_text(
+            resume_text=resume_text,
+            jd_text=jd_text,
+            question=current_question
+        )
+
+        if audio_key:
+            # 1. 浏览器直传：确认对象已上传完成且未超出大小限制
+            from config import settings
+            from services.oss_service import oss_service
+
+            file_size = await oss_service.aget_object_size(audio_key)
+            if file_size is None:
+                raise Exception("音频上传未完成，请重新录音")
+            if file_size > settings.max_audio_upload_bytes:
+                await oss_service.adelete_audio(audio_key)
+                raise Exception("录音文件过大，请缩短回答后重新录音")
+
+            logger.info(f"音频已直传到 OSS: {audio_key}, 大小: {file_size} bytes")
+
+            # 音频不经过本服务，不做预处理；直传 key 的后缀即录音格式
+            duration_seconds = None
+            content_hash = None
+            stored_format = os.path.splitext(audio_key)[1].lstrip(".").lower() or None
+            suffix = f".{stored_format or 'webm'}"
+
+            # 2. 客户端声明了内容哈希时先查转写缓存；哈希须与对象内容一致才采用（不信任客户端）
+            cached = None
+            if audio_hash:
+                cached = await asr_service.lookup_cached(audio_hash, use_cache=use_cache)
+                if cached is not None and not await self._verify_upload_hash(audio_key, audio_hash):
+                    cached = None
+
+            if cached is not None:
+                logger.info(f"直传录音内容重复，复用转写结果: content_hash={audio_hash[:12]}, 来源={cached.source_id}")
+                content_hash = audio_hash
+                transcript = cached.transcript
+                transcript_sentences = cached.sentences
+                oss_info = (cached.oss_key, cached.oss_url)
+                file_size = cached.file_size or file_size
+                duration_seconds = cached.duration_seconds
+                stored_format = cached.format or stored_format
+                # 相同内容已在内容寻址存储中，直传对象不再需要
+                await oss_service.adelete_audio(audio_key)
+            else:
+                # 3. ASR转录；同时下载对象校验哈希（与转写并行，不增加等待）
+                if audio_hash:
+                    (asr_result, oss_info), verified = await asyncio.gather(
+                        asr_service.transcribe_oss_object(audio_key, context_text=context_text),
+                        self._verify_upload_hash(audio_key, audio_hash)
+                    )
+                else:
+                    asr_result, oss_info = await asr_service.transcribe_oss_object(audio_key, context_text=context_text)
+                    verified = False
+                transcript = asr_result.transcript
+                transcript_sentences = asr_result.sentences
+
+                if transcript and verified:
+                    # 转为内容寻址存储，AudioFile 记录哈希后与 audio_blobs 关联（引用计数、去重、结果缓存）
+                    try:
+                        from services.audio_blob_store import audio_blob_store
+
+                        oss_key, oss_url, _ = await audio_blob_store.aadopt_oss_upload(audio_key, audio_hash, suffix=suffix)
+                        oss_info = (oss_key, oss_url)
+                        content_hash = audio_hash
+                    except Exception as e:
+                        logger.warning(f"直传音频转为内容寻址存储失败，保留直传对象: {e}")
+        else:
+            # 1. 取出音频字节（按引用传递，不拷贝）
+            audio_bytes = pop_audio(audio_ref) if audio_ref else None
+            if not audio_bytes:
+                raise Exception("音频数据已失效，请重新录音")
+
+            file_size = len(audio_bytes)
+            logger.info(f"音频大小: {file_size} bytes, 格式: {detect_audio_format(audio_bytes) or 'unknown'}")
+
+            # 2. 转写结果缓存（客户端重试、重复提交）：命中时复用 OSS 对象和转写结果，跳过预处理、上传和转写
+            content_hash = hashlib.sha256(audio_bytes).hexdigest()
+            cached = await asr_service.lookup_cached(content_hash, use_cache=use_cache)
+
+            if cached is not None:
+                logger.info(f"录音内容重复，复用转写结果: content_hash={content_hash[:12]}, 来源={cached.source_id}")
+                transcript = cached.transcript
+                transcript_sentences = cached.sentences
+                oss_info = (cached.oss_key, cached.oss_url)
+                file_size = cached.file_size or file_size
+                duration_seconds = cached.duration_seconds
+                stored_format = cached.format
+            else:
+                # 3. 预处理：裁剪静音并重编码为 Opus（不可用或失败时为原始录音）
+                from services.audio_preprocess import audio_preprocessor
+
+                processed = await audio_preprocessor.process(audio_bytes)
+                file_size = len(processed.audio_data)
+                duration_seconds = processed.duration_seconds
+                # 保存的是预处理后的音频（通常为 Opus/WebM，预处理未生效时为原始录音）
+                stored_format = detect_audio_format(processed.audio_data)
+
+                # 4. ASR转录（paraformer-v2 原生支持 WebM，无需转换）
+                logger.info("开始ASR转录（持久化模式）...")
+                asr_result, oss_info = await asr_service.transcribe_audio_bytes(
+                    audio_data=processed.audio_data,
+                    context_text=context_text,
+                    language="zh",
+                    persist_audio=True,  # 持久化保存音频（按内容寻址）
+                    content_hash=content_hash,  # 缓存键为原始录音哈希
+                    use_cache=False  # 上面已查询过缓存
+                )
+
+                transcript = asr_result.transcript
+                transcript_sentences = asr_result.sentences  # 获取句子时间戳
+        if not transcript:
+            return "", [], None
+
+        logger.info(f"转录完成: {transcript[:100]}...")
+        logger.info(f"句子数: {len(transcript_sentences)}")
+
+        # 5. 保存 AudioFile 记录
+        audio_file_id = None
+        logger.info(f"检查 OSS 信息: oss_info={oss_info is not None}, session_id={session_id}")
+        if oss_info and session_id:
+            oss_key, oss_url = oss_info
+            logger.info(f"OSS 信息: oss_key={oss_key}, oss_url={oss_url[:50] if oss_url else None}...")
+            audio_file_id = await self._save_audio_file(
+                session_id=session_id,
+                oss_key=oss_key,
+                oss_url=oss_url,
+                file_size=file_size,
+                content_hash=content_hash,  # 原始录音哈希，用于重复提交去重（直传时哈希校验一致才有）
+                duration_seconds=duration_seconds,
+                audio_format=stored_format,
+                asr_result={"transcript": transcript, "sentences": transcript_sentences, "model": asr_service.model}
+            )
+        else:
+            logger.warning(f"跳过 AudioFile 保存: oss_info={oss_info}, session_id={session_id}")
+
+        return transcript, transcript_sentences, audio_file_id
+
+    async def _verify_upload_hash(self, audio_key: str, audio_hash: str) -> bool:
+        """下载直传对象计算 SHA-256，确认与客户端声明的哈希一致（失败时视为不一致）"""
+        from services.oss_service import oss_service
+
+        try:
+            actual = await oss_service.aobject_sha256(audio_key)
+        except Exception as e:
+            logger.warning(f"校验直传音频哈希失败: {e}")
+            return False
+        if actual != audio_hash:
+            logger.warning(f"直传音频哈希不一致，忽略客户端哈希: key={audio_key}, 声明={audio_hash[:12]}")
+            return False
+        return True
+
+    async def _save_realtime_recording(
+        self,
+        audio_ref: Optional[str],
+        transcript: str,
+        transcript_sentences: list,
+        session_id: str
+    ) -> Optional[str]:
+        """
+        上传实时识别录音（WebSocket 层封装的 WAV）并保存 AudioFile 记录
+
+        Returns:
+            audio_file_id；没有录音（非 PCM 或超出上限）或保存失败时为 None
+        """
+        from services.audio_upload import pop_audio
+        from services.audio_blob_store import audio_blob_store
+        from services.realtime_asr_service import realtime_asr_service
+
+        wav_bytes = pop_audio(audio_ref) if audio_ref else None
+        if not wav_bytes or not session_id:
+            logger.warning(f"跳过实时录音保存: audio={bool(wav_bytes)}, session_id={session_id}")
+            return None
+
+        try:
+            oss_key, oss_url, _ = await audio_blob_store.aupload_oss(wav_bytes, suffix=".wav")
+        except Exception as e:
+            logger.error(f"上传实时录音失败: {e}")
+            return None
+
+        # WAV 头 44 字节，其后为 16-bit 单声道 PCM
+        sample_rate = int.from_bytes(wav_bytes[24:28], "little")
+        duration_seconds = (len(wav_bytes) - 44) / (sample_rate * 2) if sample_rate else None
+        return await self._save_audio_file(
+            session_id=session_id,
+            oss_key=oss_key,
+            oss_url=oss_url,
+            file_size=len(wav_bytes),
+            content_hash=hashlib.sha256(wav_bytes).hexdigest(),
+            duration_seconds=duration_seconds,
+            audio_format="wav",
+            asr_result={"transcript": transcript, "sentences": transcript_sentences, "model": realtime_asr_service.model}
+        )
+
+    async def _save_audio_file(
+        self,
+        session_id: str,
+        oss_key: str,
+        oss_url: str,
+        file_size: int,
+        content_hash: Optional[str],
+        duration_seconds: Optional[float],
+        audio_format: Optional[str],
+        asr_result: dict
+    ) -> Optional[str]:
+        """保存 AudioFile 记录，返回 audio_file_id（失败时为 None）"""
+        from datetime import datetime, timedelta
+        from database import db_unit_of_work
+        from models.audio_file import AudioFile
+
+        try:
+            async with db_unit_of_work() as db:
+                audio_file = AudioFile(
+                    session_id=UUID(session_id) if isinstance(session_id, str) else session_id,
+                    file_path=oss_url,  # 使用 OSS URL 作为 file_path
+                    oss_key=oss_key,
+                    oss_url=oss_url,
+                    file_size=file_size,
+                    content_hash=content_hash,
+                    duration_seconds=duration_seconds,
+                    format=audio_format,
+                    asr_status="completed",
+                    asr_result=asr_result,
+                    expires_at=datetime.utcnow() + timedelta(days=30)  # 30天后过期
+                )
+                db.add(audio_file)
+                await db.commit()
+                audio_file_id = str(audio_file.id)
+                logger.info(f"AudioFile 已保存: {audio_file_id}, oss_key={oss_key}")
+                return audio_file_id
+        except Exception as e:
+            logger.error(f"保存 AudioFile 失败: {e}")
+            return None
+
     async def _analyze_answer(
         self,
         question: str,
@@ -360,7 +582,8 @@ class InterviewerSubAgent:
             full_content = ""
             async for chunk in llm_service.chat_completion_stream(
                 messages=messages,
-                temperature=0.3
+                temperature=0.3,
+                usage_tag="voice_practice"
             ):
                 full_content += chunk
                 # 发送流式 chunk
@@ -384,7 +607,8 @@ class InterviewerSubAgent:
             # 非流式输出（用于测试）
             response = await llm_service.chat_completion(
                 messages=messages,
-                temperature=0.3
+                temperature=0.3,
+                usage_tag="voice_practice"
             )
             return self._parse_xml_feedback(response)
 
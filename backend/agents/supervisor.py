@@ -7,10 +7,12 @@ Supervisor (主Agent)
 
 import json
 import logging
+import time
 from typing import Dict, Any, List
 
 from .state import AgentState
 from .prompts.supervisor import SUPERVISOR_SYSTEM_PROMPT, SUPERVISOR_ROUTING_PROMPT
+from .intent_router import intent_router, RoutingDecision
 from services.llm_service import LLMService
 
 logger = logging.getLogger(__name__)
@@ -61,29 +63,47 @@ class SupervisorAgent:
                 "next_agent": "interviewer"
             }
 
-        # 使用LLM判断意图
         try:
-            routing_result = await self._analyze_intent(
-                user_input=user_input,
-                input_type=input_type,
-                current_mode=current_mode,
-                current_question=current_question,
-                messages=state.get("messages", [])
+            # 先尝试本地路由（规则 → 分类器），置信度不足时才调用 LLM
+            decision = intent_router.route(
+                user_input,
+                has_message_context=bool(state.get("message_context"))
             )
-
-            next_agent = routing_result.get("next_agent", "end")
-            response = routing_result.get("response")
-            intent = routing_result.get("intent", "general")
-            extracted_question = routing_result.get("extracted_question")
-
-            logger.info(f"路由决策: intent={intent}, next_agent={next_agent}, extracted_question={extracted_question}")
+            if decision is None:
+                start = time.perf_counter()
+                routing_result = await self._analyze_intent(
+                    user_input=user_input,
+                    input_type=input_type,
+                    current_mode=current_mode,
+                    current_question=current_question,
+                    messages=state.get("messages", [])
+                )
+                decision = RoutingDecision(
+                    intent=routing_result.get("intent", "general"),
+                    next_agent=routing_result.get("next_agent", "end"),
+                    confidence=1.0,
+                    tier="llm",
+                    extracted_question=routing_result.get("extracted_question"),
+                    response=routing_result.get("response"),
+                    reasoning=routing_result.get("reasoning"),
+                    latency_ms=(time.perf_counter() - start) * 1000
+                )
+            intent_router.record(decision, user_input)
+
+            next_agent = decision.next_agent
+            response = decision.response
+            intent = decision.intent
+            extracted_question = decision.extracted_question
+
+            logger.info(f"路由决策: intent={intent}, next_agent={next_agent}, extracted_question={extracted_question}, tier={decision.tier}")
 
             # 更新状态
             new_state = {
                 **state,
                 "next_agent": next_agent,
                 "intent": intent,
-                "extracted_question": extracted_question
+                "extracted_question": extracted_question,
+                "routing_tier": decision.tier
             }
 
             # 如果是直接回复，设置response
@@ -150,7 +170,8 @@ class SupervisorAgent:
 
         response = await supervisor_llm.chat_completion(
             messages=messages,
-            temperature=0.1  # 低温度，更确定性的输出
+            temperature=0.1,  # 低温度，更确定性的输出
+            usage_tag="supervisor"
         )
 
         # 解析JSON响应
@@ -1,3 +1,5 @@
+import logging
+
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
@@ -5,10 +7,14 @@ from uuid import UUID
 
 from database import get_db
 from models.asset import Asset
-from models import Project, User, Message
-from schemas.asset import AssetCreate, AssetUpdate, AssetResponse, AssetListResponse, AssetConfirmSave
+from models import Project, User, Message, Session as SessionModel
+from schemas.asset import AssetCreate, AssetUpdate, AssetResponse, AssetListResponse, AssetConfirmSave, AssetDiffResponse
 from dependencies.auth import get_current_user
 from services.markdown_formatter import format_optimized_answer
+from services.asset_lineage import asset_lineage_service
+from services.transcript_delta import transcript_version_store
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/assets", tags=["assets"])
 
@@ -34,9 +40,23 @@ def create_asset(
     # Verify project ownership
     verify_project_ownership(db, asset_data.project_id, current_user.id)
 
+    # 父版本必须属于同一项目
+    if asset_data.parent_asset_id:
+        parent = db.query(Asset.id).filter(
+            Asset.id == asset_data.parent_asset_id,
+            Asset.project_id == asset_data.project_id
+        ).first()
+        if not parent:
+            raise HTTPException(status_code=404, detail="Parent asset not found")
+
     # 处理 tags（确保是列表）
     tags_list = asset_data.tags if asset_data.tags else []
 
+    # 分配版本谱系和版本号（有父版本时沿用父版本的谱系）
+    lineage_id, version = asset_lineage_service.next_version(
+        db, asset_data.project_id, asset_data.question, asset_data.parent_asset_id
+    )
+
     asset = Asset(
         project_id=asset_data.project_id,
         question=asset_data.question,
@@ -45,16 +65,13 @@ def create_asset(
         tags=tags_list,
         star_structure=asset_data.star_structure,
         parent_asset_id=asset_data.parent_asset_id,
-        version=1  # 默认版本为1
+        lineage_id=lineage_id,
+        version=version
     )
 
-    # 如果有父版本，计算新版本号
-    if asset_data.parent_asset_id:
-        parent = db.query(Asset).filter(Asset.id == asset_data.parent_asset_id).first()
-        if parent:
-            asset.version = parent.version + 1
-
     db.add(asset)
+    # 前一个版本改存为相对本版本的差异
+    transcript_version_store.compress_previous(db, asset)
     db.commit()
     db.refresh(asset)
 
@@ -84,6 +101,7 @@ def list_assets(
         query = query.filter(Asset.project_id == project_id)
 
     assets = query.order_by(Asset.created_at.desc()).all()
+    transcript_version_store.materialize(db, assets)
 
     return AssetListResponse(assets=assets, total=len(assets))
 
@@ -104,6 +122,7 @@ def get_asset(
     if not asset:
         raise HTTPException(status_code=404, detail="Asset not found")
 
+    transcript_version_store.materialize(db, [asset])
     return asset
 
 
@@ -126,12 +145,13 @@ def update_asset(
 
     # 更新字段
     if asset_data.transcript is not None:
-        asset.transcript = asset_data.transcript
+        transcript_version_store.update_transcript(db, asset, asset_data.transcript)
     if asset_data.tags is not None:
         asset.tags = asset_data.tags
 
     db.commit()
     db.refresh(asset)
+    transcript_version_store.materialize(db, [asset])
 
     return asset
 
@@ -152,12 +172,38 @@ def delete_asset(
     if not asset:
         raise HTTPException(status_code=404, detail="Asset not found")
 
+    # 以该版本为基准的差异先改存为全文
+    transcript_version_store.detach(db, asset)
     db.delete(asset)
     db.commit()
 
     return None
 
 
+def _message_session_id(
+    db: Session,
+    project_id: UUID,
+    session_id: Optional[str],
+    message_id: UUID
+) -> Optional[UUID]:
+    """
+    确认消息所属会话属于该项目
+
+    客户端提供 session_id 时只校验会话（消息可能还未落库）；否则按已落库的消息查找。
+    """
+    if session_id:
+        return db.query(SessionModel.id).filter(
+            SessionModel.id == UUID(session_id),
+            SessionModel.project_id == project_id
+        ).scalar()
+    return db.query(Message.session_id).join(
+        SessionModel, Message.session_id == SessionModel.id
+    ).filter(
+        Message.id == message_id,
+        SessionModel.project_id == project_id
+    ).scalar()
+
+
 @router.post("/confirm-save")
 def confirm_save_asset(
     data: AssetConfirmSave,
@@ -171,30 +217,39 @@ def confirm_save_asset(
     # 格式化 transcript（优化答案/撰写逐字稿场景）
     formatted_transcript = format_optimized_answer(data.transcript) if data.transcript else ""
 
-    # 创建新的 Asset 记录
+    # 创建新的 Asset 记录（挂到同一问题的版本谱系下）
+    lineage_id, version = asset_lineage_service.next_version(db, UUID(data.project_id), data.question)
     new_asset = Asset(
         project_id=UUID(data.project_id),
         question=data.question,
         transcript=formatted_transcript,
+        lineage_id=lineage_id,
+        version=version,
         version_type="edited"  # 标记为编辑版本
     )
     db.add(new_asset)
+    transcript_version_store.compress_previous(db, new_asset)
     db.commit()
     db.refresh(new_asset)
 
     # 如果提供了 message_id，更新对应消息的 meta.saved 状态
     if data.message_id:
         try:
-            msg = db.query(Message).filter(Message.id == UUID(data.message_id)).first()
-            if msg and msg.meta:
-                updated_meta = dict(msg.meta)
-                updated_meta["saved"] = True
-                updated_meta["asset_id"] = str(new_asset.id)
-                msg.meta = updated_meta
-                db.commit()
+            session_id = _message_session_id(db, UUID(data.project_id), data.session_id, UUID(data.message_id))
+            if session_id:
+                # 消息可能仍在写缓冲中尚未落库：与 WebSocket 一样经 message_writer 入队 jsonb 合并更新，
+                # 不覆盖其他字段（同步路由运行在线程池中，回到事件循环入队）
+                from anyio.from_thread import run_sync
+                from services.message_writer import message_writer
+
+                run_sync(
+                    message_writer.patch_meta,
+                    str(session_id),
+                    data.message_id,
+                    {"saved": True, "asset_id": str(new_asset.id)}
+                )
         except Exception as e:
-            import logging
-            logging.getLogger(__name__).warning(f"更新消息保存状态失败: {e}")
+            logger.warning(f"更新消息保存状态失败: {e}")
 
     return {"asset_id": str(new_asset.id)}
 
@@ -205,7 +260,7 @@ def get_asset_versions(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """获取资产的所有版本（按相同问题查找）"""
+    """获取资产的所有版本（同一版本谱系，按版本号排序）"""
     # 获取当前资产，并验证所有权
     asset = db.query(Asset).join(Project).filter(
         Asset.id == asset_id,
@@ -215,14 +270,57 @@ def get_asset_versions(
     if not asset:
         raise HTTPException(status_code=404, detail="Asset not found")
 
-    # 按相同的 question 和 project_id 查找所有版本
-    versions = db.query(Asset).filter(
-        Asset.project_id == asset.project_id,
-        Asset.question == asset.question
-    ).order_by(Asset.created_at.asc()).all()
+    if asset.lineage_id is None:
+        # 未迁移的旧数据
+        transcript_version_store.materialize(db, [asset])
+        return [asset]
 
-    # 重新计算版本号（按创建时间排序）
-    for i, v in enumerate(versions):
-        v.version = i + 1
+    versions = db.query(Asset).filter(
+        Asset.lineage_id == asset.lineage_id,
+        Asset.project_id == asset.project_id
+    ).order_by(Asset.version.asc()).all()
+    transcript_version_store.materialize(db, versions)
 
     return versions
+
+
+@router.get("/{asset_id}/diff", response_model=AssetDiffResponse)
+def get_asset_diff(
+    asset_id: UUID,
+    base_id: Optional[UUID] = Query(None, description="对比的旧版本 ID，默认为同谱系的前一个版本"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取两个版本逐字稿的差异（base → asset）"""
+    asset = db.query(Asset).join(Project).filter(
+        Asset.id == asset_id,
+        Project.user_id == current_user.id
+    ).first()
+
+    if not asset:
+        raise HTTPException(status_code=404, detail="Asset not found")
+
+    if base_id:
+        base = db.query(Asset).filter(
+            Asset.id == base_id,
+            Asset.project_id == asset.project_id
+        ).first()
+    elif asset.lineage_id:
+        base = db.query(Asset).filter(
+            Asset.lineage_id == asset.lineage_id,
+            Asset.project_id == asset.project_id,
+            Asset.version < asset.version
+        ).order_by(Asset.version.desc()).first()
+    else:
+        base = None
+
+    if not base:
+        raise HTTPException(status_code=404, detail="Base version not found")
+
+    return AssetDiffResponse(
+        base_id=base.id,
+        base_version=base.version,
+        asset_id=asset.id,
+        version=asset.version,
+        diff=transcript_version_store.diff(db, base, asset)
+    )
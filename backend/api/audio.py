@@ -5,24 +5,33 @@
 """
 
 import os
-import base64
 import logging
 from uuid import UUID
 from typing import Optional
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request
 from sqlalchemy.orm import Session
 
 from database import get_db
-from models import AudioFile, Session as SessionModel, Project
+from dependencies.auth import get_current_user
+from models import AudioFile, Session as SessionModel, Project, User
 from schemas.audio import (
+    AudioFormat,
     AudioUploadResponse,
+    AudioURLBatchRequest,
+    AudioURLBatchResponse,
+    AudioURLItem,
     TranscribeRequest,
     TranscribeResponse,
     ASRStatus
 )
 from services.asr_service import asr_service, build_context_text
+from services.audio_storage import save_stream, iter_upload_file, decode_base64_stream, UploadTooLarge, InvalidUpload
+from services.audio_blob_store import audio_blob_store
+from services.asr_cache import asr_result_cache
+from services.signed_url_cache import signed_url_cache
 from config import settings
 
 logger = logging.getLogger(__name__)
@@ -35,6 +44,92 @@ def ensure_audio_storage_dir():
     os.makedirs(settings.audio_storage_path, exist_ok=True)
 
 
+class AudioUploadLimitMiddleware:
+    """
+    在请求体解析之前限制音频上传的大小
+
+    /upload 的 Form / File 参数在进入路由函数之前就已解析完毕（multipart 会先把整个文件写入临时文件），
+    在函数体内检查为时已晚，因此在 ASGI 层处理：
+    - Content-Length 超限时直接返回 413，不读取请求体
+    - 未声明长度（chunked）时边接收边计数，超限即中止
+    上限留出 Base64 / multipart 的编码开销，流式写入时仍按实际音频大小校验。
+    """
+
+    def __init__(self, app, paths: tuple = (f"{router.prefix}/upload", f"{router.prefix}/upload-base64")):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        max_body_bytes = settings.max_audio_upload_bytes * 2
+        detail = f"音频过大，最大 {settings.max_audio_upload_bytes} bytes"
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > max_body_bytes:
+            from fastapi.responses import JSONResponse
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body_bytes:
+                    # 请求体解析中抛出的 HTTPException 会原样交给异常处理器，返回 413
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def store_audio(
+    db: Session,
+    session_id: UUID,
+    format: str,
+    chunks
+) -> AudioFile:
+    """流式落盘到内容寻址存储并创建 AudioFile 记录"""
+    ensure_audio_storage_dir()
+
+    # 先写入临时文件，算出内容哈希后再移到内容寻址路径
+    import uuid as uuid_module
+    file_id = uuid_module.uuid4()
+    temp_path = os.path.join(settings.audio_storage_path, "tmp", f"{session_id}_{file_id}.{format}")
+
+    try:
+        stored = await save_stream(chunks, temp_path, format)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    stored.file_path = audio_blob_store.commit_local(db, temp_path, stored.sha256, f".{format}")
+
+    # 创建数据库记录（哈希、大小、时长在写入时已算好）
+    audio_file = AudioFile(
+        id=file_id,
+        session_id=session_id,
+        file_path=stored.file_path,
+        file_size=stored.size,
+        content_hash=stored.sha256,
+        duration_seconds=stored.duration_seconds,
+        format=format,
+        asr_status=ASRStatus.PENDING.value
+    )
+    db.add(audio_file)
+    db.commit()
+    db.refresh(audio_file)
+
+    logger.info(f"音频文件上传成功: {stored.file_path}, size={stored.size}, sha256={stored.sha256[:12]}")
+
+    return audio_file
+
+
 @router.post("/upload", response_model=AudioUploadResponse)
 async def upload_audio(
     session_id: UUID = Form(...),
@@ -45,7 +140,8 @@ async def upload_audio(
     上传音频文件
 
     支持的格式：PCM, WAV, MP3, WebM
-    音频将保存到本地存储，并创建AudioFile记录。
+    音频按块写入本地存储（边写边计算 SHA-256），并创建AudioFile记录。
+    请求体大小由 AudioUploadLimitMiddleware 在解析之前限制。
     """
     # 验证session存在
     session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
@@ -61,92 +157,28 @@ async def upload_audio(
             detail=f"不支持的音频格式。支持的格式: {', '.join(allowed_extensions)}"
         )
 
-    # 确保存储目录存在
-    ensure_audio_storage_dir()
-
-    # 生成文件路径
-    import uuid as uuid_module
-    file_id = uuid_module.uuid4()
-    file_name = f"{session_id}_{file_id}{file_ext}"
-    file_path = os.path.join(settings.audio_storage_path, file_name)
-
-    # 保存文件
-    content = await file.read()
-    file_size = len(content)
-
-    with open(file_path, "wb") as f:
-        f.write(content)
-
-    # 创建数据库记录
-    audio_file = AudioFile(
-        id=file_id,
-        session_id=session_id,
-        file_path=file_path,
-        file_size=file_size,
-        format=file_ext.lstrip("."),
-        asr_status=ASRStatus.PENDING.value
-    )
-    db.add(audio_file)
-    db.commit()
-    db.refresh(audio_file)
-
-    logger.info(f"音频文件上传成功: {file_path}, size={file_size}")
-
-    return audio_file
+    return await store_audio(db, session_id, file_ext.lstrip("."), iter_upload_file(file))
 
 
 @router.post("/upload-base64", response_model=AudioUploadResponse)
 async def upload_audio_base64(
     session_id: UUID,
-    audio_data: str,
-    format: str = "pcm",
+    request: Request,
+    format: AudioFormat = AudioFormat.PCM,
     db: Session = Depends(get_db)
 ):
     """
     上传Base64编码的音频数据
 
-    适用于WebSocket场景，前端直接发送base64编码的音频。
+    请求体为 Base64 文本（可带 data URL 前缀），服务端边接收边解码写入磁盘，不在内存中缓存整个负载。
+    请求体大小由 AudioUploadLimitMiddleware 在读取过程中限制。
     """
     # 验证session存在
     session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    # 解码音频数据
-    try:
-        audio_bytes = base64.b64decode(audio_data)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"无效的Base64数据: {e}")
-
-    # 确保存储目录存在
-    ensure_audio_storage_dir()
-
-    # 生成文件路径
-    import uuid as uuid_module
-    file_id = uuid_module.uuid4()
-    file_name = f"{session_id}_{file_id}.{format}"
-    file_path = os.path.join(settings.audio_storage_path, file_name)
-
-    # 保存文件
-    with open(file_path, "wb") as f:
-        f.write(audio_bytes)
-
-    # 创建数据库记录
-    audio_file = AudioFile(
-        id=file_id,
-        session_id=session_id,
-        file_path=file_path,
-        file_size=len(audio_bytes),
-        format=format,
-        asr_status=ASRStatus.PENDING.value
-    )
-    db.add(audio_file)
-    db.commit()
-    db.refresh(audio_file)
-
-    logger.info(f"Base64音频上传成功: {file_path}, size={len(audio_bytes)}")
-
-    return audio_file
+    return await store_audio(db, session_id, format.value, decode_base64_stream(request.stream()))
 
 
 @router.post("/{audio_id}/transcribe", response_model=TranscribeResponse)
@@ -154,6 +186,7 @@ async def transcribe_audio(
     audio_id: UUID,
     context_text: Optional[str] = None,
     language: str = "zh",
+    use_cache: bool = Query(True, description="是否复用相同录音的转写结果，false 强制重新转写"),
     db: Session = Depends(get_db)
 ):
     """
@@ -163,6 +196,7 @@ async def transcribe_audio(
         audio_id: 音频文件ID
         context_text: 上下文文本（可选，用于增强识别）
         language: 语言代码，默认中文
+        use_cache: 是否复用相同录音（当前 ASR 模型下）的转写结果
     """
     # 获取音频文件记录
     audio_file = db.query(AudioFile).filter(AudioFile.id == audio_id).first()
@@ -173,6 +207,29 @@ async def transcribe_audio(
     if not os.path.exists(audio_file.file_path):
         raise HTTPException(status_code=404, detail="Audio file not found on disk")
 
+    # 相同内容在当前模型下已转写过：直接复用结果，不再提交 ASR 任务
+    if use_cache:
+        cached = asr_result_cache.get(db, audio_file.content_hash, asr_service.model, require_oss=False)
+    else:
+        cached = None
+        asr_result_cache.record_bypass()
+    if cached is not None:
+        audio_file.asr_status = ASRStatus.COMPLETED.value
+        audio_file.asr_result = {
+            "transcript": cached.transcript,
+            "sentences": cached.sentences,
+            "model": asr_service.model
+        }
+        db.commit()
+        logger.info(f"ASR 结果复用: audio_id={audio_id}, 来源={cached.source_id}")
+        return TranscribeResponse(
+            audio_id=audio_id,
+            transcript=cached.transcript,
+            segments=cached.sentences,
+            duration=audio_file.duration_seconds or 0.0,
+            status=ASRStatus.COMPLETED.value
+        )
+
     # 更新状态为处理中
     audio_file.asr_status = ASRStatus.PROCESSING.value
     db.commit()
@@ -193,20 +250,26 @@ async def transcribe_audio(
                         jd_text=project.jd_text
                     )
 
-        # 调用ASR服务
-        result = await asr_service.transcribe_audio(
-            audio_path=audio_file.file_path,
+        # 调用ASR服务（上面已查询过缓存；异步读取文件，不阻塞事件循环）
+        async with await anyio.open_file(audio_file.file_path, "rb") as f:
+            audio_data = await f.read()
+        result, _ = await asr_service.transcribe_audio_bytes(
+            audio_data,
             context_text=context_text,
-            language=language
+            language=language,
+            content_hash=audio_file.content_hash,
+            use_cache=False
         )
 
         # 更新数据库记录
         audio_file.asr_status = ASRStatus.COMPLETED.value
         audio_file.asr_result = {
             "transcript": result.transcript,
+            "sentences": result.sentences,
             "segments": result.segments,
             "emotions": result.emotions,
-            "duration": result.duration
+            "duration": result.duration,
+            "model": asr_service.model
         }
         db.commit()
 
@@ -277,8 +340,8 @@ async def delete_audio(audio_id: UUID, db: Session = Depends(get_db)):
     if not audio_file:
         raise HTTPException(status_code=404, detail="Audio file not found")
 
-    # 删除物理文件
-    if os.path.exists(audio_file.file_path):
+    # 内容寻址的文件可能被其他记录共用：只释放引用（触发器减少计数），降为 0 后由清理任务删除
+    if not audio_file.content_hash and os.path.exists(audio_file.file_path):
         os.remove(audio_file.file_path)
 
     # 删除数据库记录
@@ -300,6 +363,7 @@ async def get_audio_url(
     获取音频文件的签名 URL（用于回放）
 
     返回一个有时效的 OSS 签名 URL，客户端可以直接用于音频播放。
+    URL 按有效期档位缓存，expires_in 返回的是实际剩余有效期。
     """
     audio_file = db.query(AudioFile).filter(AudioFile.id == audio_id).first()
     if not audio_file:
@@ -308,10 +372,8 @@ async def get_audio_url(
     if not audio_file.oss_key:
         raise HTTPException(status_code=404, detail="Audio not available in OSS")
 
-    # 生成签名 URL
-    from services.oss_service import oss_service
     try:
-        signed_url = oss_service.get_signed_url(audio_file.oss_key, expires_in)
+        signed_url, remaining = signed_url_cache.get(audio_file.oss_key, expires_in)
     except Exception as e:
         logger.error(f"生成签名 URL 失败: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to generate signed URL: {e}")
@@ -319,12 +381,51 @@ async def get_audio_url(
     return {
         "audio_id": str(audio_id),
         "url": signed_url,
-        "expires_in": expires_in
+        "expires_in": remaining
     }
 
 
+@router.post("/urls", response_model=AudioURLBatchResponse)
+def get_audio_urls(
+    request: AudioURLBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    批量获取音频签名 URL（用于渲染一页历史消息）
+
+    一次查询取出当前用户名下所有音频的 oss_key，签名走缓存；
+    不存在、不属于当前用户或已不在 OSS 上的音频列入 missing。
+    """
+    rows = db.query(AudioFile.id, AudioFile.oss_key).join(
+        SessionModel, AudioFile.session_id == SessionModel.id
+    ).join(
+        Project, SessionModel.project_id == Project.id
+    ).filter(
+        AudioFile.id.in_(request.audio_file_ids),
+        Project.user_id == current_user.id
+    ).all()
+    oss_keys = {str(row.id): row.oss_key for row in rows if row.oss_key}
+
+    urls = {}
+    missing = []
+    for audio_id in dict.fromkeys(str(i) for i in request.audio_file_ids):
+        oss_key = oss_keys.get(audio_id)
+        if not oss_key:
+            missing.append(audio_id)
+            continue
+        try:
+            url, remaining = signed_url_cache.get(oss_key, request.expires_in)
+        except Exception as e:
+            logger.error(f"生成签名 URL 失败: audio_id={audio_id}, {e}")
+            raise HTTPException(status_code=500, detail=f"Failed to generate signed URL: {e}")
+        urls[audio_id] = AudioURLItem(url=url, expires_in=remaining)
+
+    return AudioURLBatchResponse(urls=urls, missing=missing)
+
+
 @router.post("/cleanup")
-async def trigger_cleanup(
+def trigger_cleanup(
     batch_size: int = Query(100, ge=1, le=1000, description="每批处理数量"),
     db: Session = Depends(get_db)
 ):
@@ -332,6 +433,7 @@ async def trigger_cleanup(
     手动触发清理过期音频文件
 
     可由 cron job 定期调用，删除超过保留期限的音频文件。
+    同步数据库操作和 OSS 批量删除在线程池中执行，不阻塞事件循环。
     """
     from services.cleanup_service import cleanup_service
 
@@ -1,7 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, tuple_
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from uuid import UUID
+from datetime import datetime
+import base64
 
 from database import get_db
 from models import Message
@@ -10,43 +13,104 @@ from schemas.message import MessageCreate, MessageResponse, MessageListResponse
 router = APIRouter(prefix="/api/messages", tags=["messages"])
 
 
+def encode_cursor(created_at: datetime, message_id: UUID) -> str:
+    """把 (created_at, id) 编码为不透明的分页游标"""
+    raw = f"{created_at.isoformat()}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """解析分页游标"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, message_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(message_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# 轻量模式下返回的列（不含 feedback / chunks / meta 等大字段）
+LIGHT_COLUMNS = (
+    Message.id,
+    Message.session_id,
+    Message.role,
+    Message.content,
+    Message.message_type,
+    Message.audio_file_id,
+    Message.transcript,
+    Message.created_at,
+)
+
+
 @router.get("", response_model=MessageListResponse)
 def list_messages(
     session_id: UUID = Query(..., description="会话 ID（必填）"),
     limit: int = Query(20, ge=1, le=100, description="每页数量"),
-    offset: int = Query(0, ge=0, description="偏移量"),
-    order: str = Query("desc", regex="^(asc|desc)$", description="排序方式：desc=最新优先，asc=最早优先"),
+    before: Optional[str] = Query(None, description="游标：返回早于该游标的消息（向上翻页）"),
+    after: Optional[str] = Query(None, description="游标：返回晚于该游标的消息（向下翻页）"),
+    offset: int = Query(0, ge=0, description="偏移量（已废弃，请使用 before/after 游标）"),
+    order: str = Query("desc", regex="^(asc|desc)$", description="无游标时的起点：desc=最新的一页，asc=最早的一页"),
+    with_total: bool = Query(False, description="是否返回消息总数（额外一次 COUNT 查询）"),
+    fields: str = Query("full", regex="^(full|light)$", description="full=完整消息，light=不含 feedback/meta 等大字段"),
     db: Session = Depends(get_db)
 ):
     """
-    获取分页消息列表
+    获取分页消息列表（基于 (created_at, id) 的游标分页）
 
-    - order=desc: 最新消息优先（用于初始加载，获取最近的消息）
-    - order=asc: 最早消息优先（用于加载更早的消息）
+    - 初始加载：order=desc 获取最近一页；之后用响应中的 before_cursor 继续加载更早的消息
+    - after 游标用于向下翻页（加载更新的消息）
+    - 每页耗时只与 limit 有关，与会话历史长度无关（走 (session_id, created_at, id) 复合索引）
+    - 返回的 messages 始终按时间正序排列
     """
-    query = db.query(Message).filter(Message.session_id == session_id)
+    if before and after:
+        raise HTTPException(status_code=400, detail="before and after cannot be used together")
 
-    # 获取总数
-    total = query.count()
+    if fields == "light":
+        query = db.query(*LIGHT_COLUMNS)
+    else:
+        query = db.query(Message)
+    query = query.filter(Message.session_id == session_id)
+
+    key = tuple_(Message.created_at, Message.id)
+    if before:
+        query = query.filter(key < tuple_(*decode_cursor(before)))
+        descending = True
+    elif after:
+        query = query.filter(key > tuple_(*decode_cursor(after)))
+        descending = False
+    else:
+        descending = order == "desc"
 
-    # 应用排序和分页
-    if order == "desc":
-        query = query.order_by(Message.created_at.desc())
+    if descending:
+        query = query.order_by(Message.created_at.desc(), Message.id.desc())
     else:
-        query = query.order_by(Message.created_at.asc())
+        query = query.order_by(Message.created_at.asc(), Message.id.asc())
+
+    if offset and not (before or after):
+        # 兼容旧客户端的偏移量分页
+        query = query.offset(offset)
+
+    # 多取一条用于判断是否还有更多
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
 
-    messages = query.offset(offset).limit(limit).all()
+    # 按时间正序返回
+    if descending:
+        rows = list(reversed(rows))
 
-    # 如果是 desc 排序，反转结果以返回时间顺序
-    if order == "desc":
-        messages = list(reversed(messages))
+    total = None
+    if with_total:
+        total = db.query(func.count(Message.id)).filter(Message.session_id == session_id).scalar()
 
     return MessageListResponse(
-        messages=messages,
+        messages=[MessageResponse.model_validate(row) for row in rows],
         total=total,
         limit=limit,
         offset=offset,
-        has_more=offset + limit < total
+        has_more=has_more,
+        before_cursor=encode_cursor(rows[0].created_at, rows[0].id) if rows else None,
+        after_cursor=encode_cursor(rows[-1].created_at, rows[-1].id) if rows else None
     )
 
 
@@ -4,9 +4,9 @@ from typing import List
 from uuid import UUID
 
 from database import get_db
-from models import Project, User
-from schemas import ProjectCreate, ProjectUpdate, ProjectResponse
-from services.pdf_parser import extract_text_from_pdf
+from models import Project, User, ResumeParseJob
+from schemas import ProjectCreate, ProjectUpdate, ProjectResponse, ResumeParseJobResponse
+from services.resume_parser import resume_parser_service
 from dependencies.auth import get_current_user
 
 router = APIRouter(prefix="/api/projects", tags=["projects"])
@@ -97,14 +97,18 @@ def delete_project(
     return {"message": "Project deleted successfully"}
 
 
-@router.post("/{project_id}/upload-resume", response_model=ProjectResponse)
+@router.post("/{project_id}/upload-resume", response_model=ResumeParseJobResponse, status_code=202)
 async def upload_resume(
     project_id: UUID,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Upload and parse resume PDF"""
+    """
+    Upload resume PDF and start parsing in the background
+
+    Returns the parse job; poll GET /{project_id}/resume-jobs/{job_id} until it finishes.
+    """
     db_project = db.query(Project).filter(
         Project.id == project_id,
         Project.user_id == current_user.id
@@ -120,17 +124,27 @@ async def upload_resume(
     import os
     os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
+    content = await file.read()
     with open(file_path, "wb") as f:
-        content = await file.read()
         f.write(content)
 
-    # Extract text
-    resume_text = extract_text_from_pdf(file_path)
+    # Parse in the process pool (cached by content hash)
+    return await resume_parser_service.submit(project_id, file_path, content)
 
-    # Update project
-    db_project.resume_file_path = file_path
-    db_project.resume_text = resume_text
-    db.commit()
-    db.refresh(db_project)
 
-    return db_project
+@router.get("/{project_id}/resume-jobs/{job_id}", response_model=ResumeParseJobResponse)
+def get_resume_job(
+    project_id: UUID,
+    job_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get resume parse job status"""
+    job = db.query(ResumeParseJob).join(Project).filter(
+        ResumeParseJob.id == job_id,
+        ResumeParseJob.project_id == project_id,
+        Project.user_id == current_user.id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Resume parse job not found")
+    return job
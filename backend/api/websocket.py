@@ -6,20 +6,27 @@ WebSocket 聊天端点
 """
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 from datetime import datetime
 import json
 import logging
 import re
 import asyncio
+import base64
 
 from langsmith import traceable
 
-from database import get_db
+from database import db_unit_of_work
 from models import Message, Session as SessionModel, Project, Asset, User
 from services.websocket_manager import manager
 from services.callback_registry import register_callback, unregister_callback
+from services.realtime_asr_service import realtime_asr_service, RealtimeASRSession
+from services.audio_upload import AudioUploadBuffer
+from services.message_writer import message_writer
+from services.oss_service import oss_service
+from config import settings
 from agents.graph import process_message
 from agents.subagents.chat import chat_subagent, extract_optimized_answer
 from dependencies.auth import get_user_from_token
@@ -33,11 +40,12 @@ router = APIRouter()
 cancel_flags: dict[str, asyncio.Event] = {}
 # 存储每个会话当前正在执行的处理任务
 processing_tasks: dict[str, asyncio.Task] = {}
+# 直传录音的内容哈希（浏览器计算的 SHA-256 十六进制）
+SHA256_HEX_RE = re.compile(r"[0-9a-f]{64}")
 
 
 async def handle_stream_response(
     websocket: WebSocket,
-    db: Session,
     session_id: str,
     project_id: str | None,
     result: dict,
@@ -50,7 +58,6 @@ async def handle_stream_response(
 
     Args:
         websocket: WebSocket 连接
-        db: 数据库会话
         session_id: 会话 ID
         project_id: 项目 ID
         result: LangGraph 返回的结果
@@ -112,8 +119,15 @@ async def handle_stream_response(
         except Exception as e:
             logger.warning(f"创建 LangSmith RunTree 失败: {e}")
 
+    # 投机执行命中时直接消费预启动的流（已缓存的 token 立即输出）
+    speculative_stream = result.get("speculative_stream")
+    if speculative_stream:
+        chunk_stream = speculative_stream.stream()
+    else:
+        chunk_stream = chat_subagent.get_stream_generator(stream_state)
+
     try:
-        async for chunk in chat_subagent.get_stream_generator(stream_state):
+        async for chunk in chunk_stream:
             # 检查是否被取消
             if cancel_event.is_set():
                 logger.info(f"流式输出被取消: session_id={session_id}")
@@ -130,11 +144,13 @@ async def handle_stream_response(
     except asyncio.CancelledError:
         # 任务被取消，保存已生成的内容到数据库，然后发送给前端
         logger.info(f"流式输出任务被取消: session_id={session_id}, 已生成 {len(full_content)} 字符")
+        if speculative_stream:
+            await speculative_stream.cancel(miss=False)
 
         # 保存已生成的部分内容到数据库（如果有内容）
         if full_content.strip():
-            cancelled_message = Message(
-                session_id=UUID(session_id),
+            cancelled_message = message_writer.add(
+                session_id=session_id,
                 role="assistant",
                 content=full_content,
                 message_type="chat",
@@ -144,8 +160,6 @@ async def handle_stream_response(
                     "intent": result.get("intent")
                 }
             )
-            db.add(cancelled_message)
-            db.commit()
             logger.info(f"已保存取消的消息: {len(full_content)} 字符")
 
         try:
@@ -187,10 +201,12 @@ async def handle_stream_response(
 
     # 如果被取消（通过 cancel_event），保存并发送取消确认消息
     if cancelled:
+        if speculative_stream:
+            await speculative_stream.cancel(miss=False)
         # 保存已生成的部分内容到数据库（如果有内容）
         if full_content.strip():
-            cancelled_message = Message(
-                session_id=UUID(session_id),
+            cancelled_message = message_writer.add(
+                session_id=session_id,
                 role="assistant",
                 content=full_content,
                 message_type="chat",
@@ -200,8 +216,6 @@ async def handle_stream_response(
                     "intent": result.get("intent")
                 }
             )
-            db.add(cancelled_message)
-            db.commit()
             logger.info(f"已保存取消的消息: {len(full_content)} 字符")
 
         await websocket.send_json({
@@ -250,8 +264,8 @@ async def handle_stream_response(
             logger.info(f"已生成待保存数据: question={extracted_question[:30]}...")
 
     # 保存 AI 回复到消息表
-    ai_message = Message(
-        session_id=UUID(session_id),
+    ai_message = message_writer.add(
+        session_id=session_id,
         role="assistant",
         content=full_content,
         message_type="chat",
@@ -263,9 +277,17 @@ async def handle_stream_response(
             "saved": False
         }
     )
-    db.add(ai_message)
-    db.commit()
-    db.refresh(ai_message)
+
+    # 完整回复写入上下文历史，并在后台更新摘要（不阻塞本轮回复）
+    from services.context_manager import context_manager
+    await context_manager.add_message(
+        session_id,
+        "assistant",
+        full_content,
+        "chat",
+        timestamp=ai_message.created_at.strftime("%m-%d %H:%M") if ai_message.created_at else None
+    )
+    context_manager.schedule_summary(session_id)
 
     # 发送流式结束消息
     await websocket.send_json({
@@ -284,6 +306,44 @@ async def handle_stream_response(
     return True
 
 
+async def find_latest_recording_prompt_id(session_id: str) -> UUID | None:
+    """查询会话中最近的 recording_prompt 消息 ID（先写入缓冲，保证能查到刚入队的消息）"""
+    await message_writer.flush(session_id)
+    async with db_unit_of_work() as db:
+        result = await db.execute(
+            select(Message.id)
+            .where(
+                Message.session_id == UUID(session_id),
+                Message.message_type == "recording_prompt"
+            )
+            .order_by(Message.created_at.desc())
+            .limit(1)
+        )
+        return result.scalar()
+
+
+def is_session_upload_key(session_id: str, key: str) -> bool:
+    """校验直传音频 key 是否为本会话签发的格式（audio/uploads/{session_id}/{uuid}.webm）"""
+    prefix = re.escape(oss_service.upload_key_prefix(session_id))
+    return re.fullmatch(prefix + r"[0-9a-f-]{36}\.webm", key) is not None
+
+
+async def receive_frame(websocket: WebSocket) -> tuple[str | None, bytes | None]:
+    """
+    接收一帧消息（文本或二进制）
+
+    Returns:
+        (text, bytes)，二者只有一个不为 None
+
+    Raises:
+        WebSocketDisconnect: 客户端断开
+    """
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    return message.get("text"), message.get("bytes")
+
+
 @router.websocket("/ws/chat/{session_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
@@ -303,6 +363,29 @@ async def websocket_endpoint(
         "timestamp": "2026-01-24T12:00:00Z"
     }
 
+    实时语音（边录边识别，recording_start 携带 "realtime_asr": true 时可用）:
+    {
+        "type": "audio_chunk",
+        "audio": "base64音频帧（默认 16kHz 单声道 PCM）",
+        "format": "pcm",          # 仅首帧生效
+        "sample_rate": 16000,     # 仅首帧生效
+        "is_first": true,         # 首帧置为 true，建立新的识别会话（重新录音时丢弃上一次未提交的会话）
+        "is_last": false          # 提交时发送 is_last 为 true 的帧（可不带音频），触发 STAR 分析
+    }
+    录音过程中服务器推送 {"type": "transcription", "transcription": {"text": "...", "is_final": false}}
+    识别失败时推送 {"type": "error", "realtime_asr": false, ...}，客户端应改为提交完整录音。
+    只有 PCM 帧会在录音结束后封装为 WAV 保存（可回放），其他格式仅做识别。
+
+    录音上传（浏览器直传 OSS）:
+    recording_start 消息携带 upload: {"url", "key", "method", "headers", "expires_in"}，
+    客户端用签名 URL 直接 PUT 录音到 OSS，然后发送 {"type": "submit_audio", "oss_key": key, "content_hash": sha256}。
+    content_hash 可选，服务端下载对象校验一致后才用于转写结果缓存和内容寻址去重。
+
+    录音上传（二进制帧协议，直传不可用时的回退）:
+    先发送 JSON 头 {"type": "audio_upload", "size": 音频字节数}，
+    随后发送二进制帧（原始音频字节），累计达到 size 后自动提交。
+    提交时可带 "asr_cache": false，不复用相同录音的转写结果、强制重新转写。
+
     服务器 -> 客户端:
     {
         "type": "assistant_message" | "recording_start" | "transcription" | "feedback" | "error",
@@ -317,99 +400,104 @@ async def websocket_endpoint(
     # 连接 WebSocket
     await manager.connect(websocket, session_id)
 
-    # 获取数据库会话
-    db = next(get_db())
-
-    # 验证 Token (使用自建 JWT)
-    current_user = None
-    if token:
-        try:
-            valid, token_data, _ = auth_service.verify_token(token)
-            if valid and token_data:
-                from uuid import UUID as PyUUID
-                current_user = auth_service.get_user_by_id(db, PyUUID(token_data.sub))
-        except Exception as e:
-            logger.error(f"Token verification failed: {e}")
-
-    if not current_user:
-        await websocket.send_json({
-            "type": "error",
-            "error": "未授权，请先登录",
-            "timestamp": datetime.now().isoformat()
-        })
-        await websocket.close(code=4001)
-        return
-
-    # 验证 session 是否存在
-    session = db.query(SessionModel).filter(SessionModel.id == UUID(session_id)).first()
-    if not session:
-        await websocket.send_json({
-            "type": "error",
-            "error": "会话不存在",
-            "timestamp": datetime.now().isoformat()
-        })
-        await websocket.close()
-        return
+    # 连接阶段的校验和上下文加载在一个工作单元内完成，之后空闲连接不再占用数据库连接
+    from services.context_manager import context_manager
 
-    # 获取项目信息并验证所有权
+    error = None  # (错误信息, 关闭码)
     project = None
     resume_text = None
     jd_text = None
     practice_questions = []
 
-    if session.project_id:
-        project = db.query(Project).filter(
-            Project.id == session.project_id,
-            Project.user_id == current_user.id
-        ).first()
-        if not project:
-            await websocket.send_json({
-                "type": "error",
-                "error": "无权访问此会话",
-                "timestamp": datetime.now().isoformat()
-            })
-            await websocket.close(code=4003)
-            return
-        resume_text = project.resume_text
-        jd_text = project.jd_text
-        practice_questions = project.practice_questions or []
+    # 上一个连接缓冲中未落库的消息先写入，保证加载到完整的历史
+    await message_writer.flush(session_id)
 
-    # 从数据库加载历史消息到 ContextManager
-    from services.context_manager import context_manager
+    async with db_unit_of_work() as db:
+        # 验证 Token (使用自建 JWT)
+        current_user = None
+        if token:
+            try:
+                valid, token_data, _ = auth_service.verify_token(token)
+                if valid and token_data:
+                    from uuid import UUID as PyUUID
+                    current_user = await auth_service.get_user_by_id_async(db, PyUUID(token_data.sub))
+            except Exception as e:
+                logger.error(f"Token verification failed: {e}")
+
+        if not current_user:
+            error = ("未授权，请先登录", 4001)
+        else:
+            # 验证 session 是否存在
+            session = await db.get(SessionModel, UUID(session_id))
+            if not session:
+                error = ("会话不存在", 1000)
+            elif session.project_id:
+                # 获取项目信息并验证所有权
+                result = await db.execute(
+                    select(Project).where(
+                        Project.id == session.project_id,
+                        Project.user_id == current_user.id
+                    )
+                )
+                project = result.scalars().first()
+                if not project:
+                    error = ("无权访问此会话", 4003)
+                else:
+                    resume_text = project.resume_text
+                    jd_text = project.jd_text
+                    practice_questions = project.practice_questions or []
 
-    db_messages = db.query(Message).filter(
-        Message.session_id == UUID(session_id)
-    ).order_by(Message.created_at).all()
+        if error is None:
+            # 加载会话上下文（缓存命中时复用，否则只加载最近的消息窗口）
+            history_count = await context_manager.load_session(session_id, db)
+            logger.info(f"已加载 {history_count} 条历史消息到 ContextManager")
 
-    context_manager.init_history_from_db(
-        session_id=session_id,
-        messages=[
-            {
-                "role": msg.role,
-                "content": msg.content,
-                "message_type": msg.message_type,
-                "timestamp": msg.created_at.strftime("%m-%d %H:%M") if msg.created_at else None
-            }
-            for msg in db_messages
-        ]
-    )
-    logger.info(f"已加载 {len(db_messages)} 条历史消息到 ContextManager")
+    if error:
+        await websocket.send_json({
+            "type": "error",
+            "error": error[0],
+            "timestamp": datetime.now().isoformat()
+        })
+        await websocket.close(code=error[1])
+        return
+
+    project_id = str(project.id) if project else None
 
     # 当前状态
     current_question = None
     # 当前处理任务
     current_processing_task: asyncio.Task | None = None
+    # 实时语音识别会话（audio_chunk 流式上传时使用）
+    realtime_asr: RealtimeASRSession | None = None
+    # 进行中的二进制音频上传（及其头部携带的 asr_cache 选项）
+    audio_upload: AudioUploadBuffer | None = None
+    audio_upload_use_cache = True
+    # 本连接最近一条 recording_prompt 消息 ID（提交/取消时更新其 meta）
+    recording_prompt_id: UUID | None = None
+
+    async def send_partial_transcript(text: str):
+        """推送实时识别的中间结果"""
+        await websocket.send_json({
+            "type": "transcription",
+            "transcription": {"text": text, "is_final": False},
+            "agent_status": {"current_agent": "interviewer", "status": "recording"},
+            "timestamp": datetime.now().isoformat()
+        })
 
     # 定义消息处理函数
     async def process_and_respond(
         input_type: str,
         user_input: str,
-        audio_data: str | None,
+        audio_data: bytes | bytearray | None,
         message_context: dict | None,
-        cq: str | None  # current_question
+        cq: str | None,  # current_question
+        realtime_session: RealtimeASRSession | None = None,  # 已结束录音、待取最终结果的实时识别会话
+        audio_key: str | None = None,  # 浏览器直传到 OSS 的音频 key
+        audio_content_hash: str | None = None,  # 浏览器计算的直传音频 SHA-256
+        asr_use_cache: bool = True  # 是否复用相同录音的转写结果
     ) -> str | None:
         """处理消息并发送响应，返回更新后的 current_question"""
-        nonlocal current_question
+        nonlocal current_question, recording_prompt_id
 
         # 重置取消标志
         if session_id not in cancel_flags:
@@ -432,20 +520,18 @@ async def websocket_endpoint(
                 "agent_status": {"current_agent": "interviewer", "status": "analyzing"},
                 "timestamp": datetime.now().isoformat()
             })
-            user_answer = Message(
-                session_id=UUID(session_id),
+            user_answer = message_writer.add(
+                session_id=session_id,
                 role="user",
                 content=transcript,
                 message_type="voice_answer",
-                audio_file_id=UUID(audio_file_id) if audio_file_id else None,
+                audio_file_id=audio_file_id,
                 transcript=transcript,
                 meta={
                     "question": current_question,
                     "transcript_sentences": transcript_sentences
                 }
             )
-            db.add(user_answer)
-            db.commit()
 
         register_callback(session_id, "on_transcription", on_transcription_callback)
 
@@ -475,22 +561,43 @@ async def websocket_endpoint(
         register_callback(session_id, "on_feedback_stream_end", on_feedback_stream_end_callback)
 
         try:
+            transcript = None
+            if realtime_session is not None:
+                # 实时语音：在处理任务中等待最终识别结果，不阻塞消息接收循环
+                transcript = await realtime_session.finish()
+                if not transcript:
+                    await websocket.send_json({
+                        "type": "error",
+                        "content": "未能识别到语音内容，请重新录音。",
+                        "error": "empty transcript",
+                        "timestamp": datetime.now().isoformat()
+                    })
+                    return cq
+                # 录音帧封装为 WAV，随转写文本一起保存为 AudioFile 以供回放
+                audio_data = realtime_session.wav_bytes()
+
             result = await process_message(
                 session_id=session_id,
                 user_input=user_input,
                 input_type=input_type,
                 audio_data=audio_data,
+                audio_key=audio_key,
+                audio_content_hash=audio_content_hash,
+                asr_use_cache=asr_use_cache,
                 resume_text=resume_text,
                 jd_text=jd_text,
                 practice_questions=practice_questions,
-                project_id=str(project.id) if project else None,
+                project_id=project_id,
                 current_question=cq,
-                message_context=message_context
+                message_context=message_context,
+                transcript=transcript
             )
 
             # 检查是否被取消
             if cancel_flags.get(session_id) and cancel_flags[session_id].is_set():
                 logger.info(f"处理被取消，跳过响应: session_id={session_id}")
+                if result.get("speculative_stream"):
+                    await result["speculative_stream"].cancel(miss=False)
                 return cq
 
             new_question = result.get("current_question") or cq
@@ -501,19 +608,26 @@ async def websocket_endpoint(
             if response_type == "recording_start":
                 question = response_metadata.get("question", new_question)
                 # 保存 recording_prompt 消息到数据库
-                recording_prompt_message = Message(
-                    session_id=UUID(session_id),
+                recording_prompt_message = message_writer.add(
+                    session_id=session_id,
                     role="assistant",
                     content=response_text,
                     message_type="recording_prompt",
                     meta={"question": question}
                 )
-                db.add(recording_prompt_message)
-                db.commit()
+                recording_prompt_id = recording_prompt_message.id
+                # 签发浏览器直传的签名 URL（本地计算签名，不访问 OSS）
+                try:
+                    upload = oss_service.presign_audio_upload(session_id)
+                except Exception as e:
+                    logger.warning(f"生成直传签名 URL 失败，客户端将回退为 WebSocket 上传: {e}")
+                    upload = None
                 await websocket.send_json({
                     "type": "recording_start",
                     "content": response_text,
                     "recording": {"question": question},
+                    "upload": upload,
+                    "realtime_asr": settings.realtime_asr_enabled,
                     "agent_status": {"current_agent": "interviewer", "status": "recording"},
                     "timestamp": datetime.now().isoformat()
                 })
@@ -523,30 +637,21 @@ async def websocket_endpoint(
                 asset_id = result.get("asset_id")
                 audio_file_id = result.get("audio_file_id")
 
-                # 更新对应的 recording_prompt 消息为已提交状态
-                recording_prompt_msg = db.query(Message).filter(
-                    Message.session_id == UUID(session_id),
-                    Message.message_type == "recording_prompt"
-                ).order_by(Message.created_at.desc()).first()
-                if recording_prompt_msg:
-                    meta = recording_prompt_msg.meta or {}
-                    meta["submitted"] = True
-                    recording_prompt_msg.meta = meta
-                    from sqlalchemy.orm.attributes import flag_modified
-                    flag_modified(recording_prompt_msg, "meta")
-
                 # 使用 raw_content 作为消息内容
                 feedback_content = feedback.get("raw_content", "分析完成")
-                feedback_message = Message(
-                    session_id=UUID(session_id),
+                message_writer.add(
+                    session_id=session_id,
                     role="assistant",
                     content=feedback_content,
                     message_type="feedback",
                     feedback=feedback,
                     meta={"question": new_question, "asset_id": asset_id, "audio_file_id": audio_file_id}
                 )
-                db.add(feedback_message)
-                db.commit()
+                # 更新对应的 recording_prompt 消息为已提交状态
+                prompt_id = recording_prompt_id or await find_latest_recording_prompt_id(session_id)
+                if prompt_id:
+                    message_writer.patch_meta(session_id, prompt_id, {"submitted": True})
+                recording_prompt_id = None
                 # 发送流式结束消息（流式内容已通过回调发送）
                 await websocket.send_json({
                     "type": "feedback_stream_end",
@@ -573,24 +678,21 @@ async def websocket_endpoint(
                 if stream_enabled:
                     await handle_stream_response(
                         websocket=websocket,
-                        db=db,
                         session_id=session_id,
-                        project_id=str(project.id) if project else None,
+                        project_id=project_id,
                         result=result,
                         save_asset=save_asset,
                         langsmith_trace_id=result.get("langsmith_trace_id"),
                         langsmith_parent_run_id=result.get("langsmith_parent_run_id")
                     )
                 else:
-                    ai_message = Message(
-                        session_id=UUID(session_id),
+                    ai_message = message_writer.add(
+                        session_id=session_id,
                         role="assistant",
                         content=response_text,
                         message_type="chat",
                         meta={"mode": result.get("current_mode", "idle")}
                     )
-                    db.add(ai_message)
-                    db.commit()
                     await websocket.send_json({
                         "type": "assistant_message",
                         "content": response_text,
@@ -620,7 +722,7 @@ async def websocket_endpoint(
         while True:
             # 如果有正在执行的任务，使用 asyncio.wait 并发等待
             if current_processing_task and not current_processing_task.done():
-                receive_task = asyncio.create_task(websocket.receive_text())
+                receive_task = asyncio.create_task(receive_frame(websocket))
                 done, pending = await asyncio.wait(
                     {receive_task, current_processing_task},
                     return_when=asyncio.FIRST_COMPLETED
@@ -640,7 +742,7 @@ async def websocket_endpoint(
 
                 # 如果收到新消息
                 if receive_task in done:
-                    data = receive_task.result()
+                    text_frame, binary_frame = receive_task.result()
                 else:
                     # 取消未完成的接收任务
                     receive_task.cancel()
@@ -651,50 +753,107 @@ async def websocket_endpoint(
                     continue
             else:
                 # 没有正在执行的任务，直接接收消息
-                data = await websocket.receive_text()
+                text_frame, binary_frame = await receive_frame(websocket)
 
-            message_data = json.loads(data)
+            audio_data = None
+            if binary_frame is not None:
+                # 二进制帧：写入当前上传缓冲区
+                if audio_upload is None:
+                    logger.warning("收到未声明的二进制帧，已忽略")
+                    continue
+                try:
+                    audio_upload.feed(binary_frame)
+                except ValueError as e:
+                    logger.error(f"音频上传失败: {e}")
+                    audio_upload = None
+                    await websocket.send_json({
+                        "type": "error",
+                        "content": "音频上传失败，请重新录音。",
+                        "error": str(e),
+                        "timestamp": datetime.now().isoformat()
+                    })
+                    continue
+                if not audio_upload.complete:
+                    continue
+                # 接收完整，按 submit_audio 处理
+                audio_data = audio_upload.release()
+                audio_upload = None
+                message_data = {"type": "submit_audio", "asr_cache": audio_upload_use_cache}
+            else:
+                message_data = json.loads(text_frame)
             message_type = message_data.get("type")
             if message_type:
                 message_type = message_type.strip().lower()
 
             content = message_data.get("content", "")
-            audio_data = message_data.get("audio_data")
 
             logger.info(f"收到消息: type={message_type!r}, content={content[:50] if content else 'N/A'}...")
 
             input_type = "text"
             user_input = content
             message_context = message_data.get("context")
+            realtime_session = None
+            audio_key = None
+            audio_content_hash = None
+            asr_use_cache = message_data.get("asr_cache", True) is not False
 
             if message_type == "message":
                 input_type = "text"
                 user_input = content
-                user_message = Message(
-                    session_id=UUID(session_id),
+                user_message = message_writer.add(
+                    session_id=session_id,
                     role="user",
                     content=content,
                     message_type="chat",
                     meta={"context": message_context} if message_context else None
                 )
-                db.add(user_message)
-                db.commit()
 
-            elif message_type == "audio":
+            elif message_type == "audio_upload":
+                # 二进制上传开始：预分配缓冲区，等待后续二进制帧
+                try:
+                    audio_upload = AudioUploadBuffer(
+                        size=int(message_data.get("size", 0)),
+                        max_size=settings.max_audio_upload_bytes
+                    )
+                    audio_upload_use_cache = message_data.get("asr_cache", True) is not False
+                except ValueError as e:
+                    audio_upload = None
+                    await websocket.send_json({
+                        "type": "error",
+                        "content": str(e),
+                        "error": str(e),
+                        "timestamp": datetime.now().isoformat()
+                    })
+                continue
+
+            elif message_type in ("audio", "submit_audio"):
                 input_type = "audio"
                 user_input = ""
+                audio_key = message_data.get("oss_key")
+                if audio_key and not is_session_upload_key(session_id, audio_key):
+                    logger.warning(f"拒绝不属于本会话的音频 key: {audio_key}")
+                    await websocket.send_json({
+                        "type": "error",
+                        "content": "音频上传无效，请重新录音。",
+                        "error": "invalid oss_key",
+                        "timestamp": datetime.now().isoformat()
+                    })
+                    continue
+                if audio_key and SHA256_HEX_RE.fullmatch(message_data.get("content_hash") or ""):
+                    audio_content_hash = message_data["content_hash"]
+                if audio_data is None and message_data.get("audio_data"):
+                    # 兼容旧协议：base64 JSON
+                    audio_data = base64.b64decode(message_data["audio_data"])
 
             elif message_type == "user_message":
                 input_type = "text"
                 user_input = content
-                user_message = Message(
-                    session_id=UUID(session_id),
+                user_message = message_writer.add(
+                    session_id=session_id,
                     role="user",
                     content=content,
                     message_type="chat"
                 )
-                db.add(user_message)
-                db.commit()
 
             elif message_type == "start_voice_practice":
                 question = message_data.get("question")
@@ -702,7 +861,52 @@ async def websocket_endpoint(
                 user_input = f"我想练习这道题：{question}" if question else "开始练习"
                 current_question = question
 
-            elif message_type == "submit_audio":
+            elif message_type == "audio_chunk":
+                # 实时语音：首帧建立识别会话，之后逐帧转发；会话失败后的帧直接丢弃
+                try:
+                    if message_data.get("is_first"):
+                        if realtime_asr:
+                            await realtime_asr.close()
+                            realtime_asr = None
+                        if not settings.realtime_asr_enabled:
+                            raise RuntimeError("实时语音识别未启用")
+                        realtime_asr = await realtime_asr_service.open_session(
+                            on_partial=send_partial_transcript,
+                            sample_rate=message_data.get("sample_rate", 16000),
+                            audio_format=message_data.get("format", "pcm")
+                        )
+                    chunk = message_data.get("audio")
+                    if chunk and realtime_asr:
+                        await realtime_asr.send_audio(base64.b64decode(chunk))
+                except Exception as e:
+                    logger.error(f"实时语音识别失败: {e}")
+                    if realtime_asr:
+                        await realtime_asr.close()
+                        realtime_asr = None
+                    # 客户端仍在本地录音，收到 realtime_asr=false 后改为提交完整录音
+                    await websocket.send_json({
+                        "type": "error",
+                        "content": "实时语音识别不可用，提交后将转写完整录音。",
+                        "error": str(e),
+                        "realtime_asr": False,
+                        "timestamp": datetime.now().isoformat()
+                    })
+                    continue
+
+                if not message_data.get("is_last"):
+                    continue
+
+                if realtime_asr is None:
+                    await websocket.send_json({
+                        "type": "error",
+                        "content": "实时语音识别会话已失效，请重新录音。",
+                        "error": "realtime asr session not found",
+                        "timestamp": datetime.now().isoformat()
+                    })
+                    continue
+
+                # 录音结束：交给处理任务取最终转写文本，直接进入 STAR 分析
+                realtime_session, realtime_asr = realtime_asr, None
                 input_type = "audio"
                 user_input = ""
 
@@ -718,21 +922,14 @@ async def websocket_endpoint(
             elif message_type == "cancel_recording":
                 # 清除当前问题，避免下次消息仍被路由到 interviewer
                 current_question = None
+                if realtime_asr:
+                    await realtime_asr.close()
+                    realtime_asr = None
                 # 标记最近的未提交 recording_prompt 消息为已取消
-                recording_prompt_msg = db.query(Message).filter(
-                    Message.session_id == UUID(session_id),
-                    Message.message_type == "recording_prompt"
-                ).order_by(Message.created_at.desc()).first()
-
-                if recording_prompt_msg:
-                    meta = recording_prompt_msg.meta or {}
-                    if not meta.get("submitted"):  # 只有未提交的才能取消
-                        meta["cancelled"] = True
-                        recording_prompt_msg.meta = meta
-                        from sqlalchemy.orm.attributes import flag_modified
-                        flag_modified(recording_prompt_msg, "meta")
-                        db.commit()
-                        logger.info(f"Recording cancelled for message {recording_prompt_msg.id}")
+                prompt_id = recording_prompt_id or await find_latest_recording_prompt_id(session_id)
+                if prompt_id:
+                    message_writer.patch_meta(session_id, prompt_id, {"cancelled": True}, skip_if="submitted")
+                recording_prompt_id = None
                 continue
 
             elif message_type == "cancel":
@@ -770,14 +967,12 @@ async def websocket_endpoint(
                 input_type = "text"
                 user_input = content if content else ""
                 if content:
-                    user_message = Message(
-                        session_id=UUID(session_id),
+                    user_message = message_writer.add(
+                        session_id=session_id,
                         role="user",
                         content=content,
                         message_type="chat"
                     )
-                    db.add(user_message)
-                    db.commit()
 
             # 如果有正在执行的任务，先取消它
             if current_processing_task and not current_processing_task.done():
@@ -792,7 +987,12 @@ async def websocket_endpoint(
 
             # 创建新的处理任务
             current_processing_task = asyncio.create_task(
-                process_and_respond(input_type, user_input, audio_data, message_context, current_question)
+                process_and_respond(
+                    input_type, user_input, audio_data, message_context, current_question, realtime_session,
+                    audio_key=audio_key,
+                    audio_content_hash=audio_content_hash,
+                    asr_use_cache=asr_use_cache
+                )
             )
             processing_tasks[session_id] = current_processing_task
 
@@ -817,4 +1017,7 @@ async def websocket_endpoint(
             "timestamp": datetime.now().isoformat()
         })
     finally:
-        db.close()
+        if realtime_asr:
+            await realtime_asr.close()
+        # 断开时把缓冲中的消息写入数据库
+        await message_writer.flush(session_id)
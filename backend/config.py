@@ -6,6 +6,20 @@ class Settings(BaseSettings):
     # Database
     database_url: str
 
+    # 数据库连接池（同步、异步引擎各自独立）
+    db_pool_size: int = 10  # 常驻连接数
+    db_max_overflow: int = 20  # 高峰时额外允许的连接数
+    db_pool_timeout: float = 10.0  # 等待空闲连接的最长时间（秒）
+    db_pool_recycle: int = 1800  # 连接最长存活时间，避免被服务端/代理静默断开
+    db_pool_pre_ping: bool = True  # 取出连接前探测可用性
+
+    # 聊天消息 write-behind 持久化
+    message_journal_path: str = "./data/message_journal.jsonl"  # 写前日志（每个进程写 message_journal.{pid}-xxx.jsonl，崩溃后由新进程接管重放）
+    message_dead_letter_path: str = "./data/message_dead_letter.jsonl"  # 不可重试、已跳过的写操作
+    message_journal_fsync: bool = False  # 每次追加日志后 fsync
+    message_flush_interval: float = 0.1  # 缓冲的最长停留时间（秒）
+    message_flush_batch_size: int = 50  # 缓冲达到该条数时立即写入
+
     # LLM APIs
     openai_api_key: str
     anthropic_api_key: str
@@ -18,6 +32,34 @@ class Settings(BaseSettings):
     qwen_base_url: str = "https://dashscope.aliyuncs.com/compatible-mode/v1"
     qwen_supervisor_model: str = "qwen3.5-35b-a3b"  # Supervisor 使用的千问模型
 
+    # 分层意图路由（规则 → 本地分类器 → LLM）
+    intent_router_threshold: float = 0.8  # 本地判定的最低置信度，低于此值才调用 LLM
+    intent_classifier_path: str = "./data/intent_classifier.pkl"  # 本地分类器模型文件
+    routing_log_path: str = "./data/routing_log.jsonl"  # LLM 路由决策日志（分类器训练数据）
+    speculative_chat_enabled: bool = True  # 路由分析的同时预启动 interview_chat 流
+
+    # 会话上下文存储
+    context_store_backend: str = "database"  # "database" | "memory"
+    context_window_messages: int = 40  # 重连时从数据库加载的最近消息数
+    context_cache_max_sessions: int = 1000  # 内存中保留的会话上限（LRU 淘汰）
+    context_cache_ttl_seconds: int = 7200  # 会话空闲超过该时间后从内存淘汰
+
+    # Prompt 缓存：稳定内容放在前缀、易变内容放在末尾，提高 DeepSeek/Qwen 上下文缓存命中率
+    prompt_cache_layout: bool = True
+
+    # 资产版本逐字稿增量存储：每个谱系的最新版本和每 N 个版本保存全文，其余保存与后一版本的差异
+    asset_snapshot_interval: int = 10
+
+    # LLM HTTP 连接池（按 provider 共享）
+    llm_http2: bool = True  # 需要安装 h2
+    llm_max_connections: int = 50  # 每个 provider 的最大连接数
+    llm_max_keepalive_connections: int = 20  # 保持的空闲长连接数
+    llm_keepalive_expiry: float = 120.0  # 空闲连接保持时间（秒）
+    llm_connect_timeout: float = 5.0
+    llm_read_timeout: float = 120.0
+    llm_pool_timeout: float = 10.0  # 等待空闲连接的最长时间
+    llm_warmup_connections: int = 2  # 启动时每个 provider 预建的连接数
+
     # LangSmith (可选)
     langsmith_api_key: Optional[str] = None
     langsmith_project: str = "ai-interview-coach"
@@ -31,14 +73,48 @@ class Settings(BaseSettings):
     aliyun_access_key_secret: str
     aliyun_oss_bucket: str
     aliyun_oss_endpoint: str
+    aliyun_oss_scheme: str = "https"  # 本地模拟 OSS（fake_oss_server.py）时设为 http
+    oss_upload_url_expires_seconds: int = 900  # 浏览器直传签名 URL 的有效期
+    oss_max_concurrency: int = 8  # OSS 专用线程池大小
+    oss_max_retries: int = 3  # 异步接口的最大尝试次数
+    oss_retry_base_delay: float = 0.5  # 重试退避的基础间隔（秒），实际等待带随机抖动
+    oss_connect_timeout: float = 5.0  # 建连超时（秒）
+    signed_url_cache_max_entries: int = 10000  # 回放签名 URL 缓存条目上限
+    signed_url_bucket_seconds: int = 900  # 签名有效期档位粒度（秒）
+    signed_url_min_remaining_seconds: int = 600  # 缓存 URL 剩余有效期低于该值时重新签名
 
     # DashScope (百炼平台 - 通义千问ASR)
     dashscope_api_key: str
     dashscope_asr_model: str = "qwen3-asr-flash-realtime"
     dashscope_asr_url: str = "wss://dashscope.aliyuncs.com/api-ws/v1/realtime"
+    realtime_asr_enabled: bool = True  # 录音时是否让客户端边录边发送 PCM 帧实时识别
+
+    # ASR 转写任务控制
+    asr_max_concurrency: int = 4  # 同时进行的转写任务上限（独立线程池大小）
+    asr_poll_initial_interval: float = 0.5  # 首次轮询间隔（秒）
+    asr_poll_max_interval: float = 5.0  # 轮询间隔上限（秒）
+    asr_timeout_seconds: float = 300.0  # 单个转写任务的最长等待时间
+    asr_cache_max_entries: int = 2000  # 转写结果内存缓存条目上限
+    asr_cache_ttl_seconds: float = 3600.0  # 内存缓存条目有效期（不超过音频自身的过期时间）
+
+    # 简历 PDF 解析（独立进程池）
+    pdf_parse_max_workers: int = 2  # 解析进程数
+    pdf_parse_timeout_seconds: float = 30.0  # 单个文件的解析时限
+    pdf_parse_chunk_pages: int = 4  # 每批解析并保存的页数
+    pdf_max_pages: int = 20  # 超出的页不解析
 
     # Audio Storage
     audio_storage_path: str = "./audio_files"  # 本地音频存储路径
+    max_audio_upload_bytes: int = 25 * 1024 * 1024  # 单次录音上传上限
+    audio_upload_chunk_bytes: int = 256 * 1024  # 流式上传的分块大小
+    audio_blob_purge_grace_seconds: int = 3600  # 无引用的内容闲置超过该时长才删除（覆盖复用内容到写入 AudioFile 之间的窗口）
+    audio_preprocess_enabled: bool = True  # ASR 前裁剪静音并重编码为 Opus（需要 numpy 和 ffmpeg）
+    audio_preprocess_timeout_seconds: float = 30.0  # 单次 ffmpeg 解码/编码超时
+    audio_vad_frame_ms: int = 30  # VAD 帧长
+    audio_vad_threshold_db: float = -50.0  # 语音能量下限（dBFS）
+    audio_vad_max_pause_ms: int = 800  # 更长的停顿压缩到该长度
+    audio_vad_padding_ms: int = 200  # 首尾静音保留长度
+    audio_opus_bitrate: str = "24k"  # Opus 编码码率
 
     # Application
     app_env: str = "development"
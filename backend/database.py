@@ -1,13 +1,106 @@
-from sqlalchemy import create_engine
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import settings
 
-engine = create_engine(settings.database_url)
+logger = logging.getLogger(__name__)
+
+_pool_options = dict(
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=settings.db_pool_pre_ping,
+)
+
+# 同步引擎：REST 路由（逐步迁移到异步）
+engine = create_engine(settings.database_url, **_pool_options)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def _async_database_url(database_url: str):
+    """将同步连接串转换为 asyncpg 连接串（sslmode 参数改为 asyncpg 的 ssl）"""
+    url = make_url(database_url).set(drivername="postgresql+asyncpg")
+    if "sslmode" in url.query:
+        query = dict(url.query)
+        query["ssl"] = query.pop("sslmode")
+        url = url.set(query=query)
+    return url
+
+
+# 异步引擎：WebSocket 与 Agent 热路径，数据库往返不阻塞事件循环
+async_engine = create_async_engine(_async_database_url(settings.database_url), **_pool_options)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False  # 提交后仍可直接读取属性，避免隐式 IO
+)
+
+
+class PoolMetrics:
+    """连接池指标：取出等待耗时、使用中的连接数、超时次数"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.in_use = 0
+        self.timeouts = 0
+        self.waits = 0            # 记录了等待耗时的取出次数（db_unit_of_work 开始时）
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record_wait(self, wait_ms: float):
+        with self._lock:
+            self.waits += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def stats(self) -> Dict[str, float]:
+        pool = async_engine.pool
+        return {
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "in_use": self.in_use,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": self.total_wait_ms / self.waits if self.waits else 0.0,
+            "max_wait_ms": self.max_wait_ms,
+        }
+
+
+# 全局异步连接池指标
+pool_metrics = PoolMetrics()
+
+
+@event.listens_for(async_engine.sync_engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    with pool_metrics._lock:
+        pool_metrics.checkouts += 1
+        pool_metrics.in_use += 1
+
+
+@event.listens_for(async_engine.sync_engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    with pool_metrics._lock:
+        pool_metrics.in_use -= 1
+
+
 def get_db():
     """Dependency for getting database session"""
     db = SessionLocal()
@@ -15,3 +108,29 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Dependency for getting async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+@asynccontextmanager
+async def db_unit_of_work() -> AsyncIterator[AsyncSession]:
+    """
+    单个工作单元（一条入站消息 / 一次写入）的异步会话
+
+    进入时立即取出连接并记录等待耗时，退出时归还连接池。
+    长连接（如 WebSocket）不应持有会话，只在需要读写时开启工作单元。
+    """
+    async with AsyncSessionLocal() as db:
+        start = time.perf_counter()
+        try:
+            await db.connection()
+        except PoolTimeoutError:
+            pool_metrics.record_timeout()
+            logger.error(f"数据库连接池耗尽: {pool_metrics.stats()}")
+            raise
+        pool_metrics.record_wait((time.perf_counter() - start) * 1000)
+        yield db
@@ -0,0 +1,172 @@
+"""
+本地模拟的 OSS 服务（仅用于开发和测试）
+
+兼容 oss2 path-style 访问（endpoint 为 IP 时 oss2 使用 /{bucket}/{key} 路径）和浏览器签名直传：
+支持 PUT / GET / HEAD / DELETE 单个对象、批量删除（POST ?delete）以及 CORS 预检。
+不校验签名，对象保存在本地目录。
+
+使用方法:
+    cd backend
+    python fake_oss_server.py --port 9000 --root ./fake_oss
+    # 然后在 .env 中设置:
+    #   ALIYUN_OSS_ENDPOINT=127.0.0.1:9000
+    #   ALIYUN_OSS_SCHEME=http
+
+注意：转写服务（DashScope）无法访问本地地址，离线时只能验证上传、查询和删除流程。
+"""
+
+import argparse
+import hashlib
+import os
+import tempfile
+import threading
+import uuid
+import xml.etree.ElementTree as ElementTree
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+from xml.sax.saxutils import escape
+
+ERROR_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    "<Error><Code>{code}</Code><Message>{message}</Message><RequestId>{request_id}</RequestId></Error>"
+)
+
+
+def make_handler(root: str):
+    """创建请求处理类：对象保存在 root/{bucket}/{key}"""
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, format, *args):
+            pass
+
+        def _object_path(self, path: str | None = None) -> str | None:
+            """/{bucket}/{key} -> 本地文件路径（拒绝越出 root 的路径）"""
+            if path is None:
+                path = unquote(urlparse(self.path).path).lstrip("/")
+            bucket, _, key = path.partition("/")
+            if not bucket or not key:
+                return None
+            full = os.path.realpath(os.path.join(root, path))
+            if not full.startswith(os.path.realpath(root) + os.sep):
+                return None
+            return full
+
+        def _send_headers(self, status: int, headers: dict | None = None):
+            self.send_response(status)
+            self.send_header("x-oss-request-id", uuid.uuid4().hex)
+            self.send_header("Access-Control-Allow-Origin", self.headers.get("Origin") or "*")
+            self.send_header("Access-Control-Expose-Headers", "ETag, x-oss-request-id")
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+
+        def _send_error(self, status: int, code: str, message: str):
+            body = ERROR_XML.format(code=code, message=message, request_id=uuid.uuid4().hex).encode()
+            self._send_headers(status, {"Content-Type": "application/xml", "Content-Length": str(len(body))})
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        def _object_headers(self, full: str) -> dict:
+            with open(full, "rb") as f:
+                etag = hashlib.md5(f.read()).hexdigest().upper()
+            stat = os.stat(full)
+            return {
+                "Content-Length": str(stat.st_size),
+                "Content-Type": "application/octet-stream",
+                "ETag": f'"{etag}"',
+                "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+            }
+
+        def do_OPTIONS(self):
+            self._send_headers(200, {
+                "Access-Control-Allow-Methods": "GET, PUT, HEAD, DELETE",
+                "Access-Control-Allow-Headers": self.headers.get("Access-Control-Request-Headers") or "*",
+                "Access-Control-Max-Age": "600",
+                "Content-Length": "0",
+            })
+
+        def do_PUT(self):
+            full = self._object_path()
+            if full is None:
+                return self._send_error(400, "InvalidObjectName", "invalid object name")
+            length = int(self.headers.get("Content-Length") or 0)
+            data = self.rfile.read(length)
+            os.makedirs(os.path.dirname(full), exist_ok=True)
+            # 先写临时文件再替换，读取方不会看到写了一半的对象
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(full))
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, full)
+            self._send_headers(200, {"ETag": f'"{hashlib.md5(data).hexdigest().upper()}"', "Content-Length": "0"})
+
+        def do_HEAD(self):
+            full = self._object_path()
+            if full is None or not os.path.isfile(full):
+                return self._send_error(404, "NoSuchKey", "The specified key does not exist.")
+            self._send_headers(200, self._object_headers(full))
+
+        def do_GET(self):
+            full = self._object_path()
+            if full is None or not os.path.isfile(full):
+                return self._send_error(404, "NoSuchKey", "The specified key does not exist.")
+            headers = self._object_headers(full)
+            if "objectMeta" in urlparse(self.path).query:
+                # GetObjectMeta：只返回元信息
+                headers["Content-Length"] = "0"
+                return self._send_headers(200, headers)
+            self._send_headers(200, headers)
+            with open(full, "rb") as f:
+                self.wfile.write(f.read())
+
+        def do_POST(self):
+            # DeleteMultipleObjects：POST /{bucket}/?delete，body 为 <Delete><Object><Key>..</Key></Object>...</Delete>
+            if "delete" not in urlparse(self.path).query:
+                return self._send_error(501, "NotImplemented", "only batch delete is supported")
+            bucket = unquote(urlparse(self.path).path).strip("/")
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            keys = [node.text or "" for node in ElementTree.fromstring(body).iter("Key")]
+            deleted = []
+            for key in keys:
+                full = self._object_path(f"{bucket}/{key}")
+                if full is None:
+                    continue
+                if os.path.isfile(full):
+                    os.remove(full)
+                # 与 OSS 一致：不存在的 key 也视为删除成功
+                deleted.append(f"<Deleted><Key>{escape(key)}</Key></Deleted>")
+            result = ('<?xml version="1.0" encoding="UTF-8"?>\n<DeleteResult>' + "".join(deleted) + "</DeleteResult>").encode()
+            self._send_headers(200, {"Content-Type": "application/xml", "Content-Length": str(len(result))})
+            self.wfile.write(result)
+
+        def do_DELETE(self):
+            full = self._object_path()
+            if full is not None and os.path.isfile(full):
+                os.remove(full)
+            self._send_headers(204)
+
+    return Handler
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, root: str | None = None) -> ThreadingHTTPServer:
+    """在后台线程启动模拟服务，返回 HTTPServer（port=0 时随机分配端口，server_address 为实际地址）"""
+    root = root or tempfile.mkdtemp(prefix="fake_oss_")
+    os.makedirs(root, exist_ok=True)
+    server = ThreadingHTTPServer((host, port), make_handler(root))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地模拟的 OSS 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--root", default="./fake_oss")
+    args = parser.parse_args()
+    server = start_server(args.host, args.port, args.root)
+    print(f"模拟 OSS 服务已启动: http://{args.host}:{args.port}，对象目录: {os.path.abspath(args.root)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
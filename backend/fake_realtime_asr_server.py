@@ -0,0 +1,77 @@
+"""
+本地模拟的实时 ASR 服务（仅用于开发和测试）
+
+模拟 DashScope qwen3-asr-flash-realtime 的 WebSocket 协议：
+每收到一帧音频推送一次中间结果，commit 后推送最终结果，session.finish 后结束会话。
+
+使用方法:
+    cd backend
+    python fake_realtime_asr_server.py --port 8765 --transcript "我主导过一个用户系统重构项目"
+    # 然后在 .env 中设置 DASHSCOPE_ASR_URL=ws://127.0.0.1:8765
+"""
+
+import argparse
+import asyncio
+import json
+
+from websockets.asyncio.server import serve
+
+DEFAULT_TRANSCRIPT = "我主导过一个用户系统重构项目，负责整体架构设计和团队协作。"
+
+
+def make_handler(transcript: str, chars_per_frame: int = 4):
+    """创建连接处理函数：每帧音频多揭示 chars_per_frame 个字"""
+
+    async def handler(websocket):
+        frames = 0
+        await websocket.send(json.dumps({"type": "session.created", "session": {}}))
+
+        async for raw in websocket:
+            event = json.loads(raw)
+            event_type = event.get("type")
+
+            if event_type == "session.update":
+                await websocket.send(json.dumps({"type": "session.updated", "session": event.get("session", {})}))
+
+            elif event_type == "input_audio_buffer.append":
+                frames += 1
+                revealed = transcript[:frames * chars_per_frame]
+                await websocket.send(json.dumps({
+                    "type": "conversation.item.input_audio_transcription.text",
+                    "text": revealed[:-1],
+                    "stash": revealed[-1:]
+                }))
+
+            elif event_type == "input_audio_buffer.commit":
+                await websocket.send(json.dumps({"type": "input_audio_buffer.committed"}))
+                await websocket.send(json.dumps({
+                    "type": "conversation.item.input_audio_transcription.completed",
+                    "transcript": transcript if frames else ""
+                }))
+
+            elif event_type == "session.finish":
+                await websocket.send(json.dumps({"type": "session.finished"}))
+                await websocket.close()
+                return
+
+    return handler
+
+
+async def start_server(host: str = "127.0.0.1", port: int = 0, transcript: str = DEFAULT_TRANSCRIPT):
+    """启动模拟服务，返回 websockets Server（port=0 时随机分配端口）"""
+    return await serve(make_handler(transcript), host, port)
+
+
+async def main(host: str, port: int, transcript: str):
+    server = await start_server(host, port, transcript)
+    print(f"模拟实时 ASR 服务已启动: ws://{host}:{port}")
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地模拟的实时 ASR 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--transcript", default=DEFAULT_TRANSCRIPT)
+    args = parser.parse_args()
+    asyncio.run(main(args.host, args.port, args.transcript))
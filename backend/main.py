@@ -28,11 +28,41 @@ Base.metadata.create_all(bind=engine)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
+    # 预建 LLM 连接，避免首个请求承担 TLS 握手
+    from services.llm_client_pool import llm_client_registry
+    await llm_client_registry.warm_up()
+
+    # 重放上次进程退出前未落库的消息
+    from services.message_writer import message_writer
+    await message_writer.replay()
+
+    # 上次退出时中断的简历解析任务标记为失败
+    from services.resume_parser import resume_parser_service
+    await resume_parser_service.recover_stale_jobs()
+
     print("[STARTUP] 应用启动完成")
 
     yield  # 应用运行中
 
-    # 关闭时清理（如果需要）
+    # 关闭时清理
+    await message_writer.close()
+
+    from services.asr_service import asr_service
+    await asr_service.close()
+
+    from services.oss_service import oss_service
+    await oss_service.close()
+
+    from services.context_manager import context_manager
+    await context_manager.close()
+
+    from services.resume_parser import resume_parser_service
+    await resume_parser_service.close()
+
+    await llm_client_registry.close()
+
+    from database import async_engine
+    await async_engine.dispose()
 
 
 app = FastAPI(
@@ -43,6 +73,9 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# 音频上传大小限制（在 multipart 解析之前生效；先注册，使 413 响应也经过 CORS）
+app.add_middleware(audio.AudioUploadLimitMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -72,6 +105,62 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/db-pool")
+def db_pool_stats():
+    """异步数据库连接池指标（取出等待耗时、使用中的连接数等）"""
+    from database import pool_metrics
+    return pool_metrics.stats()
+
+
+@app.get("/health/llm-pools")
+def llm_pool_stats():
+    """各 LLM provider 的连接池指标"""
+    from services.llm_client_pool import llm_client_registry
+    return llm_client_registry.stats()
+
+
+@app.get("/health/prompt-cache")
+def prompt_cache_metrics():
+    """各调用场景（usage_tag）的 prompt 缓存命中率，以及命中/未命中时的平均延迟"""
+    from services.llm_service import prompt_cache_stats
+    return prompt_cache_stats.stats()
+
+
+@app.get("/health/message-writer")
+def message_writer_stats():
+    """消息写缓冲指标（待写入条数、批量写入次数等）"""
+    from services.message_writer import message_writer
+    return message_writer.stats()
+
+
+@app.get("/health/intent-router")
+def intent_router_stats():
+    """意图路由各层（规则 / 本地分类器 / LLM）的命中数、占比和平均耗时"""
+    from agents.intent_router import intent_router
+    return intent_router.stats()
+
+
+@app.get("/health/audio-preprocess")
+def audio_preprocess_stats():
+    """录音预处理指标（处理数、累计节省的字节数和时长）"""
+    from services.audio_preprocess import audio_preprocessor
+    return audio_preprocessor.stats()
+
+
+@app.get("/health/asr-cache")
+def asr_cache_stats():
+    """ASR 结果缓存指标（内存/数据库命中、未命中、按请求绕过次数及命中率）"""
+    from services.asr_cache import asr_result_cache
+    return asr_result_cache.stats()
+
+
+@app.get("/health/speculation")
+def speculative_chat_stats():
+    """投机执行指标（预启动次数、命中率、平均节省的首 token 时间）"""
+    from agents.speculation import speculation_stats
+    return speculation_stats.stats()
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,102 @@
+"""
+数据库迁移脚本: 资产版本谱系
+
+- 新建 asset_lineages 表（同一项目下同一问题为一个谱系，latest_version 为单调版本计数）
+- assets 表添加 lineage_id 列，按 (project_id, 问题指纹) 回填，并按创建时间重排一次版本号
+- 添加 (lineage_id, version) 唯一索引，删除不再使用的 md5(question) 索引
+
+问题指纹直接用 services/asset_lineage.question_fingerprint 在 Python 中计算（写入临时表），
+与新插入的资产完全一致（str.split() 会去掉制表符、换行、全角空格、\xa0 等，SQL 的 btrim 做不到）。
+
+运行方式: python migrate_add_asset_lineage.py
+"""
+
+from sqlalchemy import create_engine, text
+from config import settings
+from services.asset_lineage import question_fingerprint
+
+
+def load_fingerprints(conn):
+    """在 Python 中计算所有资产的问题指纹，写入临时表 asset_fingerprints(id, fingerprint)"""
+    conn.execute(text("""
+        CREATE TEMP TABLE asset_fingerprints (
+            id UUID PRIMARY KEY,
+            fingerprint VARCHAR(32) NOT NULL
+        ) ON COMMIT DROP
+    """))
+    rows = conn.execute(text("SELECT id, question FROM assets")).all()
+    if rows:
+        conn.execute(
+            text("INSERT INTO asset_fingerprints (id, fingerprint) VALUES (:id, :fingerprint)"),
+            [{"id": str(row.id), "fingerprint": question_fingerprint(row.question or "")} for row in rows]
+        )
+    conn.execute(text("ANALYZE asset_fingerprints"))
+
+
+def migrate():
+    engine = create_engine(settings.database_url)
+
+    with engine.connect() as conn:
+        # 检查 asset_lineages 表是否已存在
+        result = conn.execute(text("""
+            SELECT table_name
+            FROM information_schema.tables
+            WHERE table_name = 'asset_lineages'
+        """))
+
+        if result.fetchone():
+            print("asset_lineages 表已存在，跳过")
+            return
+
+        print("正在创建 asset_lineages 表...")
+        conn.execute(text("""
+            CREATE TABLE asset_lineages (
+                id UUID PRIMARY KEY,
+                project_id UUID NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+                question_fingerprint VARCHAR(32) NOT NULL,
+                latest_version INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+            )
+        """))
+        conn.execute(text("""
+            CREATE UNIQUE INDEX uq_asset_lineages_project_fingerprint
+            ON asset_lineages (project_id, question_fingerprint)
+        """))
+
+        print("正在添加 lineage_id 列...")
+        conn.execute(text("""
+            ALTER TABLE assets
+            ADD COLUMN lineage_id UUID REFERENCES asset_lineages(id) ON DELETE CASCADE
+        """))
+
+        print("正在回填版本谱系...")
+        load_fingerprints(conn)
+        conn.execute(text("""
+            INSERT INTO asset_lineages (id, project_id, question_fingerprint, latest_version)
+            SELECT gen_random_uuid(), a.project_id, f.fingerprint, count(*)
+            FROM assets a JOIN asset_fingerprints f ON f.id = a.id
+            GROUP BY a.project_id, f.fingerprint
+        """))
+        conn.execute(text("""
+            UPDATE assets a
+            SET lineage_id = l.id, version = v.version
+            FROM asset_lineages l, (
+                SELECT a2.id, f.fingerprint, row_number() OVER (
+                    PARTITION BY a2.project_id, f.fingerprint ORDER BY a2.created_at, a2.id
+                ) AS version
+                FROM assets a2 JOIN asset_fingerprints f ON f.id = a2.id
+            ) v
+            WHERE v.id = a.id
+              AND l.project_id = a.project_id
+              AND l.question_fingerprint = v.fingerprint
+        """))
+
+        conn.execute(text("CREATE UNIQUE INDEX uq_assets_lineage_version ON assets (lineage_id, version)"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_assets_project_question_md5"))
+
+        conn.commit()
+        print("迁移完成！")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,63 @@
+"""
+数据库迁移脚本: 内容寻址音频存储（audio_blobs）
+
+- 创建 audio_blobs 表
+- 在 audio_files 上创建维护引用计数的触发器（级联删除也会释放引用）
+- 按 audio_files.content_hash 重新计算引用计数（可重复运行，用于修复计数）
+
+运行方式: python migrate_add_audio_blobs.py
+"""
+
+from sqlalchemy import DDL, create_engine, text
+from config import settings
+from database import Base
+from models.audio_blob import AudioBlob, AUDIO_BLOB_REFCOUNT_FUNCTION_SQL, AUDIO_BLOB_REFCOUNT_TRIGGER_SQL
+
+
+def migrate():
+    engine = create_engine(settings.database_url)
+
+    Base.metadata.create_all(bind=engine, tables=[AudioBlob.__table__])
+    print("audio_blobs 表已就绪")
+
+    with engine.connect() as conn:
+        # 复用 OSS 对象前按 key 刷新 updated_at
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_audio_blobs_oss_key ON audio_blobs (oss_key)"))
+        conn.commit()
+
+    with engine.connect() as conn:
+        # 重算期间阻止 audio_files 写入，避免新增/删除的引用在重算和触发器之间丢失
+        conn.execute(text("LOCK TABLE audio_files IN SHARE ROW EXCLUSIVE MODE"))
+        conn.execute(DDL(AUDIO_BLOB_REFCOUNT_FUNCTION_SQL))
+        conn.execute(text("DROP TRIGGER IF EXISTS audio_files_blob_refcount ON audio_files"))
+        conn.execute(DDL(AUDIO_BLOB_REFCOUNT_TRIGGER_SQL))
+        print("引用计数触发器已就绪")
+
+        result = conn.execute(text("""
+            INSERT INTO audio_blobs (content_hash, ref_count, local_path, oss_key, oss_url)
+            SELECT
+                content_hash,
+                count(*),
+                max(CASE WHEN file_path NOT LIKE 'http%' THEN file_path END),
+                max(oss_key),
+                max(oss_url)
+            FROM audio_files
+            WHERE content_hash IS NOT NULL
+            GROUP BY content_hash
+            ON CONFLICT (content_hash) DO UPDATE SET ref_count = EXCLUDED.ref_count
+        """))
+        print(f"已更新 {result.rowcount} 个内容的引用计数")
+
+        # 不再被任何 AudioFile 引用的内容，交给 CleanupService 删除
+        result = conn.execute(text("""
+            UPDATE audio_blobs b SET ref_count = 0
+            WHERE NOT EXISTS (SELECT 1 FROM audio_files f WHERE f.content_hash = b.content_hash)
+        """))
+        print(f"{result.rowcount} 个内容无引用")
+
+        conn.commit()
+        print("迁移完成！")
+
+
+if __name__ == "__main__":
+    migrate()
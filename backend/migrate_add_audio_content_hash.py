@@ -0,0 +1,34 @@
+"""
+数据库迁移脚本: audio_files 表添加 content_hash 列（上传时流式计算的 SHA-256）
+
+运行方式: python migrate_add_audio_content_hash.py
+"""
+
+from sqlalchemy import create_engine, text
+from config import settings
+
+
+def migrate():
+    engine = create_engine(settings.database_url)
+
+    with engine.connect() as conn:
+        # 检查 content_hash 列是否已存在
+        result = conn.execute(text("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name = 'audio_files' AND column_name = 'content_hash'
+        """))
+
+        if result.fetchone():
+            print("content_hash 列已存在，跳过")
+        else:
+            conn.execute(text("ALTER TABLE audio_files ADD COLUMN content_hash VARCHAR(64)"))
+            conn.execute(text("CREATE INDEX ix_audio_files_content_hash ON audio_files (content_hash)"))
+            print("已添加 content_hash 列")
+
+        conn.commit()
+        print("迁移完成！")
+
+
+if __name__ == "__main__":
+    migrate()
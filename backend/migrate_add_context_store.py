@@ -0,0 +1,45 @@
+"""
+数据库迁移脚本: 持久化会话上下文
+- messages 表添加 token_count 列（旧消息在首次加载时回写）
+- 创建 session_contexts 表（滚动摘要）
+
+运行方式: python migrate_add_context_store.py
+"""
+
+from sqlalchemy import create_engine, text
+from config import settings
+
+
+def migrate():
+    engine = create_engine(settings.database_url)
+
+    with engine.connect() as conn:
+        # 检查 token_count 列是否已存在
+        result = conn.execute(text("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name = 'messages' AND column_name = 'token_count'
+        """))
+
+        if result.fetchone():
+            print("token_count 列已存在，跳过")
+        else:
+            conn.execute(text("ALTER TABLE messages ADD COLUMN token_count INTEGER"))
+            print("已添加 token_count 列")
+
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS session_contexts (
+                session_id UUID PRIMARY KEY REFERENCES sessions(id) ON DELETE CASCADE,
+                summary TEXT,
+                summary_token_count INTEGER DEFAULT 0,
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+            )
+        """))
+        print("session_contexts 表已就绪")
+
+        conn.commit()
+        print("迁移完成！")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,36 @@
+"""
+数据库迁移脚本: messages 表添加 (session_id, created_at, id) 复合索引（消息列表游标分页）
+
+运行方式: python migrate_add_message_cursor_index.py
+"""
+
+from sqlalchemy import create_engine, text
+from config import settings
+
+
+def migrate():
+    engine = create_engine(settings.database_url)
+
+    # CREATE INDEX CONCURRENTLY 不能在事务中执行
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # 检查索引是否已存在
+        result = conn.execute(text("""
+            SELECT indexname
+            FROM pg_indexes
+            WHERE tablename = 'messages' AND indexname = 'ix_messages_session_created_id'
+        """))
+
+        if result.fetchone():
+            print("ix_messages_session_created_id 索引已存在，跳过")
+        else:
+            conn.execute(text(
+                "CREATE INDEX CONCURRENTLY ix_messages_session_created_id "
+                "ON messages (session_id, created_at, id)"
+            ))
+            print("已添加 ix_messages_session_created_id 索引")
+
+        print("迁移完成！")
+
+
+if __name__ == "__main__":
+    migrate()
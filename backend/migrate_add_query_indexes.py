@@ -0,0 +1,63 @@
+"""
+数据库迁移脚本: 为热点查询添加复合索引和部分索引
+
+- messages:    最近一条 recording_prompt（部分索引）
+- assets:      按项目列表（版本查询见 migrate_add_asset_lineage.py）
+- sessions:    按项目列表
+- audio_files: 过期清理（部分索引）、按 session / oss_key 查找
+
+消息列表的 (session_id, created_at, id) 索引见 migrate_add_message_cursor_index.py。
+查询计划回归检查: python test_query_plans.py
+
+运行方式: python migrate_add_query_indexes.py
+"""
+
+from sqlalchemy import create_engine, text
+from config import settings
+
+# (索引名, 表名, 建索引语句)
+INDEXES = [
+    (
+        "ix_messages_session_recording_prompt", "messages",
+        "ON messages (session_id, created_at) WHERE message_type = 'recording_prompt'"
+    ),
+    ("ix_assets_project_created", "assets", "ON assets (project_id, created_at)"),
+    ("ix_sessions_project_started", "sessions", "ON sessions (project_id, started_at)"),
+    (
+        "ix_audio_files_expires_at_pending", "audio_files",
+        "ON audio_files (expires_at) WHERE oss_key IS NOT NULL"
+    ),
+    ("ix_audio_files_session_id", "audio_files", "ON audio_files (session_id)"),
+    ("ix_audio_files_oss_key", "audio_files", "ON audio_files (oss_key)"),
+]
+
+
+def migrate():
+    engine = create_engine(settings.database_url)
+
+    # CREATE INDEX CONCURRENTLY 不能在事务中执行
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, table, definition in INDEXES:
+            # 检查索引是否已存在
+            result = conn.execute(text("""
+                SELECT indexname
+                FROM pg_indexes
+                WHERE tablename = :table AND indexname = :name
+            """), {"table": table, "name": name})
+
+            if result.fetchone():
+                print(f"{name} 索引已存在，跳过")
+                continue
+
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY {name} {definition}"))
+            print(f"已添加 {name} 索引")
+
+        # 更新统计信息，让规划器立即使用新索引
+        for table in sorted({table for _, table, _ in INDEXES}):
+            conn.execute(text(f"ANALYZE {table}"))
+
+        print("迁移完成！")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,33 @@
+"""
+数据库迁移脚本: session_contexts 表添加 summary_watermark 列（后台增量摘要的水位）
+
+运行方式: python migrate_add_summary_watermark.py
+"""
+
+from sqlalchemy import create_engine, text
+from config import settings
+
+
+def migrate():
+    engine = create_engine(settings.database_url)
+
+    with engine.connect() as conn:
+        # 检查 summary_watermark 列是否已存在
+        result = conn.execute(text("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name = 'session_contexts' AND column_name = 'summary_watermark'
+        """))
+
+        if result.fetchone():
+            print("summary_watermark 列已存在，跳过")
+        else:
+            conn.execute(text("ALTER TABLE session_contexts ADD COLUMN summary_watermark TIMESTAMP WITH TIME ZONE"))
+            print("已添加 summary_watermark 列")
+
+        conn.commit()
+        print("迁移完成！")
+
+
+if __name__ == "__main__":
+    migrate()
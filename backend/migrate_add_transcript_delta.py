@@ -0,0 +1,69 @@
+"""
+数据库迁移脚本: 资产逐字稿增量存储
+
+- assets 表添加 transcript_delta、delta_base_id 列及 delta_base_id 索引
+- 压缩已有版本：每个谱系中除最新版本和快照版本外，改存为相对后一个版本的差异
+
+需先运行 migrate_add_asset_lineage.py。
+
+运行方式: python migrate_add_transcript_delta.py
+"""
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from config import settings
+
+
+def add_columns(conn):
+    # 检查 transcript_delta 列是否已存在
+    result = conn.execute(text("""
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_name = 'assets' AND column_name = 'transcript_delta'
+    """))
+
+    if result.fetchone():
+        print("transcript_delta 列已存在，跳过")
+        return
+
+    conn.execute(text("ALTER TABLE assets ADD COLUMN transcript_delta TEXT"))
+    conn.execute(text("ALTER TABLE assets ADD COLUMN delta_base_id UUID REFERENCES assets(id)"))
+    conn.execute(text("CREATE INDEX ix_assets_delta_base_id ON assets (delta_base_id)"))
+    print("已添加 transcript_delta、delta_base_id 列")
+
+
+def compress_existing(db: Session):
+    from models.asset import Asset
+    from services.transcript_delta import transcript_version_store
+
+    lineage_ids = [row[0] for row in db.query(Asset.lineage_id).filter(Asset.lineage_id.isnot(None)).distinct()]
+    compressed = 0
+    for lineage_id in lineage_ids:
+        versions = db.query(Asset).filter(Asset.lineage_id == lineage_id).order_by(Asset.version.desc()).all()
+        # 从新到旧：每个版本相对其后一个版本编码
+        for newer, older in zip(versions, versions[1:]):
+            if transcript_version_store.is_delta(older) or transcript_version_store.is_snapshot(older):
+                continue
+            transcript_version_store.materialize(db, [newer])
+            transcript_version_store._encode_against(older, newer, newer.transcript or "")
+            compressed += 1
+        db.commit()
+
+    print(f"已压缩 {compressed} 个历史版本（{len(lineage_ids)} 个谱系）")
+
+
+def migrate():
+    engine = create_engine(settings.database_url)
+
+    with engine.connect() as conn:
+        add_columns(conn)
+        conn.commit()
+
+    with Session(engine) as db:
+        compress_existing(db)
+
+    print("迁移完成！")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -3,6 +3,9 @@ from models.project import Project
 from models.session import Session
 from models.message import Message
 from models.audio_file import AudioFile
-from models.asset import Asset
+from models.audio_blob import AudioBlob
+from models.asset import Asset, AssetLineage
+from models.session_context import SessionContext
+from models.resume_parse_job import ResumeParseJob, ResumePage
 
-__all__ = ["User", "EmailVerificationCode", "Project", "Session", "Message", "AudioFile", "Asset"]
+__all__ = ["User", "EmailVerificationCode", "Project", "Session", "Message", "AudioFile", "AudioBlob", "Asset", "AssetLineage", "SessionContext", "ResumeParseJob", "ResumePage"]
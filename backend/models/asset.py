@@ -1,21 +1,48 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, JSON, Integer
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, JSON, Integer, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
 from database import Base
 
 
+class AssetLineage(Base):
+    """
+    资产版本谱系：同一项目下同一问题的所有版本
+
+    latest_version 在插入新版本时原子递增，版本号单调且无需读时重排。
+    """
+    __tablename__ = "asset_lineages"
+    __table_args__ = (
+        Index("uq_asset_lineages_project_fingerprint", "project_id", "question_fingerprint", unique=True),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    question_fingerprint = Column(String(32), nullable=False)  # 规范化问题文本的 md5
+    latest_version = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class Asset(Base):
     __tablename__ = "assets"
+    __table_args__ = (
+        # 资产列表：按项目过滤、按创建时间倒序
+        Index("ix_assets_project_created", "project_id", "created_at"),
+        # 版本列表：按谱系顺序读取
+        Index("uq_assets_lineage_version", "lineage_id", "version", unique=True),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
     question = Column(Text, nullable=False)
-    transcript = Column(Text)  # 可编辑的逐字稿
+    transcript = Column(Text)  # 可编辑的逐字稿（增量存储的版本为空，见 transcript_delta）
+    transcript_delta = Column(Text)  # 相对 delta_base_id 版本的差异（JSON）
+    delta_base_id = Column(UUID(as_uuid=True), ForeignKey("assets.id"), index=True)  # 差异的基准版本（谱系中的后一个版本）
     original_message_id = Column(UUID(as_uuid=True), ForeignKey("messages.id"))
     tags = Column(JSON)
     star_structure = Column(JSON)
-    version = Column(Integer, default=1)  # 版本号
+    lineage_id = Column(UUID(as_uuid=True), ForeignKey("asset_lineages.id", ondelete="CASCADE"))  # 版本谱系
+    version = Column(Integer, default=1)  # 版本号（谱系内单调递增）
     parent_asset_id = Column(UUID(as_uuid=True), ForeignKey("assets.id"))  # 父版本ID
     version_type = Column(String(20), default="recording")  # "recording" | "edited"
     created_at = Column(DateTime(timezone=True), server_default=func.now())
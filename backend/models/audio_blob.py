@@ -0,0 +1,73 @@
+from sqlalchemy import Column, String, Integer, DateTime, DDL, event
+from sqlalchemy.sql import func
+from database import Base
+from models.audio_file import AudioFile
+
+
+class AudioBlob(Base):
+    """
+    按内容寻址的音频存储（key 为 SHA-256）
+
+    相同内容的录音只在本地 / OSS 保存一份；ref_count 为引用该内容的 AudioFile 数，
+    由 audio_files 上的触发器在同一事务中维护，降为 0 且闲置超过宽限期后由 CleanupService 删除。
+    复用已有内容前先刷新 updated_at（见 AudioBlobStore.touch），清理不会删掉正要被引用的内容。
+    """
+    __tablename__ = "audio_blobs"
+
+    content_hash = Column(String(64), primary_key=True)
+    ref_count = Column(Integer, nullable=False, default=0)
+    local_path = Column(String(500))  # 本地存储路径
+    oss_key = Column(String(500), index=True)  # OSS 对象 key
+    oss_url = Column(String(1000))    # OSS 基础 URL（不含签名）
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+# 引用计数由 audio_files 上的触发器维护：ORM 删除、会话/项目删除时数据库 ON DELETE CASCADE
+# 级联删除的 AudioFile 都会减少计数（ORM 事件感知不到级联删除）。
+# 以 DDL() 执行，% 需写成 %%
+AUDIO_BLOB_REFCOUNT_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION audio_blobs_refcount() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.content_hash IS NOT DISTINCT FROM NEW.content_hash THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') AND OLD.content_hash IS NOT NULL THEN
+        UPDATE audio_blobs
+        SET ref_count = ref_count - 1, updated_at = now()
+        WHERE content_hash = OLD.content_hash;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.content_hash IS NOT NULL THEN
+        INSERT INTO audio_blobs (content_hash, ref_count, local_path, oss_key, oss_url, created_at, updated_at)
+        VALUES (
+            NEW.content_hash, 1,
+            CASE WHEN NEW.file_path NOT LIKE 'http%%' THEN NEW.file_path END,
+            NEW.oss_key, NEW.oss_url, now(), now()
+        )
+        ON CONFLICT (content_hash) DO UPDATE SET
+            ref_count = audio_blobs.ref_count + 1,
+            local_path = COALESCE(audio_blobs.local_path, EXCLUDED.local_path),
+            oss_key = COALESCE(audio_blobs.oss_key, EXCLUDED.oss_key),
+            oss_url = COALESCE(audio_blobs.oss_url, EXCLUDED.oss_url),
+            updated_at = now();
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+AUDIO_BLOB_REFCOUNT_TRIGGER_SQL = """
+CREATE TRIGGER audio_files_blob_refcount
+AFTER INSERT OR DELETE OR UPDATE OF content_hash ON audio_files
+FOR EACH ROW EXECUTE FUNCTION audio_blobs_refcount()
+"""
+
+# create_all 建表时一并创建触发器（已有库见 migrate_add_audio_blobs.py）
+event.listen(
+    AudioFile.__table__, "after_create",
+    DDL(AUDIO_BLOB_REFCOUNT_FUNCTION_SQL).execute_if(dialect="postgresql")
+)
+event.listen(
+    AudioFile.__table__, "after_create",
+    DDL(AUDIO_BLOB_REFCOUNT_TRIGGER_SQL).execute_if(dialect="postgresql")
+)
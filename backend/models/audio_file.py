@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, JSON, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -7,11 +7,16 @@ from database import Base
 
 class AudioFile(Base):
     __tablename__ = "audio_files"
+    __table_args__ = (
+        # 过期清理：只索引仍在 OSS 上的文件（oss_key 非空），清理后自动移出索引
+        Index("ix_audio_files_expires_at_pending", "expires_at", postgresql_where=text("oss_key IS NOT NULL")),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False)
+    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False, index=True)
     file_path = Column(String(500), nullable=False)
     file_size = Column(Integer)
+    content_hash = Column(String(64), index=True)  # 文件内容 SHA-256（上传时流式计算）
     duration_seconds = Column(Float)
     format = Column(String(20))
     asr_status = Column(String(50), default="pending")
@@ -19,6 +24,6 @@ class AudioFile(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # OSS 持久化存储字段
-    oss_key = Column(String(500))           # OSS 对象 key
+    oss_key = Column(String(500), index=True)  # OSS 对象 key
     oss_url = Column(String(1000))          # OSS 基础 URL（不含签名）
     expires_at = Column(DateTime(timezone=True))  # 过期时间（用于定期清理）
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey, JSON, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -7,12 +7,23 @@ from database import Base
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # 消息列表游标分页：WHERE session_id = ? AND (created_at, id) < (?, ?) ORDER BY created_at, id
+        Index("ix_messages_session_created_id", "session_id", "created_at", "id"),
+        # 最近一条 recording_prompt：部分索引只包含录音提示消息
+        Index(
+            "ix_messages_session_recording_prompt",
+            "session_id", "created_at",
+            postgresql_where=text("message_type = 'recording_prompt'")
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False)
     role = Column(String(50), nullable=False)
     content = Column(Text, nullable=False)
     message_type = Column(String(50))
+    token_count = Column(Integer)  # content 的 token 数，插入时计算，重连时无需重新编码
 
     # For user answers
     audio_file_id = Column(UUID(as_uuid=True), ForeignKey("audio_files.id"))
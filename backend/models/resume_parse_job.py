@@ -0,0 +1,35 @@
+from sqlalchemy import Column, String, Text, Integer, Boolean, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+import uuid
+from database import Base
+
+
+class ResumeParseJob(Base):
+    """简历 PDF 解析任务（前端轮询状态）"""
+    __tablename__ = "resume_parse_jobs"
+    __table_args__ = (
+        # 按文件内容哈希查找已解析结果
+        Index("ix_resume_parse_jobs_hash_status", "file_hash", "status"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True)
+    file_hash = Column(String(64), nullable=False)  # 文件内容 SHA-256
+    file_path = Column(String(500), nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending | running | succeeded | failed
+    page_count = Column(Integer)  # PDF 总页数
+    pages_parsed = Column(Integer, default=0)  # 已解析并保存的页数
+    cached = Column(Boolean, default=False)  # 命中内容哈希缓存，未重新解析
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class ResumePage(Base):
+    """按文件内容哈希缓存的简历逐页文本"""
+    __tablename__ = "resume_pages"
+
+    file_hash = Column(String(64), primary_key=True)
+    page_no = Column(Integer, primary_key=True)  # 从 1 开始
+    text = Column(Text, nullable=False, default="")
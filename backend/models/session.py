@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -7,6 +7,10 @@ from database import Base
 
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (
+        # 会话列表：按项目过滤、按开始时间倒序
+        Index("ix_sessions_project_started", "project_id", "started_at"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
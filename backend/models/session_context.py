@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Text, Integer, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from database import Base
+
+
+class SessionContext(Base):
+    """会话上下文（滚动摘要），供 ContextManager 重连时恢复"""
+    __tablename__ = "session_contexts"
+
+    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id", ondelete="CASCADE"), primary_key=True)
+    summary = Column(Text)
+    summary_token_count = Column(Integer, default=0)
+    summary_watermark = Column(DateTime(timezone=True))  # 摘要已覆盖到的最后一条消息的 created_at
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
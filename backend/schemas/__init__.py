@@ -1,4 +1,4 @@
-from schemas.project import ProjectCreate, ProjectUpdate, ProjectResponse
+from schemas.project import ProjectCreate, ProjectUpdate, ProjectResponse, ResumeParseJobResponse
 from schemas.session import SessionCreate, SessionResponse
 from schemas.audio import (
     AudioUploadResponse,
@@ -15,6 +15,7 @@ __all__ = [
     "ProjectCreate",
     "ProjectUpdate",
     "ProjectResponse",
+    "ResumeParseJobResponse",
     "SessionCreate",
     "SessionResponse",
     "AudioUploadResponse",
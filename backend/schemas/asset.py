@@ -31,6 +31,7 @@ class AssetResponse(BaseModel):
     original_message_id: Optional[UUID] = None
     tags: List[str] = Field(default_factory=list)
     star_structure: Optional[Dict[str, Any]] = None
+    lineage_id: Optional[UUID] = None  # 版本谱系（同一问题的所有版本）
     version: int
     parent_asset_id: Optional[UUID] = None
     version_type: str = "recording"  # "recording" | "edited"
@@ -53,9 +54,19 @@ class AssetListResponse(BaseModel):
     total: int
 
 
+class AssetDiffResponse(BaseModel):
+    """版本差异响应模型"""
+    base_id: UUID
+    base_version: int
+    asset_id: UUID
+    version: int
+    diff: List[Dict[str, str]]  # [{"op": "equal" | "insert" | "delete", "text": str}]
+
+
 class AssetConfirmSave(BaseModel):
     """确认保存资产的请求模型"""
     project_id: str
     question: str
     transcript: str
+    session_id: Optional[str] = None  # 消息所属会话（消息可能仍在写缓冲中，按会话入队更新）
     message_id: Optional[str] = None  # 关联的消息ID（用于更新消息保存状态）
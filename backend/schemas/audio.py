@@ -34,6 +34,7 @@ class AudioUploadResponse(BaseModel):
     id: UUID
     file_path: str
     file_size: int
+    content_hash: Optional[str] = None
     duration_seconds: Optional[float] = None
     format: str
     asr_status: str = "pending"
@@ -43,6 +44,26 @@ class AudioUploadResponse(BaseModel):
         from_attributes = True
 
 
+# ============ 回放签名 URL ============
+
+class AudioURLBatchRequest(BaseModel):
+    """批量获取回放签名 URL 请求"""
+    audio_file_ids: List[UUID] = Field(..., max_length=100, description="音频文件ID列表（通常为一页消息中的全部音频）")
+    expires_in: int = Field(3600, ge=60, le=86400, description="URL 有效期（秒）")
+
+
+class AudioURLItem(BaseModel):
+    """单个音频的签名 URL"""
+    url: str
+    expires_in: int  # 剩余有效期（秒）
+
+
+class AudioURLBatchResponse(BaseModel):
+    """批量获取回放签名 URL 响应"""
+    urls: Dict[str, AudioURLItem]  # audio_file_id -> URL
+    missing: List[str] = []  # 不存在或已不在 OSS 上的音频
+
+
 # ============ ASR转录相关 ============
 
 class TranscribeRequest(BaseModel):
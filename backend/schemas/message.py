@@ -37,7 +37,9 @@ class MessageResponse(BaseModel):
 class MessageListResponse(BaseModel):
     """分页消息列表响应"""
     messages: List[MessageResponse]
-    total: int
+    total: Optional[int] = None  # 仅在 with_total=true 时返回
     limit: int
     offset: int
     has_more: bool
+    before_cursor: Optional[str] = None  # 加载更早消息的游标（本页第一条）
+    after_cursor: Optional[str] = None   # 加载更新消息的游标（本页最后一条）
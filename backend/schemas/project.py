@@ -21,6 +21,21 @@ class ProjectUpdate(BaseModel):
     practice_questions: Optional[List[str]] = None
 
 
+class ResumeParseJobResponse(BaseModel):
+    id: UUID
+    project_id: UUID
+    status: str  # pending | running | succeeded | failed
+    page_count: Optional[int] = None
+    pages_parsed: int = 0
+    cached: bool = False
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
 class ProjectResponse(ProjectBase):
     id: UUID
     user_id: UUID
@@ -0,0 +1,201 @@
+"""
+ASR 转写结果缓存
+
+键为 (音频内容 SHA-256, ASR 模型)：
+- 前端：进程内 LRU，条目有效期不超过 asr_cache_ttl_seconds，也不超过来源 AudioFile 的过期时间
+  （过期后 OSS 对象可能已被清理，不能再复用其 oss_key）
+- 后端：AudioFile.asr_result（转写时记录 model），内存未命中时按 content_hash 查询
+
+命中时跳过 OSS 上传和 DashScope 转写任务；调用方可按请求传 use_cache=False 绕过。
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config import settings
+from models.audio_file import AudioFile
+
+logger = logging.getLogger(__name__)
+
+# 记录 model 之前的转写结果都由 paraformer-v2 产生
+LEGACY_ASR_MODEL = "paraformer-v2"
+
+
+@dataclass
+class CachedTranscription:
+    """缓存的转写结果及其音频位置"""
+    transcript: str
+    sentences: List[Dict[str, Any]] = field(default_factory=list)
+    oss_key: Optional[str] = None
+    oss_url: Optional[str] = None
+    file_size: Optional[int] = None
+    duration_seconds: Optional[float] = None
+    format: Optional[str] = None      # 已存音频的格式
+    source_id: Optional[str] = None  # 来源 AudioFile ID
+
+
+class ASRResultCache:
+    """ASR 结果缓存（内存 LRU + AudioFile.asr_result）"""
+
+    def __init__(
+        self,
+        max_entries: int = settings.asr_cache_max_entries,
+        ttl_seconds: float = settings.asr_cache_ttl_seconds
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # (content_hash, model) -> (结果, 失效时间 monotonic)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[CachedTranscription, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    # ========== 查询 ==========
+
+    async def aget(
+        self,
+        db: AsyncSession,
+        content_hash: Optional[str],
+        model: str,
+        require_oss: bool = True
+    ) -> Optional[CachedTranscription]:
+        """查找缓存的转写结果（内存未命中时查询数据库）"""
+        if not content_hash:
+            return None
+        cached = self._get_memory(content_hash, model, require_oss)
+        if cached is not None:
+            return cached
+        audio_file = (await db.execute(self._stmt(content_hash, model, require_oss))).scalars().first()
+        return self._load(content_hash, model, audio_file)
+
+    def get(
+        self,
+        db: Session,
+        content_hash: Optional[str],
+        model: str,
+        require_oss: bool = True
+    ) -> Optional[CachedTranscription]:
+        """aget 的同步版本"""
+        if not content_hash:
+            return None
+        cached = self._get_memory(content_hash, model, require_oss)
+        if cached is not None:
+            return cached
+        audio_file = db.execute(self._stmt(content_hash, model, require_oss)).scalars().first()
+        return self._load(content_hash, model, audio_file)
+
+    def record_bypass(self):
+        """记录一次按请求绕过缓存"""
+        with self._lock:
+            self.bypassed += 1
+
+    @staticmethod
+    def _stmt(content_hash: str, model: str, require_oss: bool):
+        stmt = (
+            select(AudioFile)
+            .where(
+                AudioFile.content_hash == content_hash,
+                AudioFile.asr_status == "completed",
+                func.coalesce(AudioFile.asr_result["model"].as_string(), LEGACY_ASR_MODEL) == model
+            )
+            .order_by(AudioFile.created_at.desc())
+            .limit(1)
+        )
+        if require_oss:
+            stmt = stmt.where(AudioFile.oss_key.isnot(None))
+        return stmt
+
+    def _get_memory(self, content_hash: str, model: str, require_oss: bool) -> Optional[CachedTranscription]:
+        key = (content_hash, model)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None and (entry[0].oss_key or not require_oss):
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+        return None
+
+    def _load(self, content_hash: str, model: str, audio_file: Optional[AudioFile]) -> Optional[CachedTranscription]:
+        """数据库查询结果写入内存缓存"""
+        asr_result = audio_file.asr_result if audio_file else None
+        if not asr_result or not asr_result.get("transcript"):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        cached = CachedTranscription(
+            transcript=asr_result["transcript"],
+            sentences=asr_result.get("sentences", []),
+            oss_key=audio_file.oss_key,
+            oss_url=audio_file.oss_url,
+            file_size=audio_file.file_size,
+            duration_seconds=audio_file.duration_seconds,
+            format=audio_file.format,
+            source_id=str(audio_file.id)
+        )
+        with self._lock:
+            self.db_hits += 1
+        self.put(content_hash, model, cached, expires_at=audio_file.expires_at)
+        return cached
+
+    # ========== 写入 ==========
+
+    def put(
+        self,
+        content_hash: Optional[str],
+        model: str,
+        cached: CachedTranscription,
+        expires_at: Optional[datetime] = None
+    ):
+        """
+        写入内存缓存
+
+        Args:
+            expires_at: 音频的过期时间（之后 OSS 对象可能被清理），条目不会活过它
+        """
+        if not content_hash:
+            return
+        ttl = self.ttl_seconds
+        if expires_at is not None:
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            ttl = min(ttl, (expires_at - datetime.now(timezone.utc)).total_seconds())
+        if ttl <= 0:
+            return
+
+        key = (content_hash, model)
+        with self._lock:
+            self._entries[key] = (cached, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """命中率指标"""
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": (self.memory_hits + self.db_hits) / lookups if lookups else 0.0,
+        }
+
+
+# 全局实例
+asr_result_cache = ASRResultCache()
@@ -4,16 +4,23 @@ DashScope 录音文件转写服务
 使用阿里云 DashScope Transcription API 实现语音转文字功能。
 """
 
+import asyncio
+import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
+from functools import partial
 from http import HTTPStatus
 from typing import Optional, List, Dict, Any
 
 import dashscope
+import httpx
 from dashscope.audio.asr import Transcription
 
 from config import settings
 from services.oss_service import oss_service
+from services.asr_cache import asr_result_cache, CachedTranscription
+from services.audio_storage import detect_audio_format
 
 logger = logging.getLogger(__name__)
 
@@ -33,96 +40,194 @@ class ASRService:
     """
     DashScope 录音文件转写服务
 
-    使用 Transcription API 进行语音转文字
+    使用 Transcription API 进行语音转文字。
+    DashScope SDK 与 OSS SDK 都是阻塞调用，统一放到 ASR 专用线程池执行，
+    轮询使用 asyncio.sleep 退避，不占用事件循环和默认线程池。
     """
 
+    TERMINAL_STATUSES = ("SUCCEEDED", "FAILED", "CANCELED", "UNKNOWN")
+
     def __init__(self):
         dashscope.api_key = settings.dashscope_api_key
         dashscope.base_http_api_url = 'https://dashscope.aliyuncs.com/api/v1'
         self.model = "paraformer-v2"
 
-    def transcribe_audio_bytes_sync(
+        # 专用线程池 + 并发上限，避免语音提交高峰挤占默认 executor
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.asr_max_concurrency,
+            thread_name_prefix="asr"
+        )
+        self._semaphore = asyncio.Semaphore(settings.asr_max_concurrency)
+        self._http_client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """延迟初始化用于拉取转写结果的 HTTP 客户端"""
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=10.0))
+        return self._http_client
+
+    async def _run_blocking(self, func, *args, **kwargs):
+        """在 ASR 专用线程池中执行阻塞调用"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def _wait_for_task(self, task_response):
+        """
+        轮询转写任务直到结束（指数退避 + 截止时间）
+
+        Args:
+            task_response: async_call 返回的初始响应
+
+        Returns:
+            任务结束时的响应
+        """
+        task_id = task_response.output.task_id
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.asr_timeout_seconds
+        interval = settings.asr_poll_initial_interval
+
+        while task_response.output.task_status not in self.TERMINAL_STATUSES:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise TimeoutError(f"ASR 转录超时（{settings.asr_timeout_seconds}s），task_id: {task_id}")
+
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * 2, settings.asr_poll_max_interval)
+
+            task_response = await self._run_blocking(Transcription.fetch, task=task_id)
+            if not task_response.output:
+                raise Exception(f"ASR 任务查询失败: {task_response}")
+
+        return task_response
+
+    async def transcribe_audio_bytes(
         self,
         audio_data: bytes,
+        context_text: Optional[str] = None,
+        language: str = "zh",
         sample_rate: int = 16000,
-        persist_audio: bool = False
+        persist_audio: bool = False,
+        on_progress: Optional[Any] = None,
+        content_hash: Optional[str] = None,
+        use_cache: bool = True
     ) -> tuple:
         """
-        同步转录音频字节数据
+        异步转录音频字节数据
 
         Args:
             audio_data: 音频字节数据（支持 WebM、WAV、MP3 等格式）
-            sample_rate: 采样率，默认 16000Hz（paraformer-v2 自动处理）
+            context_text: 上下文文本（暂未使用）
+            language: 语言代码（暂未使用，paraformer-v2 使用 language_hints）
+            sample_rate: 采样率（paraformer-v2 自动处理）
             persist_audio: 是否持久化保存音频到 OSS（不删除）
+            on_progress: 进度回调（暂未使用）
+            content_hash: 录音内容哈希（缓存键），默认为 audio_data 的 SHA-256；
+                音频经过预处理时应传原始录音的哈希
+            use_cache: 是否查询转写结果缓存（False：调用方已查询过，或需要强制重新转写）
 
         Returns:
             tuple: (ASRResult, (oss_key, oss_url) 或 None)
                 - 如果 persist_audio=True，返回 OSS 信息用于后续回放
                 - 如果 persist_audio=False，返回 None
         """
+        content_hash = content_hash or hashlib.sha256(audio_data).hexdigest()
+        if use_cache:
+            cached = await self.lookup_cached(content_hash, require_oss=persist_audio)
+            if cached is not None:
+                # 缓存命中：跳过 OSS 上传和转写任务
+                logger.info(f"ASR 缓存命中: content_hash={content_hash[:12]}, 来源={cached.source_id}")
+                asr_result = ASRResult(transcript=cached.transcript, sentences=cached.sentences)
+                return asr_result, (cached.oss_key, cached.oss_url) if persist_audio else None
+
+        async with self._semaphore:
+            asr_result, oss_info = await self._transcribe(audio_data, persist_audio)
+
+        if asr_result.transcript:
+            asr_result_cache.put(content_hash, self.model, CachedTranscription(
+                transcript=asr_result.transcript,
+                sentences=asr_result.sentences,
+                oss_key=oss_info[0] if oss_info else None,
+                oss_url=oss_info[1] if oss_info else None,
+                file_size=len(audio_data),
+                format=detect_audio_format(audio_data)
+            ))
+        return asr_result, oss_info
+
+    async def lookup_cached(
+        self,
+        content_hash: Optional[str],
+        require_oss: bool = True,
+        use_cache: bool = True
+    ) -> Optional[CachedTranscription]:
+        """
+        查询当前模型下相同内容的转写结果
+
+        Args:
+            content_hash: 录音内容 SHA-256
+            require_oss: 是否要求音频仍在 OSS 上（复用其 oss_key）
+            use_cache: False 时按请求绕过缓存（只计数，返回 None）
+        """
+        if not use_cache:
+            asr_result_cache.record_bypass()
+            return None
+        if not content_hash:
+            return None
+
+        from database import db_unit_of_work
+
+        async with db_unit_of_work() as db:
+            cached = await asr_result_cache.aget(db, content_hash, self.model, require_oss=require_oss)
+        if cached is not None and require_oss and cached.oss_key:
+            # 复用其 OSS 对象前刷新记录，避免被并发清理删除；内容已被清理时按未命中处理
+            from services.audio_blob_store import audio_blob_store
+
+            if not await audio_blob_store.atouch(oss_key=cached.oss_key):
+                logger.info(f"缓存的音频已被清理，重新转写: content_hash={content_hash[:12]}")
+                return None
+        return cached
+
+    async def _transcribe(self, audio_data: bytes, persist_audio: bool) -> tuple:
+        """上传 → 提交任务 → 轮询 → 拉取结果"""
         audio_url = None
         oss_key = None
         oss_base_url = None
+        oss_created = False
+
+        # 对象后缀与实际格式一致（决定回放时的 Content-Type），无法识别时按浏览器录音 WebM 处理
+        suffix = f".{detect_audio_format(audio_data) or 'webm'}"
 
         try:
             # 1. 上传音频到 OSS（paraformer-v2 原生支持 WebM 格式，无需转换）
             logger.info(f"上传音频到 OSS，大小: {len(audio_data)} bytes, persist={persist_audio}")
 
             if persist_audio:
-                # 持久化上传（不会自动删除）
-                oss_key, oss_base_url = oss_service.upload_audio_persistent(audio_data, suffix='.webm')
+                # 按内容寻址持久化上传（相同内容已存在时跳过上传，不会自动删除）
+                from services.audio_blob_store import audio_blob_store
+
+                oss_key, oss_base_url, oss_created = await audio_blob_store.aupload_oss(audio_data, suffix=suffix)
                 # 生成临时签名 URL 用于 ASR
                 audio_url = oss_service.get_signed_url(oss_key, 3600)
             else:
                 # 临时上传（转录后删除）
-                audio_url = oss_service.upload_audio(audio_data, suffix='.webm')
+                audio_url = await oss_service.aupload_audio(audio_data, suffix=suffix)
 
             logger.info(f"音频 URL: {audio_url[:80]}...")
 
-            # 2. 提交转录任务
-            logger.info("提交 ASR 转录任务...")
-            task_response = Transcription.async_call(
-                model=self.model,
-                file_urls=[audio_url],
-                language_hints=['zh', 'en']  # paraformer-v2 专属参数
-            )
-
-            if not task_response.output or not task_response.output.task_id:
-                raise Exception(f"ASR 任务提交失败: {task_response}")
-
-            task_id = task_response.output.task_id
-            logger.info(f"ASR 任务已提交，task_id: {task_id}")
-
-            # 3. 轮询等待转录结果
-            logger.info("等待 ASR 转录结果...")
-            while True:
-                if task_response.output.task_status in ['SUCCEEDED', 'FAILED']:
-                    break
-                task_response = Transcription.fetch(task=task_id)
-
-            if task_response.status_code == HTTPStatus.OK:
-                # 解析转录结果
-                transcript, sentences = self._parse_result(task_response.output)
-                logger.info(f"ASR 转录完成: {transcript[:100] if transcript else '(空)'}...")
-                logger.info(f"ASR 句子数: {len(sentences)}")
-
-                asr_result = ASRResult(transcript=transcript, sentences=sentences)
-
-                # 返回 ASR 结果和 OSS 信息
-                if persist_audio:
-                    return asr_result, (oss_key, oss_base_url)
-                else:
-                    return asr_result, None
+            asr_result = await self._recognize(audio_url)
+
+            # 返回 ASR 结果和 OSS 信息
+            if persist_audio:
+                return asr_result, (oss_key, oss_base_url)
             else:
-                error_msg = getattr(task_response, 'message', str(task_response))
-                raise Exception(f"ASR 转录失败: {error_msg}")
+                return asr_result, None
 
         except Exception as e:
             logger.error(f"ASR 转录失败: {e}")
-            # 如果是持久化模式且出错，也要清理 OSS 文件
-            if persist_audio and oss_key:
+            # 如果是持久化模式且出错，清理本次新上传的 OSS 文件（已存在的对象可能被其他录音引用）
+            if persist_audio and oss_key and oss_created:
                 try:
-                    oss_service.delete_audio(oss_key)
+                    await oss_service.adelete_audio(oss_key)
                 except Exception as cleanup_error:
                     logger.warning(f"清理失败的 OSS 文件失败: {cleanup_error}")
             raise
@@ -132,11 +237,58 @@ class ASRService:
                 try:
                     key = oss_service.get_key_from_url(audio_url)
                     if key:
-                        oss_service.delete_audio(key)
+                        await oss_service.adelete_audio(key)
                 except Exception as e:
                     logger.warning(f"清理 OSS 文件失败: {e}")
 
-    def _parse_result(self, output) -> tuple:
+    async def transcribe_oss_object(self, oss_key: str, context_text: Optional[str] = None) -> tuple:
+        """
+        转录已在 OSS 上的音频（浏览器直传），音频字节不经过本服务
+
+        Args:
+            oss_key: OSS 对象 key
+            context_text: 上下文文本（暂未使用）
+
+        Returns:
+            tuple: (ASRResult, (oss_key, oss_url))
+        """
+        async with self._semaphore:
+            audio_url = oss_service.get_signed_url(oss_key, 3600)
+            logger.info(f"转录直传音频: {oss_key}")
+            asr_result = await self._recognize(audio_url)
+            return asr_result, (oss_key, oss_service.object_url(oss_key))
+
+    async def _recognize(self, audio_url: str) -> ASRResult:
+        """提交任务 → 轮询 → 拉取结果"""
+        # 2. 提交转录任务
+        logger.info("提交 ASR 转录任务...")
+        task_response = await self._run_blocking(
+            Transcription.async_call,
+            model=self.model,
+            file_urls=[audio_url],
+            language_hints=['zh', 'en']  # paraformer-v2 专属参数
+        )
+
+        if not task_response.output or not task_response.output.task_id:
+            raise Exception(f"ASR 任务提交失败: {task_response}")
+
+        logger.info(f"ASR 任务已提交，task_id: {task_response.output.task_id}")
+
+        # 3. 退避轮询等待转录结果
+        logger.info("等待 ASR 转录结果...")
+        task_response = await self._wait_for_task(task_response)
+
+        if task_response.status_code == HTTPStatus.OK and task_response.output.task_status == "SUCCEEDED":
+            # 解析转录结果
+            transcript, sentences = await self._parse_result(task_response.output)
+            logger.info(f"ASR 转录完成: {transcript[:100] if transcript else '(空)'}...")
+            logger.info(f"ASR 句子数: {len(sentences)}")
+            return ASRResult(transcript=transcript, sentences=sentences)
+
+        error_msg = getattr(task_response, 'message', str(task_response))
+        raise Exception(f"ASR 转录失败: {error_msg}")
+
+    async def _parse_result(self, output) -> tuple:
         """
         解析 Transcription API 返回的结果
 
@@ -170,10 +322,9 @@ class ASRService:
                         transcription_url = result['transcription_url']
 
                     if transcription_url:
-                        # 获取转录结果文件内容
-                        import requests
+                        # 异步获取转录结果文件内容
                         logger.info(f"获取转录结果: {transcription_url[:80]}...")
-                        resp = requests.get(transcription_url)
+                        resp = await self.http_client.get(transcription_url)
                         if resp.status_code == 200:
                             data = resp.json()
                             logger.info(f"转录结果 JSON: {data}")
@@ -208,35 +359,12 @@ class ASRService:
             logger.error(f"解析 ASR 结果失败: {e}")
             return "", []
 
-    async def transcribe_audio_bytes(
-        self,
-        audio_data: bytes,
-        context_text: Optional[str] = None,
-        language: str = "zh",
-        sample_rate: int = 16000,
-        persist_audio: bool = False,
-        on_progress: Optional[Any] = None
-    ) -> tuple:
-        """
-        异步转录音频字节数据（兼容现有接口）
-
-        Args:
-            audio_data: 音频字节数据（支持 WebM、WAV、MP3 等格式）
-            context_text: 上下文文本（暂未使用）
-            language: 语言代码（暂未使用，paraformer-v2 使用 language_hints）
-            sample_rate: 采样率（paraformer-v2 自动处理）
-            persist_audio: 是否持久化保存音频到 OSS
-            on_progress: 进度回调（暂未使用）
-
-        Returns:
-            tuple: (ASRResult, (oss_key, oss_url) 或 None)
-        """
-        import asyncio
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(
-            None,
-            lambda: self.transcribe_audio_bytes_sync(audio_data, sample_rate, persist_audio)
-        )
+    async def close(self):
+        """释放 HTTP 客户端与线程池"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+        self._executor.shutdown(wait=False)
 
 
 def build_context_text(
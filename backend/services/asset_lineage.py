@@ -0,0 +1,103 @@
+"""
+资产版本谱系
+
+同一项目下同一问题的资产属于一个谱系（asset_lineages），
+新版本插入时通过一条 upsert 原子地分配谱系和版本号：
+
+    INSERT INTO asset_lineages ... ON CONFLICT (project_id, question_fingerprint)
+    DO UPDATE SET latest_version = latest_version + 1 RETURNING id, latest_version
+
+版本列表按 (lineage_id, version) 索引读取，不再按问题文本匹配、也不再读时重排版本号。
+"""
+
+import hashlib
+import uuid
+from typing import Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models.asset import Asset, AssetLineage
+
+
+def question_fingerprint(question: str) -> str:
+    """问题文本指纹（去除首尾空白、合并连续空白后取 md5）"""
+    normalized = " ".join(question.split())
+    return hashlib.md5(normalized.encode("utf-8")).hexdigest()
+
+
+class AssetLineageService:
+    """资产版本分配"""
+
+    @staticmethod
+    def _allocate_by_question(project_id: UUID, question: str):
+        fingerprint = question_fingerprint(question)
+        stmt = insert(AssetLineage).values(
+            id=uuid.uuid4(),
+            project_id=project_id,
+            question_fingerprint=fingerprint,
+            latest_version=1
+        )
+        return stmt.on_conflict_do_update(
+            index_elements=[AssetLineage.project_id, AssetLineage.question_fingerprint],
+            set_={"latest_version": AssetLineage.latest_version + 1}
+        ).returning(AssetLineage.id, AssetLineage.latest_version)
+
+    @staticmethod
+    def _allocate_by_parent(project_id: UUID, parent_asset_id: UUID):
+        # 父版本必须属于同一项目，否则不能加入其谱系
+        parent_lineage = select(Asset.lineage_id).where(
+            Asset.id == parent_asset_id,
+            Asset.project_id == project_id
+        ).scalar_subquery()
+        return (
+            update(AssetLineage)
+            .where(AssetLineage.id == parent_lineage)
+            .values(latest_version=AssetLineage.latest_version + 1)
+            .returning(AssetLineage.id, AssetLineage.latest_version)
+        )
+
+    def next_version(
+        self,
+        db: Session,
+        project_id: UUID,
+        question: str,
+        parent_asset_id: Optional[UUID] = None
+    ) -> Tuple[UUID, int]:
+        """
+        为新资产分配谱系和版本号（与资产插入在同一事务中提交）
+
+        Args:
+            parent_asset_id: 父版本ID，提供时沿用父版本的谱系（仅限同一项目下的资产，调用方需先校验）
+
+        Returns:
+            (lineage_id, version)
+        """
+        if parent_asset_id:
+            row = db.execute(self._allocate_by_parent(project_id, parent_asset_id)).first()
+            if row:
+                return row.id, row.latest_version
+        row = db.execute(self._allocate_by_question(project_id, question)).one()
+        return row.id, row.latest_version
+
+    async def anext_version(
+        self,
+        db: AsyncSession,
+        project_id: UUID,
+        question: str,
+        parent_asset_id: Optional[UUID] = None
+    ) -> Tuple[UUID, int]:
+        """next_version 的异步版本"""
+        if parent_asset_id:
+            row = (await db.execute(self._allocate_by_parent(project_id, parent_asset_id))).first()
+            if row:
+                return row.id, row.latest_version
+        row = (await db.execute(self._allocate_by_question(project_id, question))).one()
+        return row.id, row.latest_version
+
+
+# 全局实例
+asset_lineage_service = AssetLineageService()
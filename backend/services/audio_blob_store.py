@@ -0,0 +1,160 @@
+"""
+按内容寻址的音频存储
+
+本地与 OSS 上的音频都以内容 SHA-256 命名：
+- 本地: {audio_storage_path}/blobs/{hash[:2]}/{hash}{ext}
+- OSS:  audio/sha256/{hash}{ext}
+相同内容的录音（客户端重试、重复提交、重新分析）只保存一份，
+已转写过的内容按 (哈希, 模型) 复用转写结果，跳过上传和 ASR（见 services/asr_cache.py）。
+引用计数见 models/audio_blob.py，清理见 CleanupService。
+
+复用已存在的内容（本地文件或 OSS 对象）前先刷新其 audio_blobs 记录的 updated_at：
+清理只删除无引用且闲置超过宽限期的内容，并在持有行锁时删除文件、再删记录，
+因此不会删掉刚被复用、还没写入 AudioFile 的内容。
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from config import settings
+from models.audio_blob import AudioBlob
+
+logger = logging.getLogger(__name__)
+
+
+class AudioBlobStore:
+    """内容寻址的音频存储"""
+
+    def __init__(self, root: str = settings.audio_storage_path):
+        self.root = os.path.join(root, "blobs")
+
+    def local_path(self, content_hash: str, suffix: str) -> str:
+        return os.path.join(self.root, content_hash[:2], f"{content_hash}{suffix}")
+
+    @staticmethod
+    def _touch_stmt(content_hash: Optional[str] = None, oss_key: Optional[str] = None):
+        column, value = (AudioBlob.content_hash, content_hash) if content_hash else (AudioBlob.oss_key, oss_key)
+        return update(AudioBlob).where(column == value).values(updated_at=func.now())
+
+    def touch(self, db: Session, content_hash: Optional[str] = None, oss_key: Optional[str] = None) -> bool:
+        """
+        复用内容前刷新其 updated_at（不提交：行锁保持到调用方提交，期间清理会跳过该内容）
+
+        清理正在删除该内容时会等待清理提交，之后记录已不存在，返回 False。
+
+        Returns:
+            是否存在对应的 audio_blobs 记录
+        """
+        return db.execute(self._touch_stmt(content_hash, oss_key)).rowcount > 0
+
+    async def atouch(self, content_hash: Optional[str] = None, oss_key: Optional[str] = None) -> bool:
+        """touch 的异步版本（独立工作单元，立即提交；之后由清理宽限期保护）"""
+        from database import db_unit_of_work
+
+        async with db_unit_of_work() as db:
+            touched = (await db.execute(self._touch_stmt(content_hash, oss_key))).rowcount > 0
+            await db.commit()
+        return touched
+
+    def commit_local(self, db: Session, temp_path: str, content_hash: str, suffix: str) -> str:
+        """
+        把已写完的临时文件移到内容寻址路径
+
+        相同内容已存在时直接删除临时文件。先刷新记录再检查文件，
+        调用方须在同一事务中写入 AudioFile 后提交。
+
+        Returns:
+            内容寻址路径
+        """
+        path = self.local_path(content_hash, suffix)
+        self.touch(db, content_hash=content_hash)
+        if os.path.exists(path):
+            os.remove(temp_path)
+            logger.info(f"本地音频去重命中: {content_hash[:12]}")
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+        return path
+
+    async def aupload_oss(self, audio_data: bytes, suffix: str) -> tuple:
+        """
+        按内容寻址上传到 OSS（对象已存在时复用，复用前先刷新记录）
+
+        Returns:
+            tuple: (oss_key, oss_url, created)
+        """
+        import hashlib
+        from services.oss_service import oss_service
+
+        await self.atouch(oss_key=oss_service.content_addressed_key(hashlib.sha256(audio_data).hexdigest(), suffix))
+        return await oss_service.aupload_audio_content_addressed(audio_data, suffix=suffix)
+
+    async def aadopt_oss_upload(self, key: str, content_hash: str, suffix: str) -> tuple:
+        """
+        把浏览器直传的对象转为按内容寻址存储（目标已存在时复用，复用前先刷新记录）
+
+        Returns:
+            tuple: (oss_key, oss_url, created)
+        """
+        from services.oss_service import oss_service
+
+        await self.atouch(oss_key=oss_service.content_addressed_key(content_hash, suffix))
+        return await oss_service.aadopt_upload_content_addressed(key, content_hash, suffix=suffix)
+
+    # ========== 清理 ==========
+
+    def purge_unreferenced(self, db: Session, batch_size: int = 100) -> int:
+        """
+        删除无引用且闲置超过宽限期的内容
+
+        在一个事务中：锁定记录（跳过正被复用的）→ 删除文件 / OSS 对象 → 删除记录。
+        并发复用同一内容的 touch 会等待本事务提交，之后发现记录已不存在，重新写入内容。
+        OSS 删除失败的记录保留，下次重试。
+
+        Returns:
+            删除的内容数
+        """
+        from services.oss_service import oss_service
+
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.audio_blob_purge_grace_seconds)
+        blobs = db.execute(
+            select(AudioBlob.content_hash, AudioBlob.local_path, AudioBlob.oss_key)
+            .where(AudioBlob.ref_count <= 0, AudioBlob.updated_at < cutoff)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not blobs:
+            db.commit()
+            return 0
+
+        oss_keys: List[str] = [b.oss_key for b in blobs if b.oss_key]
+        results = oss_service.batch_delete(oss_keys) if oss_keys else {}
+        failed = [key for key, ok in results.items() if not ok]
+        if failed:
+            logger.warning(f"删除无引用音频对象失败 {len(failed)} 个，下次重试: {failed[:10]}")
+
+        deleted = [b for b in blobs if not b.oss_key or results.get(b.oss_key)]
+        for blob in deleted:
+            if blob.local_path:
+                try:
+                    os.remove(blob.local_path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"删除本地音频失败 {blob.local_path}: {e}")
+
+        if deleted:
+            db.execute(delete(AudioBlob).where(AudioBlob.content_hash.in_([b.content_hash for b in deleted])))
+        db.commit()
+
+        logger.info(f"清理无引用音频: {len(deleted)} 个")
+        return len(deleted)
+
+
+# 全局实例
+audio_blob_store = AudioBlobStore()
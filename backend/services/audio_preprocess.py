@@ -0,0 +1,219 @@
+"""
+录音预处理（ASR 上传前）
+
+浏览器录制的 WebM 先解码为 16kHz 单声道 PCM，用 NumPy 向量化的能量 VAD：
+- 裁掉首尾静音（各保留 audio_vad_padding_ms）
+- 超过 audio_vad_max_pause_ms 的停顿压缩到该长度（思考时的长停顿）
+然后重新编码为 16kHz 单声道 Opus（WebM 容器，paraformer-v2 原生支持）。
+
+解码/编码使用 ffmpeg 子进程（异步执行，不阻塞事件循环），VAD 在线程中执行。
+可选依赖：numpy 或 ffmpeg 不可用、处理失败、未检测到语音时原样返回录音。
+"""
+
+import asyncio
+import logging
+import shutil
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from config import settings
+
+# 可选依赖：numpy（能量 VAD）
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# 可选依赖：ffmpeg 可执行文件（解码 WebM / 编码 Opus）
+FFMPEG_PATH = shutil.which("ffmpeg")
+FFMPEG_AVAILABLE = FFMPEG_PATH is not None
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+
+@dataclass
+class PreprocessResult:
+    """预处理结果"""
+    audio_data: bytes
+    original_size: int
+    duration_seconds: Optional[float] = None           # 处理后时长
+    original_duration_seconds: Optional[float] = None  # 处理前时长（解码成功时才有）
+    applied: bool = False                              # 是否使用了处理后的音频
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_size - len(self.audio_data)
+
+    @property
+    def seconds_saved(self) -> float:
+        if self.duration_seconds is None or self.original_duration_seconds is None:
+            return 0.0
+        return self.original_duration_seconds - self.duration_seconds
+
+
+def trim_silence(
+    samples: "np.ndarray",
+    sample_rate: int = SAMPLE_RATE,
+    frame_ms: int = settings.audio_vad_frame_ms,
+    threshold_db: float = settings.audio_vad_threshold_db,
+    max_pause_ms: int = settings.audio_vad_max_pause_ms,
+    padding_ms: int = settings.audio_vad_padding_ms
+) -> "np.ndarray":
+    """
+    基于帧能量裁剪静音
+
+    帧能量（dBFS）高于阈值的帧视为语音。阈值随录音自适应：噪声底（10 分位）+ 10dB，
+    但不高于语音电平（95 分位）- 20dB，避免整段连续说话时被误判为静音；且不低于 threshold_db。
+    首尾静音只保留 padding_ms，中间超过 max_pause_ms 的静音段保留首尾各一半。
+
+    Args:
+        samples: int16 单声道采样
+
+    Returns:
+        裁剪后的 int16 采样；未检测到语音时返回空数组
+    """
+    frame_len = sample_rate * frame_ms // 1000
+    n = len(samples) // frame_len
+    if n == 0:
+        return samples[:0]
+
+    frames = samples[:n * frame_len].reshape(n, frame_len).astype(np.float32) / 32768.0
+    energy_db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    noise_floor, speech_level = np.percentile(energy_db, [10, 95])
+    silent = energy_db <= max(threshold_db, min(noise_floor + 10, speech_level - 20))
+    if silent.all():
+        return samples[:0]
+
+    # 按连续段计算每帧在所在段内的位置和段长
+    change = np.flatnonzero(np.diff(silent.astype(np.int8))) + 1
+    bounds = np.concatenate(([0], change, [n]))
+    starts, lengths = bounds[:-1], np.diff(bounds)
+    run = np.repeat(np.arange(len(starts)), lengths)
+    pos = np.arange(n) - starts[run]
+    length = lengths[run]
+
+    pad = padding_ms // frame_ms
+    half_pause = max_pause_ms // frame_ms // 2
+    keep = ~silent | (pos < half_pause) | (pos >= length - half_pause)
+    if silent[0]:
+        # 首段静音：只保留紧挨语音的 pad 帧
+        keep[:lengths[0]] = pos[:lengths[0]] >= lengths[0] - pad
+    if silent[-1]:
+        # 尾段静音：只保留紧挨语音的 pad 帧
+        keep[n - lengths[-1]:] = pos[n - lengths[-1]:] < pad
+
+    return samples[:n * frame_len][np.repeat(keep, frame_len)]
+
+
+class AudioPreprocessor:
+    """录音预处理：解码 → VAD 裁剪 → Opus 编码"""
+
+    def __init__(self):
+        self.enabled = settings.audio_preprocess_enabled and NUMPY_AVAILABLE and FFMPEG_AVAILABLE
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.skipped = 0
+        self.bytes_saved = 0
+        self.seconds_saved = 0.0
+        if settings.audio_preprocess_enabled and not self.enabled:
+            logger.warning(f"录音预处理不可用: numpy={NUMPY_AVAILABLE}, ffmpeg={FFMPEG_AVAILABLE}")
+
+    async def process(self, audio_data: bytes) -> PreprocessResult:
+        """
+        预处理一段录音
+
+        Returns:
+            PreprocessResult，applied=False 时 audio_data 为原始录音
+        """
+        result = PreprocessResult(audio_data=bytes(audio_data), original_size=len(audio_data))
+        if not self.enabled:
+            return result
+
+        try:
+            pcm = await self._ffmpeg(
+                ["-i", "pipe:0", "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"],
+                result.audio_data
+            )
+            samples = np.frombuffer(pcm, dtype=np.int16)
+            result.original_duration_seconds = len(samples) / SAMPLE_RATE
+
+            trimmed = await asyncio.to_thread(trim_silence, samples)
+            if len(trimmed) == 0:
+                # 未检测到语音：交给 ASR 判断，不做裁剪
+                logger.info("录音预处理: 未检测到语音，保留原始录音")
+                result.duration_seconds = result.original_duration_seconds
+                self._record(result)
+                return result
+
+            encoded = await self._ffmpeg(
+                ["-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-i", "pipe:0",
+                 "-c:a", "libopus", "-b:a", settings.audio_opus_bitrate, "-application", "voip",
+                 "-f", "webm", "pipe:1"],
+                trimmed.tobytes()
+            )
+        except Exception as e:
+            logger.warning(f"录音预处理失败，使用原始录音: {e}")
+            self._record(result)
+            return result
+
+        result.duration_seconds = len(trimmed) / SAMPLE_RATE
+        if len(encoded) < result.original_size or result.seconds_saved > 0:
+            result.audio_data = encoded
+            result.applied = True
+        else:
+            result.duration_seconds = result.original_duration_seconds
+
+        logger.info(
+            f"录音预处理: {result.original_duration_seconds:.1f}s → {result.duration_seconds:.1f}s "
+            f"(节省 {result.seconds_saved:.1f}s), {result.original_size} → {len(result.audio_data)} bytes "
+            f"(节省 {result.bytes_saved} bytes)"
+        )
+        self._record(result)
+        return result
+
+    async def _ffmpeg(self, args: list, data: bytes) -> bytes:
+        """通过管道执行 ffmpeg，返回 stdout"""
+        proc = await asyncio.create_subprocess_exec(
+            FFMPEG_PATH, "-hide_banner", "-loglevel", "error", *args,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                proc.communicate(data), timeout=settings.audio_preprocess_timeout_seconds
+            )
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise RuntimeError("ffmpeg 处理超时")
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg 退出码 {proc.returncode}: {stderr.decode(errors='ignore')[-300:]}")
+        return stdout
+
+    def _record(self, result: PreprocessResult):
+        with self._lock:
+            if result.applied:
+                self.processed += 1
+                self.bytes_saved += result.bytes_saved
+                self.seconds_saved += result.seconds_saved
+            else:
+                self.skipped += 1
+
+    def stats(self) -> dict:
+        """累计处理的录音数和节省的字节数、时长"""
+        return {
+            "enabled": self.enabled,
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "bytes_saved": self.bytes_saved,
+            "seconds_saved": round(self.seconds_saved, 1),
+        }
+
+
+# 全局实例
+audio_preprocessor = AudioPreprocessor()
@@ -0,0 +1,161 @@
+"""
+音频文件流式落盘
+
+上传内容按固定大小分块读取，边写磁盘（anyio 异步文件 I/O）边计算 SHA-256 和大小，
+单次上传的内存占用与文件大小无关；超过上限立即中止并删除已写入的部分。
+WAV / PCM 的时长从头部和数据长度直接算出，无需再读一遍文件。
+"""
+
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import struct
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+import anyio
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# 裸 PCM 的默认参数（与前端录音一致：16kHz、16bit、单声道）
+PCM_BYTE_RATE = 16000 * 2
+
+
+class UploadTooLarge(Exception):
+    """上传超过大小上限"""
+
+
+class InvalidUpload(Exception):
+    """上传内容无效"""
+
+
+@dataclass
+class StoredAudio:
+    """落盘结果"""
+    file_path: str
+    size: int
+    sha256: str
+    duration_seconds: Optional[float] = None
+
+
+def _wav_byte_rate(header: bytes) -> Optional[int]:
+    """从 WAV 头部读取 byte rate（RIFF fmt 块，偏移 28）"""
+    if len(header) < 44 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return None
+    byte_rate = struct.unpack("<I", header[28:32])[0]
+    return byte_rate or None
+
+
+def detect_audio_format(data: bytes) -> Optional[str]:
+    """
+    按文件头识别音频格式
+
+    Returns:
+        wav / webm / mp3（与 AudioFormat 取值一致）；无法识别时返回 None（裸 PCM 没有文件头）
+    """
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return "wav"
+    if data[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if data[:3] == b"ID3" or (len(data) >= 2 and data[0] == 0xFF and data[1] & 0xE0 == 0xE0):
+        return "mp3"
+    return None
+
+
+def _duration(format: str, header: bytes, size: int) -> Optional[float]:
+    """按格式估算时长（WAV 按 44 字节标准头计算，其他压缩格式需解码，返回 None）"""
+    if format == "pcm":
+        return size / PCM_BYTE_RATE
+    if format == "wav":
+        byte_rate = _wav_byte_rate(header)
+        if byte_rate:
+            return max(0, size - 44) / byte_rate
+    return None
+
+
+async def save_stream(
+    chunks: AsyncIterator[bytes],
+    file_path: str,
+    format: str,
+    max_bytes: int = settings.max_audio_upload_bytes
+) -> StoredAudio:
+    """
+    把分块数据流写入文件
+
+    Raises:
+        UploadTooLarge: 超过 max_bytes（已写入的部分会被删除）
+    """
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    header = b""
+
+    try:
+        async with await anyio.open_file(file_path, "wb") as f:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"音频过大，最大 {max_bytes} bytes")
+                if len(header) < 44:
+                    header += chunk[:44 - len(header)]
+                digest.update(chunk)
+                await f.write(chunk)
+    except BaseException:
+        # 中止或出错时删除不完整的文件
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+        raise
+
+    return StoredAudio(
+        file_path=file_path,
+        size=size,
+        sha256=digest.hexdigest(),
+        duration_seconds=_duration(format, header, size)
+    )
+
+
+async def iter_upload_file(file, chunk_size: int = settings.audio_upload_chunk_bytes) -> AsyncIterator[bytes]:
+    """按块读取 UploadFile"""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def decode_base64_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    流式解码 Base64（忽略空白，支持 data URL 前缀）
+
+    每次只解码 4 字节对齐的部分，余下的留到下一块。
+    """
+    pending = b""
+    first = True
+    async for chunk in chunks:
+        data = pending + b"".join(chunk.split())
+        if first and data:
+            # data:audio/webm;base64,xxxx
+            if data.startswith(b"data:"):
+                comma = data.find(b",")
+                if comma == -1:
+                    pending = data
+                    continue
+                data = data[comma + 1:]
+            first = False
+        usable = len(data) - len(data) % 4
+        pending = data[usable:]
+        if usable:
+            try:
+                yield base64.b64decode(data[:usable], validate=True)
+            except binascii.Error as e:
+                raise InvalidUpload(f"无效的Base64数据: {e}")
+    if pending:
+        raise InvalidUpload("无效的Base64数据: 长度不是 4 的倍数")
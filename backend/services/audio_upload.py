@@ -0,0 +1,79 @@
+"""
+WebSocket 音频上传缓冲区
+
+二进制帧协议：客户端先发送 JSON 头 {"type": "audio_upload", "size": N}，
+随后发送若干二进制帧，服务端按偏移直接写入预分配的 bytearray。
+
+音频字节不进入 LangGraph state，而是登记到本模块的注册表，
+state 中只保存引用（audio_ref），由 Interviewer 在转写时取出。
+"""
+
+import logging
+import uuid
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AudioUploadBuffer:
+    """预分配的音频组装缓冲区（按帧写入，无中间拷贝）"""
+
+    def __init__(self, size: int, max_size: int):
+        if size <= 0:
+            raise ValueError("音频大小无效")
+        if size > max_size:
+            raise ValueError(f"音频过大: {size} bytes，最大 {max_size} bytes")
+        self.size = size
+        self.received = 0
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+
+    @property
+    def complete(self) -> bool:
+        return self.received == self.size
+
+    def feed(self, frame: bytes):
+        """写入一帧数据"""
+        end = self.received + len(frame)
+        if end > self.size:
+            raise ValueError(f"音频数据超出声明大小: {end} > {self.size}")
+        self._view[self.received:end] = frame
+        self.received = end
+
+    def release(self) -> bytearray:
+        """返回组装好的音频（不拷贝），之后缓冲区不可再写入"""
+        if not self.complete:
+            raise ValueError(f"音频未接收完整: {self.received}/{self.size}")
+        self._view.release()
+        return self._buffer
+
+
+# 全局音频注册表：audio_ref -> 音频字节
+_pending_audio: Dict[str, bytes | bytearray] = {}
+
+
+def register_audio(audio_data: bytes | bytearray) -> str:
+    """
+    登记待处理的音频
+
+    Args:
+        audio_data: 音频字节（按引用保存，不拷贝）
+
+    Returns:
+        音频引用 ID，放入 state 的 audio_ref 字段
+    """
+    audio_ref = uuid.uuid4().hex
+    _pending_audio[audio_ref] = audio_data
+    logger.debug(f"登记音频: audio_ref={audio_ref}, size={len(audio_data)}")
+    return audio_ref
+
+
+def pop_audio(audio_ref: str) -> Optional[bytes | bytearray]:
+    """取出并移除已登记的音频"""
+    return _pending_audio.pop(audio_ref, None)
+
+
+def discard_audio(audio_ref: Optional[str]):
+    """丢弃未被消费的音频（处理取消或出错时调用）"""
+    if audio_ref:
+        _pending_audio.pop(audio_ref, None)
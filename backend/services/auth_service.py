@@ -8,6 +8,7 @@ from uuid import UUID
 
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import settings
 from models.user import User
@@ -100,6 +101,10 @@ class AuthService:
         """根据 ID 获取用户"""
         return db.query(User).filter(User.id == user_id).first()
 
+    async def get_user_by_id_async(self, db: AsyncSession, user_id: UUID) -> Optional[User]:
+        """根据 ID 获取用户（异步会话）"""
+        return await db.get(User, user_id)
+
     def get_user_by_email(self, db: Session, email: str) -> Optional[User]:
         """根据邮箱获取用户"""
         return db.query(User).filter(User.email == email).first()
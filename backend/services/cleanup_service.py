@@ -12,6 +12,7 @@ from sqlalchemy.orm import Session
 
 from models.audio_file import AudioFile
 from services.oss_service import oss_service
+from services.audio_blob_store import audio_blob_store
 
 logger = logging.getLogger(__name__)
 
@@ -51,24 +52,29 @@ class CleanupService:
                 "message": "No expired files"
             }
 
-        # 收集 OSS keys
-        oss_keys = [f.oss_key for f in expired_files if f.oss_key]
+        # 内容寻址的文件只释放引用，引用计数降为 0 后才删除；旧文件按批直接删除
+        legacy_keys = [f.oss_key for f in expired_files if f.oss_key and not f.content_hash]
+        results = oss_service.batch_delete(legacy_keys) if legacy_keys else {}
+        failed_keys = [key for key, ok in results.items() if not ok]
 
-        # 从 OSS 删除文件
-        deleted_count = oss_service.delete_expired_audio(oss_keys)
-
-        # 更新数据库记录（清除 OSS 信息，保留记录用于历史查询）
+        # 更新数据库记录（清除 OSS 信息，保留记录用于历史查询）；删除失败的保留 key，下次重试
         for audio_file in expired_files:
+            if not results.get(audio_file.oss_key, True):
+                continue
             audio_file.oss_key = None
             audio_file.oss_url = None
+            audio_file.content_hash = None  # 释放对内容的引用
 
         db.commit()
 
+        deleted_count = len(results) - len(failed_keys) + audio_blob_store.purge_unreferenced(db, batch_size)
+
         logger.info(f"清理完成: 删除 {deleted_count}/{len(expired_files)} 个过期音频文件")
 
         return {
             "deleted": deleted_count,
-            "failed": len(expired_files) - deleted_count,
+            "failed": len(failed_keys),
+            "failed_keys": failed_keys,
             "total_processed": len(expired_files),
             "message": f"Cleaned up {deleted_count} expired audio files"
         }
@@ -101,22 +107,27 @@ class CleanupService:
                 "message": "No orphaned files"
             }
 
-        # 收集 OSS keys
-        oss_keys = [f.oss_key for f in orphaned_files if f.oss_key]
+        # 内容寻址的文件随记录删除释放引用，其余按批直接删除
+        legacy_keys = [f.oss_key for f in orphaned_files if f.oss_key and not f.content_hash]
+        results = oss_service.batch_delete(legacy_keys) if legacy_keys else {}
+        failed_keys = [key for key, ok in results.items() if not ok]
 
-        # 从 OSS 删除文件
-        deleted_count = oss_service.delete_expired_audio(oss_keys)
-
-        # 删除数据库记录
+        # 删除数据库记录（文件删除失败的保留，下次重试）
         for audio_file in orphaned_files:
+            if not results.get(audio_file.oss_key, True):
+                continue
             db.delete(audio_file)
 
         db.commit()
 
+        deleted_count = len(results) - len(failed_keys) + audio_blob_store.purge_unreferenced(db, batch_size)
+
         logger.info(f"清理孤立音频完成: 删除 {deleted_count} 个文件")
 
         return {
             "deleted": deleted_count,
+            "failed": len(failed_keys),
+            "failed_keys": failed_keys,
             "total_processed": len(orphaned_files),
             "message": f"Cleaned up {deleted_count} orphaned audio files"
         }
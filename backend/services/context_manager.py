@@ -4,9 +4,17 @@
 负责管理对话历史、Token 预算分配、智能截断和摘要生成。
 """
 
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, TYPE_CHECKING
 from dataclasses import dataclass, field
+import asyncio
 import logging
+from datetime import datetime, timezone
+
+from config import settings
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from services.context_store import ContextStore
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +44,7 @@ class Message:
     token_count: int = 0
     message_type: Optional[str] = None  # "chat" | "voice_answer" | "feedback"
     timestamp: Optional[str] = None  # 消息时间戳
+    created_at: Optional[datetime] = None  # 用于摘要水位比较
 
 
 @dataclass
@@ -57,7 +66,7 @@ class ContextManager:
     职责：
     1. 管理对话历史（保留最近 N 轮）
     2. 按优先级分配 token 预算（JD > 简历 > 历史）
-    3. 超过阈值时生成摘要
+    3. 在后台增量维护历史摘要
     4. 构建最终的 LLM 消息列表
     """
 
@@ -65,18 +74,24 @@ class ContextManager:
         self,
         budget: Optional[TokenBudget] = None,
         max_history_rounds: int = 10,
-        summary_trigger_rounds: int = 10
+        summary_batch_messages: int = 4,
+        store: Optional["ContextStore"] = None,
+        cache_friendly_layout: bool = settings.prompt_cache_layout
     ):
         self.budget = budget or TokenBudget()
         self.max_history_rounds = max_history_rounds
-        self.summary_trigger_rounds = summary_trigger_rounds
+        self.summary_batch_messages = summary_batch_messages
+        self.cache_friendly_layout = cache_friendly_layout
 
-        # 会话级缓存
-        self._session_summaries: Dict[str, str] = {}
-        self._session_history: Dict[str, List[Message]] = {}
+        # 会话级上下文（历史 + 摘要），见 services/context_store.py
+        from services.context_store import create_context_store
+        self.store = store or create_context_store()
+
+        # 后台摘要任务：session_id -> Task
+        self._summary_tasks: Dict[str, asyncio.Task] = {}
 
     def _count_tokens(self, text: str) -> int:
-        """计算文本 token 数"""
+        """计算文本 token 数（命中 LLMService 的计数缓存时不重新编码）"""
         if not text:
             return 0
         from services.llm_service import llm_service
@@ -183,22 +198,34 @@ class ContextManager:
     async def _generate_summary(
         self,
         session_id: str,
-        old_messages: List[Message]
+        new_messages: List[Message],
+        previous_summary: Optional[str] = None
     ) -> str:
-        """生成历史对话摘要"""
-        if not old_messages:
-            return ""
+        """
+        增量生成历史对话摘要
+
+        只把上一版摘要和新移出窗口的消息交给 LLM，摘要长度不随会话增长。
+        """
+        if not new_messages:
+            return previous_summary or ""
 
         from services.llm_service import llm_service
 
         conversation = "\n".join([
             f"{msg.role}: {msg.content[:200]}..."
-            for msg in old_messages[:20]
+            for msg in new_messages
         ])
 
-        summary_prompt = f"""请将以下面试练习对话总结为简洁的摘要。
+        previous_section = ""
+        if previous_summary:
+            previous_section = f"""## 之前的摘要
+{previous_summary}
 
-## 对话内容
+"""
+
+        summary_prompt = f"""请将以下面试练习对话总结为简洁的摘要。如有之前的摘要，请将新对话合并进去，输出一份完整的新摘要。
+
+{previous_section}## 新增对话内容
 {conversation}
 
 ## 摘要要求
@@ -218,13 +245,69 @@ class ContextManager:
             summary = await llm_service.chat_completion(
                 messages=messages,
                 temperature=0.3,
-                max_tokens=500
+                max_tokens=500,
+                usage_tag="summary"
             )
             return summary.strip()
         except Exception as e:
             logger.error(f"生成摘要失败: {e}")
             return ""
 
+    def _pending_summary_messages(self, session_id: str) -> List[Message]:
+        """已移出最近 N 轮、且尚未被摘要覆盖的消息"""
+        ctx = self.store.peek(session_id)
+        if not ctx:
+            return []
+        old_messages = ctx.history[:-self.max_history_rounds * 2]
+        if ctx.summary_watermark is None:
+            return old_messages
+        return [
+            msg for msg in old_messages
+            if msg.created_at is None or msg.created_at > ctx.summary_watermark
+        ]
+
+    def schedule_summary(self, session_id: str):
+        """
+        一轮对话结束后调用：有足够多的待摘要消息时，在后台更新摘要
+
+        同一会话同时只运行一个摘要任务；build_context 只读取最近一次完成的摘要，
+        摘要生成不会增加回复延迟。
+        """
+        task = self._summary_tasks.get(session_id)
+        if task and not task.done():
+            return
+        if len(self._pending_summary_messages(session_id)) < self.summary_batch_messages:
+            return
+        self._summary_tasks[session_id] = asyncio.create_task(self._run_summary(session_id))
+
+    async def _run_summary(self, session_id: str):
+        """后台任务：上一版摘要 + 新移出窗口的消息 → 新摘要，并推进水位"""
+        try:
+            pending = self._pending_summary_messages(session_id)
+            if not pending:
+                return
+            # 缓存被淘汰时从数据库读取上一版摘要，不能当作没有摘要
+            previous_summary = (await self.store.aload(session_id)).summary
+            summary = await self._generate_summary(session_id, pending, previous_summary)
+            if not summary:
+                return
+            watermark = pending[-1].created_at
+            await self.store.set_summary(session_id, summary, watermark)
+            logger.info(f"会话 {session_id} 摘要已更新（新增 {len(pending)} 条消息）")
+        except Exception as e:
+            logger.error(f"后台摘要任务失败: {e}")
+        finally:
+            self._summary_tasks.pop(session_id, None)
+
+    async def close(self):
+        """取消未完成的摘要任务（应用关闭时调用）"""
+        tasks = [t for t in self._summary_tasks.values() if not t.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._summary_tasks.clear()
+
     async def build_context(
         self,
         session_id: str,
@@ -254,13 +337,14 @@ class ContextManager:
         jd_tokens = 0
         if jd_text:
             jd_max = min(self.budget.jd_max, available)
-            if self._count_tokens(jd_text) > jd_max:
+            jd_tokens = self._count_tokens(jd_text)
+            if jd_tokens > jd_max:
                 jd_processed = self._smart_truncate_jd(jd_text, jd_max)
+                jd_tokens = self._count_tokens(jd_processed)
                 truncated["jd"] = True
             else:
                 jd_processed = jd_text
                 truncated["jd"] = False
-            jd_tokens = self._count_tokens(jd_processed)
             available -= jd_tokens
         token_usage["jd"] = jd_tokens
 
@@ -269,27 +353,26 @@ class ContextManager:
         resume_tokens = 0
         if resume_text:
             resume_max = min(self.budget.resume_max, available)
-            if self._count_tokens(resume_text) > resume_max:
+            resume_tokens = self._count_tokens(resume_text)
+            if resume_tokens > resume_max:
                 resume_processed = self._smart_truncate_resume(resume_text, resume_max)
+                resume_tokens = self._count_tokens(resume_processed)
                 truncated["resume"] = True
             else:
                 resume_processed = resume_text
                 truncated["resume"] = False
-            resume_tokens = self._count_tokens(resume_processed)
             available -= resume_tokens
         token_usage["resume"] = resume_tokens
 
         # 处理摘要和历史
-        history_messages = history or self._session_history.get(session_id, [])
-        summary = existing_summary or self._session_summaries.get(session_id)
+        ctx = await self.store.aload(session_id)
+        history_messages = history or ctx.history
+        summary = existing_summary or ctx.summary
+        # 本轮输入已写入历史（process_message 在执行图之前追加），只作为当前输入出现一次
+        if history_messages and history_messages[-1].role == "user" and history_messages[-1].content == user_input:
+            history_messages = history_messages[:-1]
 
-        total_rounds = len(history_messages) // 2
-        if total_rounds > self.summary_trigger_rounds and not summary:
-            old_messages = history_messages[:-self.max_history_rounds * 2]
-            if old_messages:
-                summary = await self._generate_summary(session_id, old_messages)
-                self._session_summaries[session_id] = summary
-                logger.info(f"为会话 {session_id} 生成摘要")
+        # 摘要由后台任务维护（见 schedule_summary），这里只读取最近一次完成的结果
 
         summary_processed = None
         summary_tokens = 0
@@ -340,6 +423,11 @@ class ContextManager:
         user_input: str
     ) -> List[Dict[str, str]]:
         """构建最终的消息列表"""
+        if self.cache_friendly_layout:
+            return self._build_cache_friendly_messages(
+                system_prompt, jd_text, resume_text, summary, history, user_input
+            )
+
         messages = []
 
         enhanced_system = system_prompt
@@ -364,7 +452,54 @@ class ContextManager:
 
         return messages
 
-    def add_message(
+    def _build_cache_friendly_messages(
+        self,
+        system_prompt: str,
+        jd_text: str,
+        resume_text: str,
+        summary: Optional[str],
+        history: List[Message],
+        user_input: str
+    ) -> List[Dict[str, str]]:
+        """
+        缓存友好的消息布局
+
+        DeepSeek / Qwen 的上下文缓存按前缀逐字节匹配，因此：
+        - 稳定内容在前：系统提示词 → JD → 简历，同一会话内逐字节不变
+        - 历史消息不加时间戳前缀，只追加不改写
+        - 易变内容在后：摘要、消息时间和当前输入合并到最后一条用户消息
+        """
+        stable_system = system_prompt
+        if jd_text or resume_text:
+            stable_system += "\n\n## 背景信息\n"
+            if jd_text:
+                stable_system += f"\n### 目标职位要求\n{jd_text}\n"
+            if resume_text:
+                stable_system += f"\n### 用户简历\n{resume_text}\n"
+
+        messages = [{"role": "system", "content": stable_system}]
+        for msg in history:
+            messages.append({"role": msg.role, "content": msg.content})
+
+        volatile_parts = []
+        if summary:
+            volatile_parts.append(f"### 之前的对话摘要\n{summary}")
+        timestamps = [
+            f"{i}. [{msg.timestamp}] {msg.role}"
+            for i, msg in enumerate(history, 1) if msg.timestamp
+        ]
+        if timestamps:
+            volatile_parts.append("### 以上历史消息的时间\n" + "\n".join(timestamps))
+
+        if volatile_parts:
+            content = "\n\n".join(volatile_parts) + f"\n\n### 当前消息\n{user_input}"
+        else:
+            content = user_input
+        messages.append({"role": "user", "content": content})
+
+        return messages
+
+    async def add_message(
         self,
         session_id: str,
         role: str,
@@ -373,43 +508,55 @@ class ContextManager:
         timestamp: Optional[str] = None
     ):
         """添加消息到会话历史"""
-        if session_id not in self._session_history:
-            self._session_history[session_id] = []
-
         msg = Message(
             role=role,
             content=content,
             token_count=self._count_tokens(content),
             message_type=message_type,
-            timestamp=timestamp
+            timestamp=timestamp,
+            created_at=datetime.now(timezone.utc)
         )
-        self._session_history[session_id].append(msg)
+        await self.store.aappend(session_id, msg)
 
     def get_history(self, session_id: str) -> List[Message]:
         """获取会话历史"""
-        return self._session_history.get(session_id, [])
+        ctx = self.store.peek(session_id)
+        return ctx.history if ctx else []
 
     def get_summary(self, session_id: str) -> Optional[str]:
         """获取会话摘要"""
-        return self._session_summaries.get(session_id)
+        ctx = self.store.peek(session_id)
+        return ctx.summary if ctx else None
 
     def clear_session(self, session_id: str):
         """清除会话数据"""
-        self._session_history.pop(session_id, None)
-        self._session_summaries.pop(session_id, None)
+        self.store.evict(session_id)
+
+    async def load_session(self, session_id: str, db: Optional["AsyncSession"] = None) -> int:
+        """
+        加载会话上下文（WebSocket 连接时、每轮处理前）
+
+        已缓存时直接复用；否则只从数据库加载最近的消息窗口和滚动摘要。
+
+        Returns:
+            int: 上下文中的历史消息数
+        """
+        ctx = await self.store.aload(session_id, db)
+        return len(ctx.history)
 
     def init_history_from_db(self, session_id: str, messages: List[Dict]):
         """从数据库初始化历史"""
-        self._session_history[session_id] = [
+        self.store.seed(session_id, [
             Message(
                 role=m.get("role", "user"),
                 content=m.get("content", ""),
-                token_count=self._count_tokens(m.get("content", "")),
+                token_count=m.get("token_count") or self._count_tokens(m.get("content", "")),
                 message_type=m.get("message_type"),
-                timestamp=m.get("timestamp")
+                timestamp=m.get("timestamp"),
+                created_at=m.get("created_at")
             )
             for m in messages
-        ]
+        ])
 
 
 # 全局实例
@@ -0,0 +1,301 @@
+"""
+会话上下文存储
+
+ContextManager 的历史消息和滚动摘要不再保存在进程内的普通 dict 中，而是通过存储抽象访问：
+- InMemoryContextStore  - 进程内 LRU + TTL 缓存，空闲会话自动淘汰，内存有上限
+- DatabaseContextStore  - 在内存缓存之上持久化：每条消息的 token 数存在 messages.token_count，
+                          滚动摘要存在 session_contexts 表；缓存未命中时只加载最近 window 条消息
+
+重连时的开销为 O(window)，与会话历史总长度无关。
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+from uuid import UUID
+
+from sqlalchemy import event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models.message import Message as MessageModel
+from models.session_context import SessionContext as SessionContextModel
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SessionContext:
+    """单个会话的上下文"""
+    history: List[Any] = field(default_factory=list)  # context_manager.Message 列表
+    summary: Optional[str] = None
+    summary_watermark: Optional[datetime] = None      # 摘要已覆盖到的最后一条消息时间
+    last_access: float = field(default_factory=time.monotonic)
+
+
+class ContextStore(ABC):
+    """上下文存储接口"""
+
+    @abstractmethod
+    def load(self, session_id: str) -> SessionContext:
+        """获取会话上下文（不存在时创建）"""
+
+    async def aload(self, session_id: str, db: Optional[AsyncSession] = None) -> SessionContext:
+        """
+        获取会话上下文，持久化存储在缓存未命中时从数据库加载
+
+        Args:
+            db: 数据库会话；为 None 时按需自行打开
+        """
+        return self.load(session_id)
+
+    @abstractmethod
+    def peek(self, session_id: str) -> Optional[SessionContext]:
+        """获取已缓存的会话上下文，不触发加载"""
+
+    @abstractmethod
+    def append(self, session_id: str, message: Any):
+        """追加一条消息"""
+
+    async def aappend(self, session_id: str, message: Any):
+        """追加一条消息，持久化存储在缓存未命中时先从数据库加载"""
+        self.append(session_id, message)
+
+    @abstractmethod
+    async def set_summary(self, session_id: str, summary: str, watermark: Optional[datetime] = None):
+        """更新滚动摘要及其覆盖到的消息水位"""
+
+    @abstractmethod
+    def evict(self, session_id: str):
+        """从缓存中移除会话"""
+
+
+class InMemoryContextStore(ContextStore):
+    """进程内 LRU + TTL 上下文存储"""
+
+    def __init__(
+        self,
+        max_sessions: int = settings.context_cache_max_sessions,
+        ttl_seconds: float = settings.context_cache_ttl_seconds,
+        window: int = settings.context_window_messages
+    ):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.window = window
+        self._sessions: "OrderedDict[str, SessionContext]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str) -> SessionContext:
+        with self._lock:
+            ctx = self._get(session_id)
+            if ctx is None:
+                ctx = SessionContext()
+                self._put(session_id, ctx)
+            return ctx
+
+    def peek(self, session_id: str) -> Optional[SessionContext]:
+        with self._lock:
+            return self._get(session_id)
+
+    def append(self, session_id: str, message: Any):
+        self._append(self.load(session_id), message)
+
+    def _append(self, ctx: SessionContext, message: Any):
+        ctx.history.append(message)
+        # 只保留最近 window 条，更早的内容由摘要覆盖
+        if len(ctx.history) > self.window:
+            del ctx.history[:-self.window]
+
+    def seed(
+        self,
+        session_id: str,
+        history: List[Any],
+        summary: Optional[str] = None,
+        summary_watermark: Optional[datetime] = None
+    ):
+        """用已有数据初始化会话"""
+        with self._lock:
+            self._put(session_id, SessionContext(
+                history=history[-self.window:],
+                summary=summary,
+                summary_watermark=summary_watermark
+            ))
+
+    async def set_summary(self, session_id: str, summary: str, watermark: Optional[datetime] = None):
+        ctx = self.load(session_id)
+        ctx.summary = summary
+        ctx.summary_watermark = watermark
+
+    def evict(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _get(self, session_id: str) -> Optional[SessionContext]:
+        """读取并刷新访问时间（调用方持有锁）"""
+        ctx = self._sessions.get(session_id)
+        if ctx is None:
+            return None
+        now = time.monotonic()
+        if now - ctx.last_access > self.ttl_seconds:
+            del self._sessions[session_id]
+            return None
+        ctx.last_access = now
+        self._sessions.move_to_end(session_id)
+        return ctx
+
+    def _put(self, session_id: str, ctx: SessionContext):
+        """写入并淘汰过期/超量会话（调用方持有锁）"""
+        self._sessions[session_id] = ctx
+        self._sessions.move_to_end(session_id)
+
+        # 最久未访问的在队首，遇到未过期的即可停止
+        deadline = time.monotonic() - self.ttl_seconds
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if oldest.last_access >= deadline and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+            logger.debug(f"淘汰会话上下文: {oldest_id}")
+
+
+class DatabaseContextStore(InMemoryContextStore):
+    """
+    持久化上下文存储
+
+    内存缓存作为热数据层；未命中时从数据库加载最近 window 条消息及滚动摘要。
+    连接仍打开时缓存也可能因 TTL / LRU 被淘汰，读写都要走 aload / aappend，
+    不能用 load 新建一个空上下文（会丢失历史，并用空的上一版摘要覆盖已持久化的摘要）。
+    消息本身由业务代码写入 messages 表，这里只负责 token 数和摘要的持久化。
+    """
+
+    async def aload(self, session_id: str, db: Optional[AsyncSession] = None) -> SessionContext:
+        ctx = self.peek(session_id)
+        if ctx is not None:
+            return ctx
+
+        # 先写入 write-behind 缓冲中的消息，数据库中的窗口才是完整的
+        from services.message_writer import message_writer
+        await message_writer.flush(session_id)
+
+        if db is None:
+            from database import db_unit_of_work
+            async with db_unit_of_work() as own_db:
+                history, summary, watermark = await self._load_from_db(session_id, own_db)
+        else:
+            history, summary, watermark = await self._load_from_db(session_id, db)
+        self.seed(session_id, history, summary, watermark)
+        return self.peek(session_id)
+
+    async def aappend(self, session_id: str, message: Any):
+        ctx = self.peek(session_id)
+        if ctx is None:
+            ctx = await self.aload(session_id)
+            # 该消息入库后才重新加载时已包含在窗口中
+            last = ctx.history[-1] if ctx.history else None
+            if last is not None and last.role == message.role and last.content == message.content:
+                return
+        self._append(ctx, message)
+
+    async def set_summary(self, session_id: str, summary: str, watermark: Optional[datetime] = None):
+        # 只更新已缓存的上下文；未缓存时下次 aload 会读到这里持久化的摘要
+        ctx = self.peek(session_id)
+        if ctx is not None:
+            ctx.summary = summary
+            ctx.summary_watermark = watermark
+
+        from database import db_unit_of_work
+        from services.llm_service import llm_service
+
+        async with db_unit_of_work() as db:
+            try:
+                record = await db.get(SessionContextModel, UUID(session_id))
+                if record is None:
+                    record = SessionContextModel(session_id=UUID(session_id))
+                    db.add(record)
+                record.summary = summary
+                record.summary_token_count = llm_service.count_tokens(summary)
+                record.summary_watermark = watermark
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                logger.error(f"保存会话摘要失败: {e}")
+
+    async def _load_from_db(self, session_id: str, db: AsyncSession) -> tuple:
+        """
+        加载最近 window 条消息和摘要
+
+        Returns:
+            tuple: (history, summary, summary_watermark)
+        """
+        from services.context_manager import Message
+        from services.llm_service import llm_service
+
+        result = await db.execute(
+            select(
+                MessageModel.id,
+                MessageModel.role,
+                MessageModel.content,
+                MessageModel.message_type,
+                MessageModel.token_count,
+                MessageModel.created_at,
+            )
+            .where(MessageModel.session_id == UUID(session_id))
+            .order_by(MessageModel.created_at.desc())
+            .limit(self.window)
+        )
+        rows = result.all()
+
+        history = []
+        backfill = []
+        for row in reversed(rows):
+            token_count = row.token_count
+            if token_count is None:
+                # 迁移前的旧消息：补算一次并回写
+                token_count = llm_service.count_tokens(row.content)
+                backfill.append({"id": row.id, "token_count": token_count})
+            history.append(Message(
+                role=row.role,
+                content=row.content,
+                token_count=token_count,
+                message_type=row.message_type,
+                timestamp=row.created_at.strftime("%m-%d %H:%M") if row.created_at else None,
+                created_at=row.created_at
+            ))
+
+        if backfill:
+            try:
+                await db.execute(update(MessageModel), backfill)
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                logger.warning(f"回写消息 token 数失败: {e}")
+
+        record = await db.get(SessionContextModel, UUID(session_id))
+        summary = record.summary if record else None
+        watermark = record.summary_watermark if record else None
+
+        logger.info(f"从数据库加载会话上下文: {session_id}, {len(history)} 条消息, 回写 {len(backfill)} 条 token 数")
+        return history, summary, watermark
+
+
+@event.listens_for(MessageModel, "before_insert")
+def _fill_token_count(mapper, connection, target):
+    """消息入库时记录 token 数（计数缓存命中时不重新编码）"""
+    if target.token_count is None and target.content:
+        from services.llm_service import llm_service
+        target.token_count = llm_service.count_tokens(target.content)
+
+
+def create_context_store() -> ContextStore:
+    """按配置创建上下文存储"""
+    if settings.context_store_backend == "memory":
+        return InMemoryContextStore()
+    return DatabaseContextStore()
@@ -0,0 +1,246 @@
+"""
+LLM Provider 客户端注册表
+
+所有 LLMService 实例按 provider 共享同一个 AsyncOpenAI 客户端及其底层 httpx 连接池：
+- keep-alive 长连接、可选 HTTP/2、按 provider（即按 host）限制连接数
+- 应用启动时预建连接（lifespan 中调用 warm_up），避免首个请求承担 TLS 握手
+- 连接池指标：已建连接、使用中、排队中的请求、建连耗时
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import httpx
+from openai import AsyncOpenAI
+from langsmith.wrappers import wrap_openai
+
+from config import settings
+
+# 可选依赖：h2（HTTP/2 支持）
+try:
+    import h2  # noqa: F401
+    H2_AVAILABLE = True
+except ImportError:
+    H2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProviderConfig:
+    """Provider 连接配置"""
+    api_key: str
+    base_url: Optional[str] = None
+
+
+def _provider_config(provider: str) -> ProviderConfig:
+    if provider == "deepseek":
+        return ProviderConfig(api_key=settings.deepseek_api_key, base_url=settings.deepseek_base_url)
+    if provider == "openai":
+        return ProviderConfig(api_key=settings.openai_api_key)
+    if provider == "qwen":
+        # 千问使用 DashScope API Key
+        return ProviderConfig(api_key=settings.qwen_api_key or settings.dashscope_api_key, base_url=settings.qwen_base_url)
+    if provider == "anthropic":
+        # Anthropic 使用不同的客户端，暂时不实现
+        raise NotImplementedError("Anthropic provider not yet implemented")
+    raise ValueError(f"Unknown provider: {provider}")
+
+
+class PoolMetrics:
+    """单个 provider 的连接池指标"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = 0
+        self.connects = 0
+        self.total_connect_ms = 0.0
+        self._lock = threading.Lock()
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+            self.requests += 1
+
+    def request_finished(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def connected(self, connect_ms: float):
+        with self._lock:
+            self.connects += 1
+            self.total_connect_ms += connect_ms
+
+
+class MeteredTransport(httpx.AsyncHTTPTransport):
+    """
+    统计连接池使用情况的 transport
+
+    通过 httpcore 的 trace 扩展记录新建连接的耗时（TCP + TLS）。
+    """
+
+    def __init__(self, metrics: PoolMetrics, **kwargs):
+        super().__init__(**kwargs)
+        self.metrics = metrics
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        connect_started: List[float] = []
+
+        async def trace(event_name: str, info: dict):
+            if event_name == "connection.connect_tcp.started":
+                connect_started.append(time.perf_counter())
+            elif event_name in ("connection.start_tls.complete", "connection.connect_tcp.complete"):
+                # HTTPS 以 TLS 握手完成为准；纯 HTTP 以 TCP 建连完成为准
+                if connect_started and (event_name.endswith("start_tls.complete") or request.url.scheme == "http"):
+                    self.metrics.connected((time.perf_counter() - connect_started.pop()) * 1000)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        self.metrics.request_started()
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            self.metrics.request_finished()
+            raise
+
+        # 响应体读取完毕（连接归还连接池）后才算请求结束
+        original_aclose = response.stream.aclose
+
+        async def aclose():
+            try:
+                await original_aclose()
+            finally:
+                self.metrics.request_finished()
+
+        response.stream.aclose = aclose
+        return response
+
+    def pool_stats(self) -> Dict[str, int]:
+        """httpcore 连接池中的连接状态"""
+        pool = getattr(self, "_pool", None)
+        connections = getattr(pool, "connections", None) or []
+        idle = sum(1 for c in connections if c.is_idle())
+        return {"open_connections": len(connections), "idle_connections": idle, "in_use_connections": len(connections) - idle}
+
+
+class LLMClientRegistry:
+    """按 provider 共享的 LLM 客户端注册表"""
+
+    def __init__(self):
+        self._clients: Dict[str, AsyncOpenAI] = {}
+        self._http_clients: Dict[str, httpx.AsyncClient] = {}
+        self._transports: Dict[str, MeteredTransport] = {}
+        self._metrics: Dict[str, PoolMetrics] = {}
+        self._lock = threading.Lock()
+        self.http2 = settings.llm_http2 and H2_AVAILABLE
+
+    def get_client(self, provider: str) -> AsyncOpenAI:
+        """获取 provider 的共享客户端（首次调用时创建）"""
+        with self._lock:
+            client = self._clients.get(provider)
+            if client is None:
+                config = _provider_config(provider)
+                client = wrap_openai(AsyncOpenAI(
+                    api_key=config.api_key,
+                    base_url=config.base_url,
+                    http_client=self._create_http_client(provider)
+                ))
+                self._clients[provider] = client
+            return client
+
+    def _create_http_client(self, provider: str) -> httpx.AsyncClient:
+        metrics = PoolMetrics()
+        limits = httpx.Limits(
+            max_connections=settings.llm_max_connections,
+            max_keepalive_connections=settings.llm_max_keepalive_connections,
+            keepalive_expiry=settings.llm_keepalive_expiry
+        )
+        transport = MeteredTransport(
+            metrics,
+            http2=self.http2,
+            limits=limits
+        )
+        http_client = httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(
+                settings.llm_read_timeout,
+                connect=settings.llm_connect_timeout,
+                pool=settings.llm_pool_timeout
+            )
+        )
+        self._metrics[provider] = metrics
+        self._transports[provider] = transport
+        self._http_clients[provider] = http_client
+        return http_client
+
+    async def warm_up(self, connections: int = settings.llm_warmup_connections):
+        """
+        预建连接（应用启动时调用）
+
+        对每个已创建的 provider 并发发送若干轻量请求（GET /models），
+        让连接池提前完成 DNS、TCP 和 TLS 握手。响应状态码不影响预热效果。
+        """
+        tasks = [
+            self._warm_up_provider(provider, connections)
+            for provider in list(self._clients)
+        ]
+        await asyncio.gather(*tasks)
+
+    async def _warm_up_provider(self, provider: str, connections: int):
+        client = self._clients[provider]
+        http_client = self._http_clients[provider]
+        url = f"{str(client.base_url).rstrip('/')}/models"
+        headers = {"Authorization": f"Bearer {client.api_key}"}
+
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *[http_client.get(url, headers=headers) for _ in range(connections)],
+            return_exceptions=True
+        )
+        errors = [r for r in results if isinstance(r, Exception)]
+        if errors:
+            logger.warning(f"LLM 连接预热失败: provider={provider}, {errors[0]}")
+        else:
+            logger.info(
+                f"LLM 连接预热完成: provider={provider}, connections={connections}, "
+                f"耗时 {(time.perf_counter() - start) * 1000:.0f}ms"
+            )
+
+    def stats(self) -> Dict[str, Dict]:
+        """
+        各 provider 的连接池指标
+
+        Returns:
+            {provider: {"open_connections", "idle_connections", "in_use_connections",
+                        "in_flight", "queued", "requests", "connects", "avg_connect_ms"}}
+        """
+        result = {}
+        for provider, metrics in self._metrics.items():
+            pool = self._transports[provider].pool_stats()
+            # 在途请求超出正在使用的连接数的部分即为等待连接的请求（HTTP/2 多路复用时为 0）
+            queued = 0 if self.http2 else max(0, metrics.in_flight - pool["in_use_connections"])
+            result[provider] = {
+                **pool,
+                "in_flight": metrics.in_flight,
+                "queued": queued,
+                "requests": metrics.requests,
+                "connects": metrics.connects,
+                "avg_connect_ms": metrics.total_connect_ms / metrics.connects if metrics.connects else 0.0,
+            }
+        return result
+
+    async def close(self):
+        """关闭所有连接池（应用关闭时调用）"""
+        for http_client in self._http_clients.values():
+            await http_client.aclose()
+        self._clients.clear()
+        self._http_clients.clear()
+        self._transports.clear()
+        self._metrics.clear()
+
+
+# 全局实例
+llm_client_registry = LLMClientRegistry()
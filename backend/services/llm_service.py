@@ -1,8 +1,151 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
 from typing import List, Dict, Optional, AsyncGenerator
-from openai import AsyncOpenAI
 import tiktoken
 from config import settings
-from langsmith.wrappers import wrap_openai
+from services.llm_client_pool import llm_client_registry
+
+logger = logging.getLogger(__name__)
+
+
+def _load_encoding():
+    """加载 cl100k_base 编码器（适用于 GPT-4 和 DeepSeek），失败时返回 None"""
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"加载 tiktoken 编码器失败，使用字符估算: {e}")
+        return None
+
+
+# 进程级编码器，启动时加载一次
+_encoding = _load_encoding()
+
+
+class TokenCountCache:
+    """
+    Token 计数 LRU 缓存
+
+    以文本内容哈希为键，避免 JD、简历、摘要等长文本每轮重复编码。
+    """
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self._data: "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[int]:
+        with self._lock:
+            count = self._data.get(key)
+            if count is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return count
+
+    def put(self, key: bytes, count: int):
+        with self._lock:
+            self._data[key] = count
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """缓存命中统计"""
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+# 全局 token 计数缓存（所有 LLMService 实例共享）
+token_count_cache = TokenCountCache()
+
+
+def parse_cached_tokens(usage) -> tuple:
+    """
+    解析响应 usage 中的缓存命中 token 数
+
+    - OpenAI / Qwen: usage.prompt_tokens_details.cached_tokens
+    - DeepSeek: usage.prompt_cache_hit_tokens
+
+    Returns:
+        tuple: (prompt_tokens, cached_tokens)
+    """
+    if usage is None:
+        return 0, 0
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    cached_tokens = getattr(usage, "prompt_cache_hit_tokens", None)
+    if cached_tokens is None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", 0) if details is not None else 0
+    return prompt_tokens, cached_tokens or 0
+
+
+class PromptCacheStats:
+    """
+    Provider 侧 prompt 缓存统计（按用途/意图分组）
+
+    latency 对非流式调用为总耗时，对流式调用为首 token 耗时；
+    分别统计命中和未命中缓存的请求，用于对比缓存带来的延迟收益。
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, tag: str, usage, latency_ms: float):
+        prompt_tokens, cached_tokens = parse_cached_tokens(usage)
+        if not prompt_tokens:
+            return
+        hit = cached_tokens > 0
+        with self._lock:
+            item = self._data.setdefault(tag, {
+                "requests": 0, "prompt_tokens": 0, "cached_tokens": 0,
+                "hit_requests": 0, "hit_latency_ms": 0.0, "miss_latency_ms": 0.0,
+            })
+            item["requests"] += 1
+            item["prompt_tokens"] += prompt_tokens
+            item["cached_tokens"] += cached_tokens
+            if hit:
+                item["hit_requests"] += 1
+                item["hit_latency_ms"] += latency_ms
+            else:
+                item["miss_latency_ms"] += latency_ms
+        logger.debug(
+            f"Prompt 缓存: tag={tag}, prompt_tokens={prompt_tokens}, "
+            f"cached_tokens={cached_tokens}, latency={latency_ms:.0f}ms"
+        )
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns:
+            {tag: {"requests", "prompt_tokens", "cached_tokens", "cache_hit_ratio",
+                   "avg_latency_hit_ms", "avg_latency_miss_ms"}}
+        """
+        with self._lock:
+            result = {}
+            for tag, item in self._data.items():
+                miss_requests = item["requests"] - item["hit_requests"]
+                result[tag] = {
+                    "requests": item["requests"],
+                    "prompt_tokens": item["prompt_tokens"],
+                    "cached_tokens": item["cached_tokens"],
+                    "cache_hit_ratio": item["cached_tokens"] / item["prompt_tokens"],
+                    "avg_latency_hit_ms": item["hit_latency_ms"] / item["hit_requests"] if item["hit_requests"] else 0.0,
+                    "avg_latency_miss_ms": item["miss_latency_ms"] / miss_requests if miss_requests else 0.0,
+                }
+            return result
+
+
+# 全局 prompt 缓存统计
+prompt_cache_stats = PromptCacheStats()
 
 
 class LLMService:
@@ -11,35 +154,23 @@ class LLMService:
     def __init__(self, provider: Optional[str] = None):
         self.provider = provider or settings.default_llm_provider
 
+        # 同一 provider 的所有实例共享客户端和连接池
+        self.client = llm_client_registry.get_client(self.provider)
+
         if self.provider == "deepseek":
-            self.client = wrap_openai(AsyncOpenAI(
-                api_key=settings.deepseek_api_key,
-                base_url=settings.deepseek_base_url
-            ))
             self.default_model = "deepseek-chat"
         elif self.provider == "openai":
-            self.client = wrap_openai(AsyncOpenAI(api_key=settings.openai_api_key))
             self.default_model = "gpt-4"
         elif self.provider == "qwen":
-            # 千问使用 DashScope API Key
-            api_key = settings.qwen_api_key or settings.dashscope_api_key
-            self.client = wrap_openai(AsyncOpenAI(
-                api_key=api_key,
-                base_url=settings.qwen_base_url
-            ))
             self.default_model = settings.qwen_supervisor_model
-        elif self.provider == "anthropic":
-            # Anthropic 使用不同的客户端，暂时不实现
-            raise NotImplementedError("Anthropic provider not yet implemented")
-        else:
-            raise ValueError(f"Unknown provider: {self.provider}")
 
     async def chat_completion(
         self,
         messages: List[Dict[str, str]],
         model: Optional[str] = None,
         temperature: float = 0.7,
-        max_tokens: int = 2000
+        max_tokens: int = 2000,
+        usage_tag: str = "default"
     ) -> str:
         """
         统一的聊天补全接口
@@ -49,6 +180,7 @@ class LLMService:
             model: 模型名称，默认使用 provider 的默认模型
             temperature: 温度参数
             max_tokens: 最大 token 数
+            usage_tag: prompt 缓存统计的分组（通常为意图）
 
         Returns:
             AI 回复内容
@@ -68,7 +200,9 @@ class LLMService:
             if self.provider == "qwen":
                 params["extra_body"] = {"enable_thinking": False}
 
+            start = time.perf_counter()
             response = await self.client.chat.completions.create(**params)
+            prompt_cache_stats.record(usage_tag, response.usage, (time.perf_counter() - start) * 1000)
             return response.choices[0].message.content
         except Exception as e:
             print(f"LLM API Error: {e}")
@@ -79,7 +213,8 @@ class LLMService:
         messages: List[Dict[str, str]],
         model: Optional[str] = None,
         temperature: float = 0.7,
-        max_tokens: int = 2000
+        max_tokens: int = 2000,
+        usage_tag: str = "default"
     ) -> AsyncGenerator[str, None]:
         """
         流式聊天补全接口 - 逐 token 返回
@@ -89,6 +224,7 @@ class LLMService:
             model: 模型名称，默认使用 provider 的默认模型
             temperature: 温度参数
             max_tokens: 最大 token 数
+            usage_tag: prompt 缓存统计的分组（通常为意图）
 
         Yields:
             AI 回复内容的每个 token
@@ -102,24 +238,32 @@ class LLMService:
                 "messages": messages,
                 "temperature": temperature,
                 "max_tokens": max_tokens,
-                "stream": True
+                "stream": True,
+                # 最后一个 chunk 携带 usage（含缓存命中 token 数）
+                "stream_options": {"include_usage": True}
             }
 
             # 千问模型需要禁用 thinking 模式
             if self.provider == "qwen":
                 params["extra_body"] = {"enable_thinking": False}
 
+            start = time.perf_counter()
+            ttft_ms = None
             response = await self.client.chat.completions.create(**params)
             async for chunk in response:
                 if chunk.choices and chunk.choices[0].delta.content:
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - start) * 1000
                     yield chunk.choices[0].delta.content
+                if getattr(chunk, "usage", None):
+                    prompt_cache_stats.record(usage_tag, chunk.usage, ttft_ms or 0.0)
         except Exception as e:
             print(f"LLM Stream API Error: {e}")
             raise
 
     def count_tokens(self, text: str, model: Optional[str] = None) -> int:
         """
-        估算文本的 token 数量
+        估算文本的 token 数量（结果按内容哈希缓存）
 
         Args:
             text: 要计数的文本
@@ -128,13 +272,22 @@ class LLMService:
         Returns:
             token 数量
         """
+        if not text:
+            return 0
+
+        key = token_count_cache.make_key(text)
+        cached = token_count_cache.get(key)
+        if cached is not None:
+            return cached
+
         try:
-            # 使用 cl100k_base 编码器（适用于 GPT-4 和 DeepSeek）
-            encoding = tiktoken.get_encoding("cl100k_base")
-            return len(encoding.encode(text))
+            count = len(_encoding.encode(text)) if _encoding else len(text) // 4
         except Exception:
             # 简单估算：1 token ≈ 4 字符
-            return len(text) // 4
+            count = len(text) // 4
+
+        token_count_cache.put(key, count)
+        return count
 
     def truncate_text(self, text: str, max_tokens: int) -> str:
         """
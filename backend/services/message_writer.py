@@ -0,0 +1,533 @@
+"""
+聊天消息 write-behind 持久化
+
+WebSocket 每轮对话原本要在发送 *_stream_end 之前逐条 commit 用户消息、recording_prompt、
+AI 回复、meta 更新等，每次都是一个同步落盘的数据库往返。这里改为：
+- 入队即返回：消息 ID（uuid4）和 created_at 在应用侧生成，立即可返回给前端
+- 按会话批量写入：相邻的插入合并为一条多行 INSERT，meta 更新合并为 executemany
+- 顺序保证：同一会话的操作按入队顺序执行，同一时刻只有一个 flush
+- 断开时 flush：WebSocket 断开、应用关闭时写完所有缓冲
+- 崩溃恢复：入队前先追加到本进程的本地日志（JSONL），启动时接管已退出进程的日志并重放
+  未确认的操作；INSERT 使用 ON CONFLICT DO NOTHING，重放是幂等的
+- 死信：外键/约束冲突等不可重试的操作写入死信日志后跳过，不阻塞该会话后续的写入
+"""
+
+import asyncio
+import glob
+import json
+import logging
+import os
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from config import settings
+from models.message import Message
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 重试也不会成功的数据库错误（外键/约束冲突、非法数据），对应操作转入死信日志
+PERMANENT_DB_ERRORS = (IntegrityError, DataError)
+
+# meta 合并更新（JSON 列先转为 jsonb 合并）
+_PATCH_META_SQL = text("""
+    UPDATE messages
+    SET meta = (COALESCE(meta::jsonb, '{}'::jsonb) || CAST(:patch AS jsonb))::json
+    WHERE id = CAST(:message_id AS uuid) AND session_id = CAST(:session_id AS uuid)
+""")
+
+# 带条件的 meta 合并更新：meta 中 skip_if 键为 true 时跳过（如已提交的录音不再标记取消）
+_PATCH_META_UNLESS_SQL = text("""
+    UPDATE messages
+    SET meta = (COALESCE(meta::jsonb, '{}'::jsonb) || CAST(:patch AS jsonb))::json
+    WHERE id = CAST(:message_id AS uuid) AND session_id = CAST(:session_id AS uuid)
+      AND COALESCE((meta::jsonb ->> :skip_if)::boolean, false) = false
+""")
+
+
+@dataclass
+class PendingMessage:
+    """已入队的消息"""
+    id: uuid.UUID
+    created_at: datetime
+
+
+@dataclass
+class WriteOp:
+    """单个写操作"""
+    seq: int
+    session_id: str
+    op: str                                   # "insert" | "patch_meta"
+    row: Optional[Dict[str, Any]] = None      # insert: 消息字段（JSON 可序列化）
+    message_id: Optional[str] = None          # patch_meta: 目标消息
+    patch: Optional[Dict[str, Any]] = None
+    skip_if: Optional[str] = None
+
+    def to_json(self) -> Dict[str, Any]:
+        return {k: v for k, v in self.__dict__.items() if v is not None}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "WriteOp":
+        return cls(**data)
+
+
+class WriteAheadJournal:
+    """
+    写前日志
+
+    每个操作在进入内存缓冲前追加一行；flush 成功后追加确认记录 {"ack": [seq, ...]}。
+    未确认的操作即为需要重放的部分。
+
+    多进程部署（uvicorn --workers N）时每个进程写自己的日志文件
+    {base}.{pid}-{随机串}{ext}，并在进程存活期间持有该文件的排他锁；
+    seq 只在单个文件内唯一，压缩日志也只替换自己的文件。
+    启动时能拿到锁的其他日志文件属于已退出的进程（孤儿日志），由 adopt_orphans 接管。
+    """
+
+    def __init__(self, base_path: str, fsync: bool = False):
+        self.base_path = base_path
+        self.fsync = fsync
+        root, ext = os.path.splitext(base_path)
+        self.path = f"{root}.{os.getpid()}-{uuid.uuid4().hex[:8]}{ext or '.jsonl'}"
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = self._publish_locked([])
+
+    def _publish_locked(self, records: List[Dict[str, Any]]):
+        """
+        写入临时文件并加锁后再替换到 self.path
+
+        其他进程只扫描正式文件名，且文件出现时已被本进程锁住，不会被误判为孤儿日志。
+        """
+        tmp_path = self.path + ".tmp"
+        f = open(tmp_path, "w", encoding="utf-8")
+        _try_lock(f)
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        return f
+
+    def append(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    @staticmethod
+    def read_pending(path: str) -> List[WriteOp]:
+        """读取日志文件中未确认的操作（按 seq 排序）"""
+        ops: Dict[int, WriteOp] = {}
+        acked = set()
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 崩溃时可能写了半行
+                    logger.warning(f"消息日志中存在损坏的记录，已跳过: {path}")
+                    continue
+                if "ack" in record:
+                    acked.update(record["ack"])
+                else:
+                    op = WriteOp.from_json(record)
+                    ops[op.seq] = op
+        return [ops[seq] for seq in sorted(ops) if seq not in acked]
+
+    def adopt_orphans(self, adopt: Callable[[List[WriteOp]], None]) -> int:
+        """
+        接管已退出进程留下的日志
+
+        逐个尝试对其他日志文件加锁：拿到锁说明写入进程已退出。读出未确认的操作交给 adopt
+        （由它重新写入本进程的日志），落盘后再删除该文件；删除前一直持有锁，其他进程不会重复接管。
+        升级前的单文件日志（base_path 本身）同样按孤儿日志处理。
+
+        Returns:
+            接管的操作数
+        """
+        root, ext = os.path.splitext(self.base_path)
+        paths = glob.glob(f"{glob.escape(root)}.*{ext or '.jsonl'}")
+        if os.path.exists(self.base_path):
+            paths.append(self.base_path)
+
+        adopted = 0
+        for path in sorted(paths):
+            if os.path.abspath(path) == os.path.abspath(self.path):
+                continue
+            try:
+                f = open(path, encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            try:
+                if not _try_lock(f):
+                    continue  # 所属进程仍在运行
+                try:
+                    # 加锁前文件可能已被其他进程接管并删除
+                    if os.stat(path).st_ino != os.fstat(f.fileno()).st_ino:
+                        continue
+                except FileNotFoundError:
+                    continue
+                ops = self.read_pending(path)
+                if ops:
+                    adopt(ops)
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    adopted += len(ops)
+                os.remove(path)
+                if os.path.exists(path + ".tmp"):
+                    os.remove(path + ".tmp")
+                if ops:
+                    logger.info(f"接管孤儿消息日志: {path}, 未写入的操作 {len(ops)} 条")
+            finally:
+                f.close()
+        return adopted
+
+    def rewrite(self, records: List[Dict[str, Any]]):
+        """压缩日志：只保留仍未确认的操作"""
+        if fcntl is None:
+            # Windows 上不能替换仍处于打开状态的文件
+            self._file.close()
+        new_file = self._publish_locked(records)
+        self._file.close()
+        self._file = new_file
+
+    def close(self, remove: bool = False):
+        """
+        Args:
+            remove: 删除日志文件（没有未确认的操作时）
+        """
+        if remove:
+            os.remove(self.path)
+        self._file.close()
+
+
+def _try_lock(f) -> bool:
+    """对打开的文件加非阻塞排他锁，进程退出时自动释放"""
+    if fcntl is None:
+        # 无 flock 的平台（Windows 开发环境）只支持单进程运行
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+class SessionWriteBuffer:
+    """单个会话的写缓冲"""
+
+    def __init__(self):
+        self.ops: Deque[WriteOp] = deque()
+        self.lock = asyncio.Lock()
+        self.flush_task: Optional[asyncio.Task] = None
+
+
+class MessageWriteBehind:
+    """按会话缓冲、批量写入的消息持久化"""
+
+    def __init__(
+        self,
+        journal_path: str = settings.message_journal_path,
+        flush_interval: float = settings.message_flush_interval,
+        batch_size: int = settings.message_flush_batch_size,
+        journal_fsync: bool = settings.message_journal_fsync,
+        dead_letter_path: str = settings.message_dead_letter_path
+    ):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.journal = WriteAheadJournal(journal_path, fsync=journal_fsync)
+        self.dead_letter_path = dead_letter_path
+        self.retry_interval = max(flush_interval * 20, 1.0)
+        self._buffers: Dict[str, SessionWriteBuffer] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._seq = 0
+        self._acked_since_compact = 0
+        self.flushes = 0
+        self.flushed_ops = 0
+        self.failed_flushes = 0
+        self.dead_lettered = 0
+
+    # ========== 入队 ==========
+
+    def add(
+        self,
+        session_id: str,
+        role: str,
+        content: str,
+        message_type: Optional[str] = None,
+        meta: Optional[Dict] = None,
+        feedback: Optional[Dict] = None,
+        audio_file_id: Optional[str] = None,
+        transcript: Optional[str] = None,
+        message_id: Optional[uuid.UUID] = None
+    ) -> PendingMessage:
+        """
+        入队一条消息
+
+        Returns:
+            PendingMessage: 应用侧生成的消息 ID 和 created_at，可立即返回给前端
+        """
+        from services.llm_service import llm_service
+
+        pending = PendingMessage(id=message_id or uuid.uuid4(), created_at=datetime.now(timezone.utc))
+        row = {
+            "id": str(pending.id),
+            "session_id": session_id,
+            "role": role,
+            "content": content,
+            "message_type": message_type,
+            "token_count": llm_service.count_tokens(content),
+            "audio_file_id": audio_file_id,
+            "transcript": transcript,
+            "feedback": feedback,
+            "meta": meta,
+            "created_at": pending.created_at.isoformat(),
+        }
+        self._enqueue(session_id, "insert", row=row)
+        return pending
+
+    def patch_meta(
+        self,
+        session_id: str,
+        message_id: uuid.UUID | str,
+        patch: Dict[str, Any],
+        skip_if: Optional[str] = None
+    ):
+        """
+        入队一次 meta 合并更新
+
+        Args:
+            skip_if: meta 中该键为 true 时跳过更新
+        """
+        self._enqueue(session_id, "patch_meta", message_id=str(message_id), patch=patch, skip_if=skip_if)
+
+    def _enqueue(self, session_id: str, op: str, **fields):
+        self._seq += 1
+        write_op = WriteOp(seq=self._seq, session_id=session_id, op=op, **fields)
+        self.journal.append(write_op.to_json())
+
+        buffer = self._buffers.setdefault(session_id, SessionWriteBuffer())
+        buffer.ops.append(write_op)
+
+        if len(buffer.ops) >= self.batch_size:
+            self._schedule_flush(session_id, delay=0)
+        else:
+            self._schedule_flush(session_id, delay=self.flush_interval)
+
+    def _schedule_flush(self, session_id: str, delay: float):
+        buffer = self._buffers[session_id]
+        if buffer.flush_task and not buffer.flush_task.done() and delay > 0:
+            return
+        # 已有等待中的定时 flush 时另起一个立即 flush，两者通过 buffer.lock 串行执行
+        task = asyncio.create_task(self._delayed_flush(session_id, delay))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        buffer.flush_task = task
+
+    async def _delayed_flush(self, session_id: str, delay: float):
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self.flush(session_id)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"消息批量写入失败（稍后重试）: session_id={session_id}, {e}")
+            if session_id in self._buffers:
+                self._schedule_flush(session_id, delay=self.retry_interval)
+
+    # ========== 写入 ==========
+
+    async def flush(self, session_id: Optional[str] = None):
+        """
+        写入缓冲的操作
+
+        Args:
+            session_id: 只写入该会话；为 None 时写入所有会话
+        """
+        session_ids = [session_id] if session_id else list(self._buffers)
+        for sid in session_ids:
+            buffer = self._buffers.get(sid)
+            if not buffer:
+                continue
+            async with buffer.lock:
+                if not buffer.ops:
+                    continue
+                ops = list(buffer.ops)
+                try:
+                    await self._apply(ops)
+                except PERMANENT_DB_ERRORS as e:
+                    # 批次中有操作永远无法写入：逐条重试，把失败的转入死信，其余照常写入
+                    logger.warning(f"消息批量写入遇到不可重试的错误，逐条写入: session_id={sid}, {e}")
+                    try:
+                        await self._apply_one_by_one(ops)
+                    except Exception:
+                        self.failed_flushes += 1
+                        raise
+                except Exception:
+                    self.failed_flushes += 1
+                    raise
+                # 成功后才从缓冲移除（期间新入队的操作保留在队尾）
+                for _ in ops:
+                    buffer.ops.popleft()
+                self._ack(ops)
+            if not buffer.ops and sid in self._buffers and not buffer.lock.locked():
+                self._buffers.pop(sid, None)
+
+    async def _apply(self, ops: List[WriteOp]):
+        """在一个事务中按顺序执行；连续的插入合并为多行 INSERT，连续的更新合并为 executemany"""
+        from database import db_unit_of_work
+
+        async with db_unit_of_work() as db:
+            for group in self._group(ops):
+                kind = group[0].op
+                if kind == "insert":
+                    rows = [self._to_db_row(op.row) for op in group]
+                    stmt = insert(Message).values(rows).on_conflict_do_nothing(index_elements=["id"])
+                    await db.execute(stmt)
+                else:
+                    plain = [op for op in group if not op.skip_if]
+                    guarded = [op for op in group if op.skip_if]
+                    if plain:
+                        await db.execute(_PATCH_META_SQL, [
+                            {"message_id": op.message_id, "session_id": op.session_id, "patch": json.dumps(op.patch)}
+                            for op in plain
+                        ])
+                    if guarded:
+                        await db.execute(_PATCH_META_UNLESS_SQL, [
+                            {"message_id": op.message_id, "session_id": op.session_id, "patch": json.dumps(op.patch), "skip_if": op.skip_if}
+                            for op in guarded
+                        ])
+            await db.commit()
+
+        self.flushes += 1
+        self.flushed_ops += len(ops)
+
+    async def _apply_one_by_one(self, ops: List[WriteOp]):
+        """
+        逐条写入（每条一个事务），不可重试的操作转入死信
+
+        可重试的错误（连接断开等）照常抛出：已写入的操作重放时是幂等的。
+        """
+        for op in ops:
+            try:
+                await self._apply([op])
+            except PERMANENT_DB_ERRORS as e:
+                self._dead_letter(op, e)
+
+    def _dead_letter(self, op: WriteOp, error: Exception):
+        """记录无法写入的操作（供人工排查），之后视为已处理"""
+        self.dead_lettered += 1
+        logger.error(f"消息操作无法写入，已转入死信日志: session_id={op.session_id}, op={op.op}, {error}")
+        record = {
+            **op.to_json(),
+            "error": str(getattr(error, "orig", None) or error)[:500],
+            "failed_at": datetime.now(timezone.utc).isoformat(),
+        }
+        try:
+            os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.error(f"写入死信日志失败: {e}, record={record}")
+
+    @staticmethod
+    def _group(ops: List[WriteOp]) -> List[List[WriteOp]]:
+        """按相邻的操作类型分组（保持顺序）"""
+        groups: List[List[WriteOp]] = []
+        for op in ops:
+            if groups and groups[-1][0].op == op.op:
+                groups[-1].append(op)
+            else:
+                groups.append([op])
+        return groups
+
+    @staticmethod
+    def _to_db_row(row: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            **row,
+            "id": uuid.UUID(row["id"]),
+            "session_id": uuid.UUID(row["session_id"]),
+            "audio_file_id": uuid.UUID(row["audio_file_id"]) if row.get("audio_file_id") else None,
+            "created_at": datetime.fromisoformat(row["created_at"]),
+        }
+
+    def _ack(self, ops: List[WriteOp]):
+        self.journal.append({"ack": [op.seq for op in ops]})
+        self._acked_since_compact += len(ops)
+        if self._acked_since_compact >= 1000:
+            self._compact()
+
+    def _compact(self):
+        pending = sorted(
+            (op for buffer in self._buffers.values() for op in buffer.ops),
+            key=lambda op: op.seq
+        )
+        self.journal.rewrite([op.to_json() for op in pending])
+        self._acked_since_compact = 0
+
+    # ========== 生命周期 ==========
+
+    async def replay(self):
+        """
+        应用启动时重放已退出进程未写入的操作（幂等）
+
+        接管的操作先以本进程的 seq 重新写入自己的日志，再删除孤儿日志，
+        重放途中崩溃也不会丢失。
+        """
+        def adopt(ops: List[WriteOp]):
+            for orphan in ops:
+                self._seq += 1
+                op = WriteOp(**{**orphan.__dict__, "seq": self._seq})
+                self.journal.append(op.to_json())
+                self._buffers.setdefault(op.session_id, SessionWriteBuffer()).ops.append(op)
+
+        adopted = self.journal.adopt_orphans(adopt)
+        if adopted:
+            logger.info(f"重放未写入的消息操作: {adopted} 条")
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"重放消息失败，稍后重试: {e}")
+                for session_id in list(self._buffers):
+                    self._schedule_flush(session_id, delay=self.retry_interval)
+        self._compact()
+
+    async def close(self):
+        """应用关闭时写入所有缓冲"""
+        for task in list(self._tasks):
+            task.cancel()
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"关闭时写入消息失败，将在下次启动时重放: {e}")
+        # 全部写入后删除自己的日志，未写入时保留给下次启动的进程接管
+        self.journal.close(remove=not self._buffers)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending_sessions": len(self._buffers),
+            "pending_ops": sum(len(b.ops) for b in self._buffers.values()),
+            "flushes": self.flushes,
+            "flushed_ops": self.flushed_ops,
+            "failed_flushes": self.failed_flushes,
+            "dead_lettered": self.dead_lettered,
+        }
+
+
+# 全局实例
+message_writer = MessageWriteBehind()
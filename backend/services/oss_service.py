@@ -2,11 +2,22 @@
 阿里云 OSS 上传服务
 
 用于上传音频文件到 OSS，供 ASR 服务使用。
+
+同步方法为单次调用，供线程中使用（批量删除除外，失败的批在线程内退避重试）；
+异步方法（a 前缀）在 OSS 专用线程池中执行，对网络错误、5xx 和限流按带抖动的指数退避重试，
+等待期间不阻塞事件循环。
+所有请求共享一个 oss2.Session（持久连接池）。
 """
 
+import asyncio
+import hashlib
 import logging
+import random
+import time
 import uuid
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional
 
 import oss2
 
@@ -14,6 +25,26 @@ from config import settings
 
 logger = logging.getLogger(__name__)
 
+# 浏览器直传的音频 key 前缀：audio/uploads/{session_id}/{uuid}.webm
+UPLOAD_KEY_PREFIX = "audio/uploads/"
+
+# OSS DeleteMultipleObjects 单次请求的 key 数上限
+BATCH_DELETE_LIMIT = 1000
+
+
+def _is_retryable(error: Exception) -> bool:
+    """网络错误、服务端 5xx 和限流（429）可以重试，其余 4xx 直接失败"""
+    if isinstance(error, oss2.exceptions.RequestError):
+        return True
+    if isinstance(error, oss2.exceptions.OssError):
+        return error.status == 429 or error.status >= 500
+    return False
+
+
+def _backoff_delay(attempt: int) -> float:
+    """full jitter：在 [0, base * 2^attempt] 内随机等待，避免并发请求同时重试"""
+    return random.uniform(0, settings.oss_retry_base_delay * (2 ** attempt))
+
 
 class OSSService:
     """
@@ -24,6 +55,7 @@ class OSSService:
 
     def __init__(self):
         self._bucket = None
+        self._executor: Optional[ThreadPoolExecutor] = None
         self.bucket_name = settings.aliyun_oss_bucket
         self.endpoint = settings.aliyun_oss_endpoint
 
@@ -37,50 +69,67 @@ class OSSService:
                 settings.aliyun_access_key_id,
                 settings.aliyun_access_key_secret
             )
+            # 共享 Session：连接池在请求之间复用，连接出错时由连接池自行丢弃，无需重建 bucket
             self._bucket = oss2.Bucket(
                 auth,
-                f"https://{self.endpoint}",
-                self.bucket_name
+                f"{settings.aliyun_oss_scheme}://{self.endpoint}",
+                self.bucket_name,
+                session=oss2.Session(),
+                connect_timeout=settings.oss_connect_timeout
             )
         return self._bucket
 
-    def upload_audio(self, audio_data: bytes, suffix: str = '.wav', max_retries: int = 3) -> str:
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """延迟初始化 OSS 专用线程池（与默认线程池隔离，避免大批量上传挤占其他阻塞调用）"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.oss_max_concurrency,
+                thread_name_prefix="oss"
+            )
+        return self._executor
+
+    async def _call(self, func, *args, max_retries: int = settings.oss_max_retries, **kwargs):
         """
-        上传音频文件到 OSS
+        在 OSS 线程池中执行同步调用，可重试的错误按带抖动的指数退避重试
+
+        Args:
+            func: 同步方法
+            max_retries: 最大尝试次数
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(max_retries):
+            try:
+                return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+            except Exception as e:
+                if attempt == max_retries - 1 or not _is_retryable(e):
+                    raise
+                delay = _backoff_delay(attempt)
+                logger.warning(f"OSS 请求失败 (尝试 {attempt + 1}/{max_retries})，{delay:.2f}s 后重试: {e}")
+                await asyncio.sleep(delay)
+
+    def upload_audio(self, audio_data: bytes, suffix: str = '.wav') -> str:
+        """
+        上传音频文件到 OSS（单次尝试，需要重试时使用 aupload_audio）
 
         Args:
             audio_data: 音频字节数据
             suffix: 文件后缀，默认 .wav
-            max_retries: 最大重试次数，默认 3
 
         Returns:
             音频文件的签名 URL（有效期 1 小时）
         """
-        import time
         key = f"audio/{uuid.uuid4()}{suffix}"
 
-        last_error = None
-        for attempt in range(max_retries):
-            try:
-                result = self.bucket.put_object(key, audio_data)
-                if result.status == 200:
-                    # 生成签名 URL，有效期 3600 秒（1小时）
-                    signed_url = self.bucket.sign_url('GET', key, 3600)
-                    logger.info(f"音频上传成功: {key}")
-                    logger.info(f"签名 URL: {signed_url[:100]}...")
-                    return signed_url
-                else:
-                    raise Exception(f"OSS 上传失败，状态码: {result.status}")
-            except Exception as e:
-                last_error = e
-                logger.warning(f"OSS 上传失败 (尝试 {attempt + 1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    # 重置 bucket 连接
-                    self._bucket = None
-                    time.sleep(1)  # 等待 1 秒后重试
+        result = self.bucket.put_object(key, audio_data)
+        if result.status != 200:
+            raise Exception(f"OSS 上传失败，状态码: {result.status}")
 
-        logger.error(f"OSS 上传失败，已重试 {max_retries} 次: {last_error}")
-        raise last_error
+        # 生成签名 URL，有效期 3600 秒（1小时）
+        signed_url = self.bucket.sign_url('GET', key, 3600)
+        logger.info(f"音频上传成功: {key}")
+        logger.info(f"签名 URL: {signed_url[:100]}...")
+        return signed_url
 
     def delete_audio(self, key: str) -> bool:
         """
@@ -140,11 +189,126 @@ class OSSService:
             raise Exception(f"OSS 上传失败，状态码: {result.status}")
 
         # 返回 key 和基础 URL（不含签名）
-        base_url = f"https://{self.bucket_name}.{self.endpoint}/{key}"
+        base_url = self.object_url(key)
         logger.info(f"音频持久化上传成功: {key}")
 
         return key, base_url
 
+    def content_addressed_key(self, content_hash: str, suffix: str) -> str:
+        """按内容寻址的对象 key"""
+        return f"audio/sha256/{content_hash}{suffix}"
+
+    def upload_audio_content_addressed(self, audio_data: bytes, suffix: str = '.wav') -> tuple:
+        """
+        按内容寻址持久化上传（key 为内容 SHA-256，相同内容只上传一次）
+
+        Args:
+            audio_data: 音频字节数据
+            suffix: 文件后缀，默认 .wav
+
+        Returns:
+            tuple: (oss_key, oss_url, created) - created 为 False 表示对象已存在，跳过了上传
+        """
+        key = self.content_addressed_key(hashlib.sha256(audio_data).hexdigest(), suffix)
+        base_url = self.object_url(key)
+
+        if self.bucket.object_exists(key):
+            logger.info(f"音频已存在，跳过上传: {key}")
+            return key, base_url, False
+
+        result = self.bucket.put_object(key, audio_data)
+        if result.status != 200:
+            raise Exception(f"OSS 上传失败，状态码: {result.status}")
+
+        logger.info(f"音频按内容寻址上传成功: {key}")
+        return key, base_url, True
+
+    def object_url(self, key: str) -> str:
+        """对象的基础 URL（不含签名）"""
+        return f"https://{self.bucket_name}.{self.endpoint}/{key}"
+
+    def upload_key_prefix(self, session_id: str) -> str:
+        """会话的浏览器直传 key 前缀"""
+        return f"{UPLOAD_KEY_PREFIX}{session_id}/"
+
+    def presign_audio_upload(
+        self,
+        session_id: str,
+        suffix: str = '.webm',
+        content_type: str = 'audio/webm',
+        expires_in: int = settings.oss_upload_url_expires_seconds
+    ) -> dict:
+        """
+        生成浏览器直传音频的签名 PUT URL
+
+        签名只在本地计算，不访问 OSS。浏览器 PUT 时必须携带相同的 Content-Type，
+        bucket 需要为前端域名配置允许 PUT 的 CORS 规则。
+
+        Args:
+            session_id: 会话ID（key 以会话为前缀，提交时据此校验归属）
+            suffix: 文件后缀
+            content_type: 上传的 Content-Type（参与签名）
+            expires_in: URL 有效期（秒）
+
+        Returns:
+            dict: {"url", "key", "method", "headers", "expires_in"}
+        """
+        key = f"{self.upload_key_prefix(session_id)}{uuid.uuid4()}{suffix}"
+        headers = {'Content-Type': content_type}
+        url = self.bucket.sign_url('PUT', key, expires_in, headers=headers)
+        logger.debug(f"生成直传签名 URL: {key}, expires_in={expires_in}")
+        return {"url": url, "key": key, "method": "PUT", "headers": headers, "expires_in": expires_in}
+
+    def get_object_size(self, key: str) -> Optional[int]:
+        """
+        查询对象大小（HEAD 请求）
+
+        Returns:
+            对象字节数，对象不存在时返回 None
+        """
+        try:
+            return self.bucket.head_object(key).content_length
+        except oss2.exceptions.NotFound:
+            return None
+
+    def object_sha256(self, key: str, chunk_size: int = 1024 * 1024) -> Optional[str]:
+        """
+        流式下载对象并计算 SHA-256（校验浏览器直传时客户端声明的内容哈希）
+
+        Returns:
+            十六进制哈希，对象不存在时返回 None
+        """
+        try:
+            stream = self.bucket.get_object(key)
+        except oss2.exceptions.NotFound:
+            return None
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: stream.read(chunk_size), b''):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def adopt_upload_content_addressed(self, key: str, content_hash: str, suffix: str = '.webm') -> tuple:
+        """
+        把浏览器直传的对象转为按内容寻址存储（服务端复制，不经过本服务），并删除直传对象
+
+        Args:
+            key: 直传对象 key
+            content_hash: 已校验的内容 SHA-256
+            suffix: 文件后缀
+
+        Returns:
+            tuple: (oss_key, oss_url, created) - created 为 False 表示相同内容已存在，跳过了复制
+        """
+        target = self.content_addressed_key(content_hash, suffix)
+        created = not self.bucket.object_exists(target)
+        if created:
+            self.bucket.copy_object(self.bucket_name, key, target)
+            logger.info(f"直传音频转为内容寻址存储: {key} → {target}")
+        else:
+            logger.info(f"直传音频内容已存在，复用: {target}")
+        self.bucket.delete_object(key)
+        return target, self.object_url(target), created
+
     def get_signed_url(self, key: str, expires_in: int = 3600) -> str:
         """
         为已存在的 OSS 对象生成签名 URL
@@ -160,6 +324,43 @@ class OSSService:
         logger.debug(f"生成签名 URL: {key}, expires_in={expires_in}")
         return signed_url
 
+    def batch_delete(self, keys: List[str]) -> Dict[str, bool]:
+        """
+        批量删除对象（每次请求最多 1000 个 key）
+
+        Args:
+            keys: 要删除的 OSS 对象 key 列表
+
+        Returns:
+            {key: 是否删除成功}，某批重试后仍失败时该批所有 key 记为失败
+        """
+        results: Dict[str, bool] = {}
+        for start in range(0, len(keys), BATCH_DELETE_LIMIT):
+            chunk = keys[start:start + BATCH_DELETE_LIMIT]
+            try:
+                results.update(self._delete_chunk(chunk))
+            except Exception as e:
+                logger.error(f"批量删除失败 ({len(chunk)} 个 key): {e}")
+                results.update({key: False for key in chunk})
+        return results
+
+    def _delete_chunk(self, chunk: List[str], max_retries: int = settings.oss_max_retries) -> Dict[str, bool]:
+        """
+        单次 DeleteMultipleObjects 请求；返回结果中未列出的 key 视为删除失败
+
+        可重试的错误按与异步接口相同的带抖动指数退避重试（在调用方线程中等待）。
+        """
+        for attempt in range(max_retries):
+            try:
+                deleted = set(self.bucket.batch_delete_objects(chunk).deleted_keys)
+                return {key: key in deleted for key in chunk}
+            except Exception as e:
+                if attempt == max_retries - 1 or not _is_retryable(e):
+                    raise
+                delay = _backoff_delay(attempt)
+                logger.warning(f"批量删除失败 (尝试 {attempt + 1}/{max_retries})，{delay:.2f}s 后重试: {e}")
+                time.sleep(delay)
+
     def delete_expired_audio(self, keys: list) -> int:
         """
         批量删除过期的音频文件
@@ -170,17 +371,43 @@ class OSSService:
         Returns:
             成功删除的文件数量
         """
-        deleted = 0
-        for key in keys:
-            try:
-                self.bucket.delete_object(key)
-                deleted += 1
-                logger.debug(f"删除过期音频: {key}")
-            except Exception as e:
-                logger.error(f"删除失败 {key}: {e}")
-        logger.info(f"批量删除完成: {deleted}/{len(keys)} 个文件")
+        results = self.batch_delete(list(dict.fromkeys(keys)))
+        deleted = sum(results.values())
+        logger.info(f"批量删除完成: {deleted}/{len(results)} 个文件")
         return deleted
 
+    # ========== 异步接口 ==========
+
+    async def aupload_audio(self, audio_data: bytes, suffix: str = '.wav') -> str:
+        """upload_audio 的异步版本（带重试）"""
+        return await self._call(self.upload_audio, audio_data, suffix=suffix)
+
+    async def aupload_audio_content_addressed(self, audio_data: bytes, suffix: str = '.wav') -> tuple:
+        """upload_audio_content_addressed 的异步版本（带重试，key 由内容决定，重试是幂等的）"""
+        return await self._call(self.upload_audio_content_addressed, audio_data, suffix=suffix)
+
+    async def adelete_audio(self, key: str) -> bool:
+        """delete_audio 的异步版本"""
+        return await self._call(self.delete_audio, key, max_retries=1)
+
+    async def aget_object_size(self, key: str) -> Optional[int]:
+        """get_object_size 的异步版本（带重试）"""
+        return await self._call(self.get_object_size, key)
+
+    async def aobject_sha256(self, key: str) -> Optional[str]:
+        """object_sha256 的异步版本（带重试）"""
+        return await self._call(self.object_sha256, key)
+
+    async def aadopt_upload_content_addressed(self, key: str, content_hash: str, suffix: str = '.webm') -> tuple:
+        """adopt_upload_content_addressed 的异步版本（带重试，复制目标由内容决定，重试是幂等的）"""
+        return await self._call(self.adopt_upload_content_addressed, key, content_hash, suffix=suffix)
+
+    async def close(self):
+        """释放线程池（应用关闭时调用）"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
 
 # 全局 OSS 服务实例
 oss_service = OSSService()
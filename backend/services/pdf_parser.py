@@ -1,3 +1,5 @@
+from typing import List, Tuple
+
 import pdfplumber
 
 
@@ -15,3 +17,43 @@ def extract_text_from_pdf(file_path: str) -> str:
                 text_parts.append(text)
 
     return "\n\n".join(text_parts)
+
+
+def extract_pages(file_path: str, start: int, end: int) -> Tuple[int, List[str]]:
+    """
+    Extract text from pages [start, end) (0-based).
+    Runs in a worker process, so it must stay a picklable top-level function.
+
+    Returns:
+        (total page count, list of page texts)
+    """
+    with pdfplumber.open(file_path) as pdf:
+        pages = pdf.pages[start:end]
+        return len(pdf.pages), [page.extract_text() or "" for page in pages]
+
+
+def parse_pages_worker(conn, file_path: str, max_pages: int, chunk_pages: int):
+    """
+    Parse up to max_pages pages in chunks and stream each chunk back over conn.
+    Runs as the target of a dedicated process (one per job), so a stuck parse
+    can be terminated without touching other jobs.
+
+    Messages sent:
+        ("pages", start, total page count, list of page texts)
+        ("done",)
+        ("error", message)
+    """
+    try:
+        limit = max_pages
+        start = 0
+        while start < limit:
+            end = min(start + chunk_pages, limit)
+            page_count, texts = extract_pages(file_path, start, end)
+            limit = min(page_count, max_pages)
+            conn.send(("pages", start, page_count, texts[:max(0, limit - start)]))
+            start = end
+        conn.send(("done",))
+    except Exception as e:
+        conn.send(("error", str(e)))
+    finally:
+        conn.close()
@@ -0,0 +1,261 @@
+"""
+DashScope 实时语音识别服务
+
+通过 WebSocket 将麦克风音频帧实时转发到 qwen3-asr-flash-realtime，
+录音过程中推送中间识别结果，录音结束时即可拿到最终转写文本，
+省去 OSS 上传和批量转写排队。
+"""
+
+import asyncio
+import base64
+import io
+import json
+import logging
+import wave
+from typing import Awaitable, Callable, List, Optional
+from urllib.parse import urlencode
+
+import websockets
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# 中间结果回调：参数为截至目前的完整识别文本
+PartialCallback = Callable[[str], Awaitable[None]]
+
+
+class RealtimeASRSession:
+    """
+    单次录音对应的实时识别会话
+
+    使用手动提交模式（turn_detection=None）：
+    append 音频 → commit → session.finish → 等待 session.finished
+    """
+
+    def __init__(
+        self,
+        url: str,
+        api_key: str,
+        on_partial: Optional[PartialCallback] = None,
+        language: str = "zh",
+        sample_rate: int = 16000,
+        audio_format: str = "pcm",
+        max_audio_bytes: int = 0
+    ):
+        self.url = url
+        self.api_key = api_key
+        self.on_partial = on_partial
+        self.language = language
+        self.sample_rate = sample_rate
+        self.audio_format = audio_format
+        self.max_audio_bytes = max_audio_bytes
+
+        self.bytes_sent = 0
+        # 已发送的 PCM 帧，录音结束后封装为 WAV 保存以供回放（超出上限或非 PCM 时不保留）
+        self._audio = bytearray() if audio_format == "pcm" and max_audio_bytes > 0 else None
+        self._ws = None
+        self._reader: Optional[asyncio.Task] = None
+        self._finished: Optional[asyncio.Future] = None
+        self._segments: List[str] = []  # 已确认的分段文本
+        self._partial = ""              # 当前分段的中间结果
+        self._closed = False
+
+    @property
+    def transcript(self) -> str:
+        """截至目前的识别文本（已确认分段 + 中间结果）"""
+        return "".join(self._segments) + self._partial
+
+    async def start(self):
+        """建立连接并配置识别会话"""
+        self._finished = asyncio.get_running_loop().create_future()
+        self._ws = await websockets.connect(
+            self.url,
+            additional_headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "OpenAI-Beta": "realtime=v1"
+            },
+            max_size=None
+        )
+        await self._send({
+            "type": "session.update",
+            "session": {
+                "modalities": ["text"],
+                "input_audio_format": self.audio_format,
+                "sample_rate": self.sample_rate,
+                "input_audio_transcription": {"language": self.language},
+                "turn_detection": None
+            }
+        })
+        self._reader = asyncio.create_task(self._read_loop())
+        logger.info(f"实时 ASR 会话已建立: format={self.audio_format}, sample_rate={self.sample_rate}")
+
+    async def send_audio(self, chunk: bytes):
+        """转发一帧音频"""
+        if self._closed:
+            raise RuntimeError("实时 ASR 会话已关闭")
+        await self._send({
+            "type": "input_audio_buffer.append",
+            "audio": base64.b64encode(chunk).decode("ascii")
+        })
+        self.bytes_sent += len(chunk)
+        if self._audio is not None:
+            if len(self._audio) + len(chunk) > self.max_audio_bytes:
+                logger.warning(f"实时录音超过 {self.max_audio_bytes} bytes，不再保留音频用于回放")
+                self._audio = None
+            else:
+                self._audio.extend(chunk)
+
+    def wav_bytes(self) -> Optional[bytes]:
+        """
+        将已发送的 PCM 音频封装为 WAV（16-bit 单声道）
+
+        Returns:
+            WAV 字节；非 PCM 格式、超出上限或没有音频时返回 None
+        """
+        if not self._audio:
+            return None
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(self._audio)
+        return buffer.getvalue()
+
+    async def finish(self, timeout: float = 10.0) -> str:
+        """
+        结束录音并等待最终识别结果
+
+        Args:
+            timeout: 等待服务端结束的最长时间（秒）
+
+        Returns:
+            最终转写文本（超时时返回已识别的部分）
+        """
+        try:
+            await self._send({"type": "input_audio_buffer.commit"})
+            await self._send({"type": "session.finish"})
+            await asyncio.wait_for(asyncio.shield(self._finished), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"等待实时 ASR 最终结果超时（{timeout}s），使用已识别文本")
+        except Exception as e:
+            logger.error(f"实时 ASR 结束失败: {e}")
+        finally:
+            await self.close()
+
+        logger.info(f"实时 ASR 完成: bytes={self.bytes_sent}, transcript={self.transcript[:100]}...")
+        return self.transcript
+
+    async def close(self):
+        """关闭连接（可重复调用）"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._reader and not self._reader.done():
+            self._reader.cancel()
+            try:
+                await self._reader
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self._ws is not None:
+            try:
+                await self._ws.close()
+            except Exception:
+                pass
+        self._resolve()
+
+    async def _send(self, event: dict):
+        await self._ws.send(json.dumps(event))
+
+    def _resolve(self, error: Optional[Exception] = None):
+        if self._finished is None or self._finished.done():
+            return
+        if error:
+            self._finished.set_exception(error)
+            # 避免无人等待时出现 "exception was never retrieved"
+            self._finished.exception()
+        else:
+            self._finished.set_result(None)
+
+    async def _read_loop(self):
+        """读取服务端事件"""
+        try:
+            async for raw in self._ws:
+                event = json.loads(raw)
+                event_type = event.get("type", "")
+
+                if event_type == "conversation.item.input_audio_transcription.text":
+                    # 中间结果：text 为已稳定部分，stash 为尚未稳定的尾部
+                    self._partial = event.get("text", "") + event.get("stash", "")
+                    await self._notify_partial()
+
+                elif event_type == "conversation.item.input_audio_transcription.completed":
+                    self._segments.append(event.get("transcript", ""))
+                    self._partial = ""
+                    await self._notify_partial()
+
+                elif event_type == "session.finished":
+                    self._resolve()
+                    return
+
+                elif event_type == "error":
+                    error = event.get("error", {})
+                    logger.error(f"实时 ASR 服务端错误: {error}")
+                    self._resolve(Exception(f"实时 ASR 错误: {error.get('message', error)}"))
+                    return
+        except websockets.ConnectionClosed as e:
+            logger.info(f"实时 ASR 连接已关闭: {e}")
+        finally:
+            self._resolve()
+
+    async def _notify_partial(self):
+        if self.on_partial:
+            try:
+                await self.on_partial(self.transcript)
+            except Exception as e:
+                logger.warning(f"推送中间识别结果失败: {e}")
+
+
+class RealtimeASRService:
+    """实时识别会话工厂"""
+
+    def __init__(self):
+        self.model = settings.dashscope_asr_model
+        separator = "&" if "?" in settings.dashscope_asr_url else "?"
+        self.url = f"{settings.dashscope_asr_url}{separator}{urlencode({'model': self.model})}"
+
+    async def open_session(
+        self,
+        on_partial: Optional[PartialCallback] = None,
+        language: str = "zh",
+        sample_rate: int = 16000,
+        audio_format: str = "pcm"
+    ) -> RealtimeASRSession:
+        """
+        打开一个新的实时识别会话
+
+        Args:
+            on_partial: 中间结果回调
+            language: 识别语言
+            sample_rate: 音频采样率
+            audio_format: 音频格式（pcm / opus）
+
+        Returns:
+            已建立连接的 RealtimeASRSession
+        """
+        session = RealtimeASRSession(
+            url=self.url,
+            api_key=settings.dashscope_api_key,
+            on_partial=on_partial,
+            language=language,
+            sample_rate=sample_rate,
+            audio_format=audio_format,
+            max_audio_bytes=settings.max_audio_upload_bytes
+        )
+        await session.start()
+        return session
+
+
+# 全局实时 ASR 服务实例
+realtime_asr_service = RealtimeASRService()
@@ -0,0 +1,241 @@
+"""
+简历 PDF 解析服务
+
+pdfplumber 解析是 CPU 密集的同步调用，放在事件循环里会卡住同一 worker 上所有 WebSocket 流。
+解析改为后台任务：
+- 每个任务在自己的子进程中按批（pdf_parse_chunk_pages 页）解析，每批完成即逐页落库并更新进度；
+  同时运行的解析进程不超过 pdf_parse_max_workers
+- 单文件总时限 pdf_parse_timeout_seconds，超时后只终止该任务的进程，不影响其他用户的解析
+- 服务重启中断的任务在启动时标记为失败（recover_stale_jobs）
+- 最多解析 pdf_max_pages 页
+- 按文件内容 SHA-256 缓存：相同文件重新上传时直接复用已解析的页面
+前端通过任务状态接口轮询进度。
+"""
+
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from database import db_unit_of_work
+from models import Project, ResumeParseJob, ResumePage
+from services.pdf_parser import parse_pages_worker
+
+logger = logging.getLogger(__name__)
+
+
+class ResumeParseTimeout(Exception):
+    """解析超时"""
+
+
+class ResumeParserService:
+    """简历解析任务调度"""
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # spawn 启动，不继承事件循环和连接池
+        self._mp_context = multiprocessing.get_context("spawn")
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """限制同时运行的解析进程数（延迟创建，绑定到运行中的事件循环）"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(settings.pdf_parse_max_workers)
+        return self._semaphore
+
+    # ========== 提交 ==========
+
+    async def submit(self, project_id: UUID, file_path: str, content: bytes) -> ResumeParseJob:
+        """
+        创建解析任务
+
+        命中内容哈希缓存时直接完成并更新项目简历，否则在后台解析。
+        """
+        file_hash = hashlib.sha256(content).hexdigest()
+
+        async with db_unit_of_work() as db:
+            job = ResumeParseJob(project_id=project_id, file_hash=file_hash, file_path=file_path)
+            project = await db.get(Project, project_id)
+            project.resume_file_path = file_path
+
+            pages = await self._cached_pages(db, file_hash)
+            if pages is not None:
+                job.status = "succeeded"
+                job.cached = True
+                job.page_count = len(pages)
+                job.pages_parsed = len(pages)
+                project.resume_text = self._join(pages)
+                logger.info(f"简历命中解析缓存: project_id={project_id}, hash={file_hash[:12]}")
+            else:
+                job.status = "pending"
+
+            db.add(job)
+            await db.commit()
+            await db.refresh(job)
+
+        if job.status == "pending":
+            task = asyncio.create_task(self._run(job.id, project_id, file_path, file_hash))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        return job
+
+    @staticmethod
+    async def _cached_pages(db: AsyncSession, file_hash: str) -> Optional[List[str]]:
+        """已成功解析过的同内容文件的逐页文本"""
+        result = await db.execute(
+            select(ResumeParseJob.id)
+            .where(ResumeParseJob.file_hash == file_hash, ResumeParseJob.status == "succeeded")
+            .limit(1)
+        )
+        if result.scalar() is None:
+            return None
+        result = await db.execute(
+            select(ResumePage.text)
+            .where(ResumePage.file_hash == file_hash)
+            .order_by(ResumePage.page_no)
+        )
+        return list(result.scalars())
+
+    @staticmethod
+    def _join(pages: List[str]) -> str:
+        return "\n\n".join(text for text in pages if text)
+
+    # ========== 后台解析 ==========
+
+    async def _run(self, job_id: UUID, project_id: UUID, file_path: str, file_hash: str):
+        pages: List[str] = []
+
+        try:
+            async with self.semaphore:
+                await self._update_job(job_id, status="running")
+                await self._parse_in_process(job_id, file_path, file_hash, pages)
+
+            async with db_unit_of_work() as db:
+                project = await db.get(Project, project_id)
+                if project:
+                    project.resume_text = self._join(pages)
+                job = await db.get(ResumeParseJob, job_id)
+                job.status = "succeeded"
+                await db.commit()
+            logger.info(f"简历解析完成: job_id={job_id}, pages={len(pages)}")
+
+        except ResumeParseTimeout:
+            logger.warning(f"简历解析超时: job_id={job_id}, 已解析 {len(pages)} 页")
+            await self._update_job(job_id, status="failed", error=f"解析超时（{settings.pdf_parse_timeout_seconds}s）")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"简历解析失败: job_id={job_id}, {e}")
+            await self._update_job(job_id, status="failed", error=str(e))
+
+    async def _parse_in_process(self, job_id: UUID, file_path: str, file_hash: str, pages: List[str]):
+        """
+        在该任务专属的子进程中解析，逐批接收结果并落库（追加到 pages）
+
+        超时或任务被取消时只终止这一个进程。
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.pdf_parse_timeout_seconds
+        receiver, sender = self._mp_context.Pipe(duplex=False)
+        process = self._mp_context.Process(
+            target=parse_pages_worker,
+            args=(sender, file_path, settings.pdf_max_pages, settings.pdf_parse_chunk_pages),
+            daemon=True
+        )
+        process.start()
+        sender.close()
+
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0 or not await asyncio.to_thread(receiver.poll, remaining):
+                    raise ResumeParseTimeout()
+                try:
+                    message = receiver.recv()
+                except EOFError:
+                    raise RuntimeError(f"解析进程异常退出（exitcode={process.exitcode}）")
+
+                if message[0] == "done":
+                    return
+                if message[0] == "error":
+                    raise RuntimeError(message[1])
+                _, start, page_count, texts = message
+                await self._save_pages(job_id, file_hash, start, texts, page_count)
+                pages.extend(texts)
+        finally:
+            if process.is_alive():
+                process.terminate()
+            await asyncio.to_thread(process.join, 5)
+            receiver.close()
+
+    async def _save_pages(self, job_id: UUID, file_hash: str, start: int, texts: List[str], page_count: int):
+        """保存一批页面并更新进度"""
+        async with db_unit_of_work() as db:
+            if texts:
+                await db.execute(
+                    insert(ResumePage)
+                    .values([
+                        {"file_hash": file_hash, "page_no": start + i + 1, "text": text}
+                        for i, text in enumerate(texts)
+                    ])
+                    .on_conflict_do_nothing(index_elements=["file_hash", "page_no"])
+                )
+            job = await db.get(ResumeParseJob, job_id)
+            job.page_count = page_count
+            job.pages_parsed = start + len(texts)
+            await db.commit()
+
+    @staticmethod
+    async def _update_job(job_id: UUID, **fields):
+        async with db_unit_of_work() as db:
+            job = await db.get(ResumeParseJob, job_id)
+            for key, value in fields.items():
+                setattr(job, key, value)
+            await db.commit()
+
+    # ========== 生命周期 ==========
+
+    async def recover_stale_jobs(self) -> int:
+        """
+        应用启动时把被重启中断的任务标记为失败，前端轮询随之结束
+
+        多 worker 部署时其他进程可能仍在解析，只处理超过解析时限仍未更新的任务。
+
+        Returns:
+            标记为失败的任务数
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.pdf_parse_timeout_seconds * 2)
+        async with db_unit_of_work() as db:
+            result = await db.execute(
+                update(ResumeParseJob)
+                .where(
+                    ResumeParseJob.status.in_(("pending", "running")),
+                    ResumeParseJob.updated_at < cutoff
+                )
+                .values(status="failed", error="服务重启导致解析中断，请重新上传")
+            )
+            await db.commit()
+        if result.rowcount:
+            logger.warning(f"已将 {result.rowcount} 个中断的简历解析任务标记为失败")
+        return result.rowcount
+
+    async def close(self):
+        """应用关闭时取消进行中的任务（同时终止其解析进程）"""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+# 全局实例
+resume_parser_service = ResumeParserService()
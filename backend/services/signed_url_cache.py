@@ -0,0 +1,77 @@
+"""
+音频回放签名 URL 缓存
+
+按 (oss_key, 有效期档位) 缓存 OSS 签名 URL：
+- 请求的有效期向上取整到 signed_url_bucket_seconds 的整数倍作为档位，相近的请求共用同一个 URL
+- 缓存的 URL 剩余有效期不低于阈值时直接返回，否则重新签名
+- LRU 淘汰，条目数有上限
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SignedURLCache:
+    """按有效期档位缓存签名 URL"""
+
+    def __init__(
+        self,
+        max_entries: int = settings.signed_url_cache_max_entries,
+        bucket_seconds: int = settings.signed_url_bucket_seconds,
+        min_remaining_seconds: int = settings.signed_url_min_remaining_seconds
+    ):
+        self.max_entries = max_entries
+        self.bucket_seconds = bucket_seconds
+        self.min_remaining_seconds = min_remaining_seconds
+        # (oss_key, 档位) -> (url, 过期时间 monotonic)
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def expiry_bucket(self, expires_in: int) -> int:
+        """请求的有效期对应的档位（向上取整）"""
+        return math.ceil(expires_in / self.bucket_seconds) * self.bucket_seconds
+
+    def get(self, oss_key: str, expires_in: int = 3600) -> Tuple[str, int]:
+        """
+        获取签名 URL
+
+        Args:
+            oss_key: OSS 对象 key
+            expires_in: 期望的有效期（秒）
+
+        Returns:
+            tuple: (签名 URL, 剩余有效期秒数)
+        """
+        bucket = self.expiry_bucket(expires_in)
+        # 剩余有效期低于阈值时重新签名（短档位按一半有效期计算，避免永远不命中）
+        threshold = min(self.min_remaining_seconds, bucket // 2)
+        cache_key = (oss_key, bucket)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[1] - now >= threshold:
+                self._entries.move_to_end(cache_key)
+                return entry[0], int(entry[1] - now)
+
+        from services.oss_service import oss_service
+        url = oss_service.get_signed_url(oss_key, bucket)
+
+        with self._lock:
+            self._entries[cache_key] = (url, now + bucket)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return url, bucket
+
+
+# 全局实例
+signed_url_cache = SignedURLCache()
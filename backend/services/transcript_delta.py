@@ -0,0 +1,277 @@
+"""
+资产版本逐字稿的增量存储
+
+同一谱系的版本之间通常只有少量改动。存储采用反向增量（与 SVN/RCS 相同）：
+- 谱系的最新版本、以及版本号为 asset_snapshot_interval 整数倍的版本保存全文（快照）
+- 其余版本只保存相对于“后一个版本”的差异（transcript_delta + delta_base_id）
+
+读取最新版本（最常见）无需重建；读取旧版本最多沿链应用 interval - 1 个差异。
+
+差异格式（JSON 数组，与 diff-match-patch 的 delta 相同的语义）：
+    [["=", n], ["-", n], ["+", "text"]]
+    =n 复制基准文本的 n 个字符，-n 跳过基准文本的 n 个字符，+text 插入文本
+"""
+
+import difflib
+import json
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified, set_committed_value
+
+from config import settings
+from models.asset import Asset
+
+# 可选依赖：diff-match-patch（更快、更紧凑的字符级 diff）
+try:
+    from diff_match_patch import diff_match_patch
+    DMP_AVAILABLE = True
+except ImportError:
+    DMP_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DiffOps = List[list]
+
+
+# ========== 差异计算 ==========
+
+def compute_delta(base: str, target: str) -> DiffOps:
+    """计算把 base 变为 target 的差异"""
+    ops: DiffOps = []
+
+    def push(op: str, value):
+        if ops and ops[-1][0] == op:
+            ops[-1][1] += value
+        else:
+            ops.append([op, value])
+
+    if DMP_AVAILABLE:
+        dmp = diff_match_patch()
+        diffs = dmp.diff_main(base, target)
+        dmp.diff_cleanupEfficiency(diffs)
+        for op, text in diffs:
+            if op == 0:
+                push("=", len(text))
+            elif op == -1:
+                push("-", len(text))
+            else:
+                push("+", text)
+        return ops
+
+    matcher = difflib.SequenceMatcher(None, base, target, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            push("=", i2 - i1)
+            continue
+        if tag in ("delete", "replace"):
+            push("-", i2 - i1)
+        if tag in ("insert", "replace"):
+            push("+", target[j1:j2])
+    return ops
+
+
+def apply_delta(base: str, ops: DiffOps) -> str:
+    """对 base 应用差异，得到目标文本"""
+    parts = []
+    pos = 0
+    for op, value in ops:
+        if op == "=":
+            parts.append(base[pos:pos + value])
+            pos += value
+        elif op == "-":
+            pos += value
+        else:
+            parts.append(value)
+    return "".join(parts)
+
+
+def delta_to_diff(base: str, ops: DiffOps, reverse: bool = False) -> List[Dict[str, str]]:
+    """
+    把差异展开为可展示的 diff 片段
+
+    Args:
+        base: 差异的基准文本
+        reverse: 为 True 时输出从目标文本到基准文本方向的 diff（插入/删除互换）
+
+    Returns:
+        [{"op": "equal" | "insert" | "delete", "text": str}]
+    """
+    insert_op, delete_op = ("delete", "insert") if reverse else ("insert", "delete")
+    diff = []
+    pos = 0
+    for op, value in ops:
+        if op == "=":
+            diff.append({"op": "equal", "text": base[pos:pos + value]})
+            pos += value
+        elif op == "-":
+            diff.append({"op": delete_op, "text": base[pos:pos + value]})
+            pos += value
+        else:
+            diff.append({"op": insert_op, "text": value})
+    return diff
+
+
+# ========== 版本存储 ==========
+
+class TranscriptVersionStore:
+    """资产逐字稿的快照 + 反向增量存储"""
+
+    def __init__(self, snapshot_interval: int = settings.asset_snapshot_interval):
+        self.snapshot_interval = snapshot_interval
+
+    def is_snapshot(self, asset: Asset) -> bool:
+        return bool(asset.version) and asset.version % self.snapshot_interval == 0
+
+    @staticmethod
+    def is_delta(asset: Asset) -> bool:
+        return asset.transcript_delta is not None
+
+    # ---------- 写入 ----------
+
+    @staticmethod
+    def _previous_version_stmt(new_asset: Asset):
+        return (
+            select(Asset)
+            .where(
+                Asset.lineage_id == new_asset.lineage_id,
+                Asset.project_id == new_asset.project_id,
+                Asset.version < new_asset.version
+            )
+            .order_by(Asset.version.desc())
+            .limit(1)
+        )
+
+    def _encode_against(self, asset: Asset, base_asset: Asset, base_text: str):
+        """把 asset 改存为相对 base_asset 的差异（asset 需为全文）"""
+        text = asset.transcript or ""
+        asset.transcript_delta = json.dumps(compute_delta(base_text, text), ensure_ascii=False)
+        asset.delta_base_id = base_asset.id
+        asset.transcript = None
+
+    def _compress_previous(self, previous: Optional[Asset], new_asset: Asset):
+        if previous is None or self.is_delta(previous) or self.is_snapshot(previous):
+            return
+        self._encode_against(previous, new_asset, new_asset.transcript or "")
+
+    def compress_previous(self, db: Session, new_asset: Asset):
+        """
+        新版本插入时，把同谱系的前一个版本改存为相对新版本的差异
+
+        new_asset 需已加入会话并设置 lineage_id、version 和全文 transcript。
+        """
+        if new_asset.lineage_id is None:
+            return
+        # 先插入新版本，delta_base_id 外键才能引用它
+        db.flush()
+        previous = db.execute(self._previous_version_stmt(new_asset)).scalars().first()
+        self._compress_previous(previous, new_asset)
+
+    async def acompress_previous(self, db: AsyncSession, new_asset: Asset):
+        """compress_previous 的异步版本"""
+        if new_asset.lineage_id is None:
+            return
+        await db.flush()
+        previous = (await db.execute(self._previous_version_stmt(new_asset))).scalars().first()
+        self._compress_previous(previous, new_asset)
+
+    def update_transcript(self, db: Session, asset: Asset, transcript: str):
+        """
+        修改某个版本的逐字稿
+
+        以该版本为基准的版本（前一个版本）先按旧文本重建，再相对新文本重新编码。
+        """
+        dependents = self._dependents(db, asset)
+        self.materialize(db, [asset, *dependents])
+        old_texts = {d.id: d.transcript for d in dependents}
+
+        asset.transcript = transcript
+        asset.transcript_delta = None
+        asset.delta_base_id = None
+        # 与重建值相同时 SQLAlchemy 不认为有修改，需显式标记，否则只清空了差异而没写入全文
+        flag_modified(asset, "transcript")
+
+        for dependent in dependents:
+            dependent.transcript = old_texts[dependent.id]
+            self._encode_against(dependent, asset, transcript)
+
+    def detach(self, db: Session, asset: Asset):
+        """删除版本前，把以它为基准的版本改存为全文"""
+        dependents = self._dependents(db, asset)
+        self.materialize(db, dependents)
+        for dependent in dependents:
+            dependent.transcript = dependent.transcript or ""
+            dependent.transcript_delta = None
+            dependent.delta_base_id = None
+            # 重建的全文是以已提交值写入的，需显式标记才会落库
+            flag_modified(dependent, "transcript")
+
+    @staticmethod
+    def _dependents(db: Session, asset: Asset) -> List[Asset]:
+        return db.query(Asset).filter(Asset.delta_base_id == asset.id).all()
+
+    # ---------- 读取 ----------
+
+    def materialize(self, db: Session, assets: Iterable[Asset]):
+        """
+        重建差异存储的版本的逐字稿（写入已加载对象，不标记为修改）
+
+        按链批量加载基准版本，每一轮一次查询，轮数不超过快照间隔。
+        """
+        assets = list(assets)
+        pending = [a for a in assets if a.transcript is None and self.is_delta(a)]
+        if not pending:
+            return
+
+        known: Dict[UUID, Asset] = {a.id: a for a in assets}
+        missing = {a.delta_base_id for a in pending if a.delta_base_id not in known}
+        while missing:
+            loaded = db.query(Asset).filter(Asset.id.in_(missing)).all()
+            for a in loaded:
+                known[a.id] = a
+            missing = {
+                a.delta_base_id for a in loaded
+                if a.transcript is None and self.is_delta(a) and a.delta_base_id not in known
+            }
+
+        texts: Dict[UUID, str] = {}
+
+        def resolve(asset: Asset) -> str:
+            chain: List[Asset] = []
+            current = asset
+            while current.transcript is None and self.is_delta(current) and current.id not in texts:
+                chain.append(current)
+                current = known.get(current.delta_base_id)
+                if current is None:
+                    logger.error(f"逐字稿差异链断裂: asset_id={chain[-1].id}")
+                    return ""
+            text = texts.get(current.id, current.transcript or "")
+            for item in reversed(chain):
+                text = apply_delta(text, json.loads(item.transcript_delta))
+                texts[item.id] = text
+            return text
+
+        for asset in pending:
+            set_committed_value(asset, "transcript", resolve(asset))
+
+    def diff(self, db: Session, old: Asset, new: Asset) -> List[Dict[str, str]]:
+        """
+        两个版本间的 diff（old → new）
+
+        old 直接以 new 为基准存储时，直接展开已存储的差异，无需重新计算。
+        """
+        if self.is_delta(old) and old.delta_base_id == new.id:
+            self.materialize(db, [new])
+            return delta_to_diff(new.transcript or "", json.loads(old.transcript_delta), reverse=True)
+
+        self.materialize(db, [old, new])
+        base = old.transcript or ""
+        return delta_to_diff(base, compute_delta(base, new.transcript or ""))
+
+
+# 全局实例
+transcript_version_store = TranscriptVersionStore()
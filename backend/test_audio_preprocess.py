@@ -0,0 +1,63 @@
+"""
+测试录音预处理的静音裁剪（合成信号，无需 ffmpeg）
+
+使用方法:
+    cd backend
+    python test_audio_preprocess.py
+"""
+
+import sys
+
+sys.path.insert(0, '.')
+
+from services.audio_preprocess import NUMPY_AVAILABLE, SAMPLE_RATE, trim_silence
+
+
+def tone(seconds: float, amplitude: float = 0.3):
+    """440Hz 正弦波（模拟语音段）"""
+    import numpy as np
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (np.sin(2 * np.pi * 440 * t) * amplitude * 32767).astype(np.int16)
+
+
+def silence(seconds: float):
+    """低电平噪声（模拟静音段）"""
+    import numpy as np
+    rng = np.random.default_rng(0)
+    return (rng.normal(0, 10, int(seconds * SAMPLE_RATE))).astype(np.int16)
+
+
+def test_trim_silence():
+    import numpy as np
+
+    # 首部 2s 静音 + 1s 语音 + 5s 停顿 + 1s 语音 + 3s 静音
+    samples = np.concatenate([silence(2), tone(1), silence(5), tone(1), silence(3)])
+    trimmed = trim_silence(samples, frame_ms=30, threshold_db=-50, max_pause_ms=800, padding_ms=200)
+    duration = len(trimmed) / SAMPLE_RATE
+    print(f"原始时长: {len(samples) / SAMPLE_RATE:.1f}s, 裁剪后: {duration:.2f}s")
+
+    # 2s 语音 + 停顿压缩到 0.8s + 首尾各 0.2s（帧对齐误差在一帧以内）
+    assert 2.9 <= duration <= 3.35, duration
+    print("✓ 首尾静音与长停顿裁剪测试通过")
+
+
+def test_continuous_speech_kept():
+    samples = tone(3)
+    trimmed = trim_silence(samples, frame_ms=30, threshold_db=-50, max_pause_ms=800, padding_ms=200)
+    assert len(trimmed) >= len(samples) - SAMPLE_RATE * 30 // 1000
+    print("✓ 连续语音不被裁剪测试通过")
+
+
+def test_all_silence():
+    trimmed = trim_silence(silence(2), frame_ms=30, threshold_db=-50, max_pause_ms=800, padding_ms=200)
+    assert len(trimmed) == 0
+    print("✓ 纯静音识别测试通过")
+
+
+if __name__ == "__main__":
+    if not NUMPY_AVAILABLE:
+        print("[SKIP] 未安装 numpy")
+        sys.exit(0)
+    test_trim_silence()
+    test_continuous_speech_kept()
+    test_all_silence()
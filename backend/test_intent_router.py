@@ -0,0 +1,102 @@
+"""
+测试意图路由的规则层
+
+确认明确的请求由规则直接路由，普通聊天不会被规则以高置信度误判
+（误判会直接进入录音、写逐字稿等流程，用户无法纠正）。
+
+使用方法:
+    cd backend
+    python test_intent_router.py
+"""
+
+import sys
+import io
+
+sys.path.insert(0, '.')
+
+# 设置 stdout 编码为 utf-8
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+from agents.intent_router import TieredIntentRouter
+
+# (输入, 期望意图, 期望提取的问题)
+POSITIVE_CASES = [
+    ("你好", "general", None),
+    ("开始练习", "voice_practice", None),
+    ("我想模拟面试", "voice_practice", None),
+    ("我想练习自我介绍", "voice_practice", "自我介绍"),
+    ("练习一下：为什么离职", "voice_practice", "为什么离职"),
+    ("帮我优化一下简历", "resume_optimization", None),
+    ("简历怎么改？", "resume_optimization", None),
+    ("帮我写一个自我介绍", "script_writing", "自我介绍"),
+    ("帮我写为什么离职的回答", "script_writing", "为什么离职"),
+]
+
+# 普通聊天：规则不应命中，交给分类器或 LLM
+NEGATIVE_CASES = [
+    "生成对抗网络的原理是什么？",
+    "练习了很久还是紧张怎么办",
+    "我不想修改简历，先练习吧",
+    "练习什么好？",
+    "面试前练习有什么技巧",
+    "简历里的项目经历怎么写比较好",
+    "我要练习，但是有点紧张",
+    "开始练习吧我准备好了",
+    "练习 自我介绍 但是要英文的",
+    "练习一下刚才那道题",
+    "帮我准备明天面试的回答",
+]
+
+
+def make_router() -> TieredIntentRouter:
+    """只使用规则层（不加载分类器、不写路由日志）"""
+    return TieredIntentRouter(classifier_path="/nonexistent/intent_classifier.pkl", log_path=None)
+
+
+def test_positive_cases():
+    router = make_router()
+    for text, intent, question in POSITIVE_CASES:
+        decision = router.route(text)
+        assert decision is not None, f"规则未命中: {text}"
+        assert decision.tier == "rules", f"{text}: tier={decision.tier}"
+        assert decision.intent == intent, f"{text}: intent={decision.intent}, 期望 {intent}"
+        assert decision.extracted_question == question, f"{text}: question={decision.extracted_question!r}, 期望 {question!r}"
+    print(f"[PASS] 明确请求由规则路由: {len(POSITIVE_CASES)} 条")
+
+
+def test_negative_cases():
+    router = make_router()
+    for text in NEGATIVE_CASES:
+        decision = router.route(text)
+        assert decision is None, f"普通聊天被规则误判: {text} -> {decision.intent} ({decision.extracted_question!r})"
+    print(f"[PASS] 普通聊天不被规则误判: {len(NEGATIVE_CASES)} 条")
+
+
+def test_message_context_bypasses_rules():
+    router = make_router()
+    assert router.route("开始练习", has_message_context=True) is None
+    print("[PASS] 携带消息上下文时交给 LLM")
+
+
+def run_all_tests():
+    """运行所有测试"""
+    print("\n" + "=" * 60)
+    print("意图路由规则测试")
+    print("=" * 60)
+
+    try:
+        test_positive_cases()
+        test_negative_cases()
+        test_message_context_bypasses_rules()
+
+        print("\n" + "=" * 60)
+        print("[PASS] 所有测试通过!")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n[FAIL] 测试失败: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,75 @@
+"""
+测试 OSS 异步接口与批量删除（使用本地模拟 OSS，无需阿里云账号）
+
+使用方法:
+    cd backend
+    python test_oss_service.py
+"""
+
+import asyncio
+import sys
+
+sys.path.insert(0, '.')
+
+from fake_oss_server import start_server
+from config import settings
+from services.oss_service import OSSService, BATCH_DELETE_LIMIT
+
+
+def make_service(server) -> OSSService:
+    """指向模拟服务的 OSSService（IP endpoint 时 oss2 使用 path-style 访问）"""
+    settings.aliyun_oss_scheme = "http"
+    service = OSSService()
+    service.endpoint = f"127.0.0.1:{server.server_address[1]}"
+    service.bucket_name = "test-bucket"
+    return service
+
+
+async def run_batch_delete(service: OSSService, count: int) -> dict:
+    """上传 count 个对象后批量删除，返回删除结果"""
+    keys = [f"audio/test/{i}.webm" for i in range(count)]
+    await asyncio.gather(*[service._call(service.bucket.put_object, key, b"x") for key in keys])
+    return await asyncio.to_thread(service.batch_delete, keys)
+
+
+def test_upload_and_size():
+    server = start_server()
+    service = make_service(server)
+    try:
+        key, _, created = asyncio.run(service.aupload_audio_content_addressed(b"hello", suffix=".webm"))
+        assert created
+        assert asyncio.run(service.aget_object_size(key)) == 5
+
+        # 相同内容再次上传时跳过
+        _, _, created = asyncio.run(service.aupload_audio_content_addressed(b"hello", suffix=".webm"))
+        assert not created
+
+        assert asyncio.run(service.adelete_audio(key))
+        assert asyncio.run(service.aget_object_size(key)) is None
+    finally:
+        server.shutdown()
+        asyncio.run(service.close())
+    print("✓ 上传与查询测试通过")
+
+
+def test_batch_delete():
+    server = start_server()
+    service = make_service(server)
+    count = BATCH_DELETE_LIMIT + 1  # 超过单次上限，需要拆成两批
+    try:
+        results = asyncio.run(run_batch_delete(service, count))
+        assert len(results) == count
+        assert all(results.values())
+        assert asyncio.run(service.aget_object_size("audio/test/0.webm")) is None
+
+        # 同步接口（清理服务在线程中调用）
+        assert service.delete_expired_audio(["audio/test/missing.webm"]) == 1
+    finally:
+        server.shutdown()
+        asyncio.run(service.close())
+    print(f"✓ 批量删除测试通过: {count} 个 key")
+
+
+if __name__ == "__main__":
+    test_upload_and_size()
+    test_batch_delete()
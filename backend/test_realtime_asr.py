@@ -0,0 +1,62 @@
+"""
+测试实时 ASR 会话（使用本地模拟服务，无需 DashScope）
+
+使用方法:
+    cd backend
+    python test_realtime_asr.py
+"""
+
+import asyncio
+import sys
+
+sys.path.insert(0, '.')
+
+from fake_realtime_asr_server import start_server, DEFAULT_TRANSCRIPT
+from services.realtime_asr_service import RealtimeASRSession
+
+
+async def run_session(frame_count: int = 20) -> tuple:
+    """向模拟服务发送若干音频帧，返回 (最终文本, 中间结果列表)"""
+    server = await start_server()
+    port = server.sockets[0].getsockname()[1]
+
+    partials = []
+
+    async def on_partial(text: str):
+        partials.append(text)
+
+    session = RealtimeASRSession(
+        url=f"ws://127.0.0.1:{port}?model=qwen3-asr-flash-realtime",
+        api_key="test-key",
+        on_partial=on_partial
+    )
+    try:
+        await session.start()
+        for _ in range(frame_count):
+            await session.send_audio(b"\x00" * 3200)  # 100ms 16kHz PCM
+        transcript = await session.finish()
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    return transcript, partials
+
+
+def test_realtime_session():
+    transcript, partials = asyncio.run(run_session())
+
+    print(f"中间结果数: {len(partials)}")
+    for p in partials[:5]:
+        print(f"  partial: {p}")
+    print(f"最终结果: {transcript}")
+
+    assert transcript == DEFAULT_TRANSCRIPT
+    assert len(partials) > 1
+    assert partials[-1] == DEFAULT_TRANSCRIPT
+    # 中间结果应逐步增长
+    assert all(len(a) <= len(b) for a, b in zip(partials, partials[1:-1]))
+    print("✓ 实时 ASR 会话测试通过")
+
+
+if __name__ == "__main__":
+    test_realtime_session()
@@ -0,0 +1,61 @@
+"""
+训练本地意图分类器
+
+从 LLM 路由日志（settings.routing_log_path）读取历史决策，
+训练字符级 TF-IDF + 逻辑回归模型，保存到 settings.intent_classifier_path。
+服务重启后 TieredIntentRouter 会自动加载该模型作为第二层路由。
+
+需要安装 scikit-learn:
+    pip install scikit-learn
+
+使用方法:
+    cd backend
+    python train_intent_classifier.py [--min-samples 200]
+"""
+
+import argparse
+import json
+import sys
+from collections import Counter
+
+sys.path.insert(0, '.')
+
+from config import settings
+from agents.intent_router import IntentClassifier
+
+
+def load_samples(path: str) -> tuple:
+    """读取路由日志，返回 (texts, intents)"""
+    texts, intents = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if record.get("text") and record.get("intent"):
+                texts.append(record["text"])
+                intents.append(record["intent"])
+    return texts, intents
+
+
+def main(min_samples: int):
+    texts, intents = load_samples(settings.routing_log_path)
+    print(f"读取样本: {len(texts)} 条")
+    for intent, count in Counter(intents).most_common():
+        print(f"  {intent}: {count}")
+
+    if len(texts) < min_samples:
+        print(f"样本不足 {min_samples} 条，暂不训练")
+        return
+
+    classifier = IntentClassifier.train(texts, intents)
+    classifier.save(settings.intent_classifier_path)
+    print(f"模型已保存: {settings.intent_classifier_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="训练本地意图分类器")
+    parser.add_argument("--min-samples", type=int, default=200)
+    args = parser.parse_args()
+    main(args.min_samples)
@@ -27,6 +27,7 @@ export default function ChatPage() {
     setMessageContext,
     submitAudio,
     startRecording,
+    pauseRecording,
     stopRecording,
     cancelRecording,
     cancelGeneration,
@@ -40,6 +41,7 @@ export default function ChatPage() {
     messages,
     agentStatus,
     recordingState,
+    transcription,
     isSubmitted,
     isStreaming,
     streamingContent,
@@ -217,7 +219,9 @@ export default function ChatPage() {
           streamingContent={streamingContent}
           isFeedbackStreaming={isFeedbackStreaming}
           feedbackStreamingContent={feedbackStreamingContent}
+          liveTranscript={transcription.text}
           onStartRecording={startRecording}
+          onPauseRecording={pauseRecording}
           onStopRecording={stopRecording}
           onCancelRecording={cancelRecording}
           onSubmitAudio={submitAudio}
@@ -55,7 +55,8 @@ export default function EditProjectPage() {
 
       // 如果有新简历，上传
       if (resumeFile) {
-        await projectsApi.uploadResume(projectId, resumeFile)
+        const job = await projectsApi.uploadResume(projectId, resumeFile)
+        await projectsApi.waitForResumeParse(projectId, job)
       }
 
       router.back()
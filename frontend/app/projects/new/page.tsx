@@ -33,7 +33,8 @@ export default function NewProjectPage() {
       // Step 2: 上传简历（如果有）
       if (resumeFile) {
         setStep('uploading')
-        await projectsApi.uploadResume(project.id, resumeFile)
+        const job = await projectsApi.uploadResume(project.id, resumeFile)
+        await projectsApi.waitForResumeParse(project.id, job)
       }
 
       // Step 3: 创建会话
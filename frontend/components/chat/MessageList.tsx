@@ -49,10 +49,12 @@ interface MessageListProps {
   streamingContent?: string
   isFeedbackStreaming?: boolean
   feedbackStreamingContent?: string
-  onStartRecording: () => void
+  liveTranscript?: string | null
+  onStartRecording: (stream?: MediaStream) => void
+  onPauseRecording?: (paused: boolean) => void
   onStopRecording: () => void
   onCancelRecording: () => void
-  onSubmitAudio: (audioData: string, previewUrl?: string) => void
+  onSubmitAudio: (audio: Blob, previewUrl?: string) => void
   onLoadMore?: () => void
   onEditAsset?: (assetId: string, content: string) => void
   onConfirmSave?: (messageId: string) => void
@@ -64,6 +66,7 @@ export function MessageList({
   agentStatus,
   recordingState,
   isSubmitted = false,
+  liveTranscript,
   isLoadingHistory = false,
   hasMoreHistory = false,
   isStreaming = false,
@@ -71,6 +74,7 @@ export function MessageList({
   isFeedbackStreaming = false,
   feedbackStreamingContent = '',
   onStartRecording,
+  onPauseRecording,
   onStopRecording,
   onCancelRecording,
   onSubmitAudio,
@@ -192,7 +196,9 @@ export function MessageList({
                 message={message}
                 recordingState={recordingState}
                 isSubmitted={isSubmitted}
+                liveTranscript={liveTranscript}
                 onStartRecording={onStartRecording}
+                onPauseRecording={onPauseRecording}
                 onStopRecording={onStopRecording}
                 onCancelRecording={onCancelRecording}
                 onSubmitAudio={onSubmitAudio}
@@ -252,10 +258,12 @@ interface MessageBubbleProps {
   message: ChatMessage
   recordingState: RecordingState
   isSubmitted?: boolean
-  onStartRecording: () => void
+  liveTranscript?: string | null
+  onStartRecording: (stream?: MediaStream) => void
+  onPauseRecording?: (paused: boolean) => void
   onStopRecording: () => void
   onCancelRecording: () => void
-  onSubmitAudio: (audioData: string, previewUrl?: string) => void
+  onSubmitAudio: (audio: Blob, previewUrl?: string) => void
   onEditAsset?: (assetId: string, content: string) => void
   onConfirmSave?: (messageId: string) => void
   onLikeMessage?: (messageId: string) => void
@@ -265,7 +273,9 @@ function MessageBubble({
   message,
   recordingState,
   isSubmitted = false,
+  liveTranscript,
   onStartRecording,
+  onPauseRecording,
   onStopRecording,
   onCancelRecording,
   onSubmitAudio,
@@ -318,7 +328,9 @@ function MessageBubble({
             question={message.question || ''}
             recordingState={recordingState}
             isSubmitted={isSubmitted}
+            liveTranscript={liveTranscript}
             onStartRecording={onStartRecording}
+            onPauseRecording={onPauseRecording}
             onStopRecording={onStopRecording}
             onCancelRecording={onCancelRecording}
             onSubmitAudio={onSubmitAudio}
@@ -8,17 +8,21 @@ interface RecordingCardProps {
   question: string
   recordingState: RecordingState
   isSubmitted?: boolean
-  onStartRecording: () => void
+  liveTranscript?: string | null  // 边录边识别的中间结果
+  onStartRecording: (stream?: MediaStream) => void
+  onPauseRecording?: (paused: boolean) => void
   onStopRecording: () => void
   onCancelRecording: () => void
-  onSubmitAudio: (audioData: string, previewUrl?: string) => void
+  onSubmitAudio: (audio: Blob, previewUrl?: string) => void
 }
 
 export function RecordingCard({
   question,
   recordingState,
   isSubmitted = false,
+  liveTranscript,
   onStartRecording,
+  onPauseRecording,
   onStopRecording,
   onCancelRecording,
   onSubmitAudio
@@ -66,7 +70,7 @@ export function RecordingCard({
       // 埋点：开始录音
       analytics.track(AnalyticsEvents.RECORDING_START, { question })
 
-      onStartRecording()
+      onStartRecording(stream)
     } catch (error) {
       console.error('Failed to start recording:', error)
 
@@ -84,6 +88,7 @@ export function RecordingCard({
     if (mediaRecorderRef.current && mediaRecorderRef.current.state === 'recording') {
       mediaRecorderRef.current.pause()
       setIsPaused(true)
+      onPauseRecording?.(true)
 
       // 埋点：暂停录音
       analytics.track(AnalyticsEvents.RECORDING_PAUSE, {
@@ -96,6 +101,7 @@ export function RecordingCard({
     if (mediaRecorderRef.current && mediaRecorderRef.current.state === 'paused') {
       mediaRecorderRef.current.resume()
       setIsPaused(false)
+      onPauseRecording?.(false)
 
       // 埋点：继续录音
       analytics.track(AnalyticsEvents.RECORDING_RESUME)
@@ -117,20 +123,14 @@ export function RecordingCard({
 
   const handleSubmitAudio = async () => {
     if (!audioBlob) return
-    const reader = new FileReader()
-    reader.onloadend = () => {
-      const base64 = reader.result as string
-      const base64Data = base64.split(',')[1]
-
-      // 埋点：提交录音
-      analytics.track(AnalyticsEvents.RECORDING_SUBMIT, {
-        audio_duration: recordingState.duration,
-      })
 
-      onSubmitAudio(base64Data, previewUrl || undefined)
-      // 不清除 audioBlob/previewUrl，让 isSubmitted 控制 UI 显示"等待分析"
-    }
-    reader.readAsDataURL(audioBlob)
+    // 埋点：提交录音
+    analytics.track(AnalyticsEvents.RECORDING_SUBMIT, {
+      audio_duration: recordingState.duration,
+    })
+
+    onSubmitAudio(audioBlob, previewUrl || undefined)
+    // 不清除 audioBlob/previewUrl，让 isSubmitted 控制 UI 显示"等待分析"
   }
 
   const handleReRecord = () => {
@@ -254,6 +254,13 @@ export function RecordingCard({
               </div>
             )}
 
+            {/* 实时识别文本 */}
+            {liveTranscript && (
+              <p className="text-sm text-ink-100 leading-relaxed bg-cream-200/50 rounded-card px-3 py-2 max-h-32 overflow-y-auto">
+                {liveTranscript}
+              </p>
+            )}
+
             <div className="flex gap-2">
               {isPaused ? (
                 <button
@@ -305,6 +312,12 @@ export function RecordingCard({
               />
             </div>
 
+            {liveTranscript && (
+              <p className="text-sm text-ink-100 leading-relaxed bg-cream-200/50 rounded-card px-3 py-2 max-h-32 overflow-y-auto">
+                {liveTranscript}
+              </p>
+            )}
+
             <div className="flex gap-2">
               <button
                 onClick={handleReRecord}
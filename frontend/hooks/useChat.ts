@@ -13,7 +13,8 @@ import {
   TranscriptSentence,
   Message,
   Session,
-  MessageContext
+  MessageContext,
+  AudioUploadTarget
 } from '@/lib/types'
 import { messagesApi, audioApi, sessionsApi, assetsApi } from '@/lib/api-client'
 import { getAuthToken } from '@/components/AuthProvider'
@@ -35,8 +36,9 @@ interface UseChatReturn {
   }
   sendMessage: (content: string, context?: MessageContext) => void
   setMessageContext: (context: MessageContext | null) => void
-  submitAudio: (audioData: string, previewUrl?: string) => void
-  startRecording: () => void
+  submitAudio: (audio: Blob, previewUrl?: string) => void
+  startRecording: (stream?: MediaStream) => void
+  pauseRecording: (paused: boolean) => void
   stopRecording: () => void
   cancelRecording: () => void
   cancelGeneration: () => string  // 取消生成，返回待恢复的query
@@ -46,6 +48,65 @@ interface UseChatReturn {
   toggleLike: (messageId: string) => Promise<void>  // 切换点赞
 }
 
+// 录音上传时每个二进制帧的大小
+const AUDIO_FRAME_BYTES = 64 * 1024
+
+// 录音内容 SHA-256（十六进制），服务端用于转写结果缓存和去重；非安全上下文没有 crypto.subtle，返回 null
+async function sha256Hex(blob: Blob): Promise<string | null> {
+  if (typeof crypto === 'undefined' || !crypto.subtle) return null
+  try {
+    const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer())
+    return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, '0')).join('')
+  } catch {
+    return null
+  }
+}
+
+// 实时语音识别：发送给服务端的 PCM 采样率，以及每帧的时长
+const REALTIME_SAMPLE_RATE = 16000
+const REALTIME_FRAME_MS = 100
+
+// AudioWorklet：把麦克风采样转发到主线程，降采样和编码在主线程完成
+const PCM_CAPTURE_WORKLET = `
+class PcmCaptureProcessor extends AudioWorkletProcessor {
+  process(inputs) {
+    const channel = inputs[0] && inputs[0][0]
+    if (channel) this.port.postMessage(channel.slice(0))
+    return true
+  }
+}
+registerProcessor('pcm-capture', PcmCaptureProcessor)
+`
+
+// 将 Float32 采样降采样到 16kHz，编码为 16-bit 小端 PCM 后转 base64
+function encodePcmFrame(samples: Float32Array, inputRate: number): string {
+  const ratio = inputRate / REALTIME_SAMPLE_RATE
+  const length = Math.floor(samples.length / ratio)
+  const view = new DataView(new ArrayBuffer(length * 2))
+  for (let i = 0; i < length; i++) {
+    // 对每个输出采样覆盖的输入区间取平均，避免简单抽取带来的混叠
+    const start = Math.floor(i * ratio)
+    const end = Math.max(start + 1, Math.floor((i + 1) * ratio))
+    let sum = 0
+    for (let j = start; j < end; j++) sum += samples[j]
+    const value = Math.max(-1, Math.min(1, sum / (end - start)))
+    view.setInt16(i * 2, value < 0 ? value * 0x8000 : value * 0x7fff, true)
+  }
+  const bytes = new Uint8Array(view.buffer)
+  let binary = ''
+  for (let i = 0; i < bytes.length; i++) binary += String.fromCharCode(bytes[i])
+  return btoa(binary)
+}
+
+// 实时识别的 PCM 采集
+interface RealtimeCapture {
+  context: AudioContext
+  source: MediaStreamAudioSourceNode
+  node: AudioWorkletNode
+  paused: boolean
+  flush: () => void  // 发送不足一帧的剩余采样
+}
+
 const initialRecordingState: RecordingState = {
   isActive: false,
   isRecording: false,
@@ -69,7 +130,7 @@ export function useChat(sessionId: string): UseChatReturn {
   // 历史消息加载状态
   const [isLoadingHistory, setIsLoadingHistory] = useState(false)
   const [hasMoreHistory, setHasMoreHistory] = useState(true)
-  const [historyOffset, setHistoryOffset] = useState(0)
+  const [historyCursor, setHistoryCursor] = useState<string | null>(null)
   const [historyLoaded, setHistoryLoaded] = useState(false)
   const [isSubmitted, setIsSubmitted] = useState(false)
 
@@ -101,6 +162,98 @@ export function useChat(sessionId: string): UseChatReturn {
   const streamingContentRef = useRef<string>('')  // 用于在回调中获取最新的流式内容
   const feedbackStreamingContentRef = useRef<string>('')  // 用于在回调中获取最新的流式反馈内容
   const connectTimeoutRef = useRef<NodeJS.Timeout | null>(null)  // 防抖连接
+  const audioUploadRef = useRef<{ target: AudioUploadTarget, expiresAt: number } | null>(null)  // 录音直传目标
+  const realtimeEnabledRef = useRef(false)  // 服务端是否支持边录边识别（recording_start 下发）
+  // 实时识别状态：streaming 表示服务端会话可用，提交时只需发送 is_last；failed 时提交完整录音
+  const realtimeStatusRef = useRef<'idle' | 'streaming' | 'failed'>('idle')
+  const realtimeCaptureRef = useRef<RealtimeCapture | null>(null)
+  const realtimeCaptureIdRef = useRef(0)  // 区分重新录音前后的采集，丢弃过期的初始化结果
+
+  // 停止 PCM 采集（发送剩余采样，不结束服务端会话）
+  const stopRealtimeCapture = useCallback(() => {
+    realtimeCaptureIdRef.current += 1
+    const capture = realtimeCaptureRef.current
+    realtimeCaptureRef.current = null
+    if (!capture) return
+    capture.flush()
+    capture.node.port.onmessage = null
+    capture.source.disconnect()
+    capture.node.disconnect()
+    capture.context.close().catch(() => {})
+  }, [])
+
+  // 开始 PCM 采集：按帧发送 audio_chunk，首帧带 is_first 建立新的识别会话
+  const startRealtimeCapture = useCallback(async (stream: MediaStream) => {
+    stopRealtimeCapture()
+    const captureId = realtimeCaptureIdRef.current
+    realtimeStatusRef.current = 'streaming'
+    let context: AudioContext | null = null
+    try {
+      context = new AudioContext()
+      const moduleUrl = URL.createObjectURL(new Blob([PCM_CAPTURE_WORKLET], { type: 'application/javascript' }))
+      try {
+        await context.audioWorklet.addModule(moduleUrl)
+      } finally {
+        URL.revokeObjectURL(moduleUrl)
+      }
+      if (captureId !== realtimeCaptureIdRef.current) {
+        // 初始化期间已停止或取消录音
+        context.close().catch(() => {})
+        return
+      }
+
+      const inputRate = context.sampleRate
+      const frameSamples = Math.round(inputRate * REALTIME_FRAME_MS / 1000)
+      const source = context.createMediaStreamSource(stream)
+      const node = new AudioWorkletNode(context, 'pcm-capture')
+      let pending = new Float32Array(0)
+      let isFirst = true
+
+      const sendFrame = (samples: Float32Array) => {
+        const ws = wsRef.current
+        if (realtimeStatusRef.current !== 'streaming' || !ws || ws.readyState !== WebSocket.OPEN) return
+        ws.send(JSON.stringify({
+          type: 'audio_chunk',
+          audio: encodePcmFrame(samples, inputRate),
+          format: 'pcm',
+          sample_rate: REALTIME_SAMPLE_RATE,
+          is_first: isFirst,
+          is_last: false
+        }))
+        isFirst = false
+      }
+
+      const capture: RealtimeCapture = {
+        context,
+        source,
+        node,
+        paused: false,
+        flush: () => {
+          // 录音过短时也要发送首帧，保证服务端已建立识别会话
+          if (pending.length > 0 || isFirst) sendFrame(pending)
+          pending = new Float32Array(0)
+        }
+      }
+      node.port.onmessage = (event: MessageEvent<Float32Array>) => {
+        if (capture.paused) return
+        const merged = new Float32Array(pending.length + event.data.length)
+        merged.set(pending)
+        merged.set(event.data, pending.length)
+        let offset = 0
+        for (; offset + frameSamples <= merged.length; offset += frameSamples) {
+          sendFrame(merged.subarray(offset, offset + frameSamples))
+        }
+        pending = merged.slice(offset)
+      }
+      source.connect(node)
+      node.connect(context.destination)  // 节点不输出声音，连接到输出端只为驱动音频图处理
+      realtimeCaptureRef.current = capture
+    } catch (error) {
+      console.warn('实时语音识别不可用，提交时回退为上传录音:', error)
+      context?.close().catch(() => {})
+      realtimeStatusRef.current = 'failed'
+    }
+  }, [stopRealtimeCapture])
 
   // 同步 streamingContent 到 ref
   useEffect(() => {
@@ -129,7 +282,7 @@ export function useChat(sessionId: string): UseChatReturn {
   const generateMessageId = () => `msg_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`
 
   // 将后端 Message 转换为前端 ChatMessage
-  const convertMessageToChatMessage = async (msg: Message): Promise<ChatMessage> => {
+  const convertMessageToChatMessage = (msg: Message, audioUrls: Record<string, string>): ChatMessage => {
     const chatMsg: ChatMessage = {
       id: msg.id,
       role: msg.role as 'user' | 'assistant',
@@ -166,17 +319,29 @@ export function useChat(sessionId: string): UseChatReturn {
       chatMsg.liked = true
     }
 
-    // 如果有音频文件ID，获取签名URL
+    // 音频签名URL（由 convertMessages 批量获取）
     if (msg.audio_file_id) {
+      chatMsg.audioUrl = audioUrls[msg.audio_file_id]
+    }
+
+    return chatMsg
+  }
+
+  // 转换一页消息：一次请求获取该页所有音频的签名URL
+  const convertMessages = async (msgs: Message[]): Promise<ChatMessage[]> => {
+    const audioFileIds = msgs.map(msg => msg.audio_file_id).filter((id): id is string => !!id)
+    const audioUrls: Record<string, string> = {}
+    if (audioFileIds.length > 0) {
       try {
-        const { url } = await audioApi.getUrl(msg.audio_file_id)
-        chatMsg.audioUrl = url
+        const { urls } = await audioApi.getUrls(audioFileIds)
+        for (const [id, item] of Object.entries(urls)) {
+          audioUrls[id] = item.url
+        }
       } catch (e) {
-        console.warn('Failed to get audio URL:', e)
+        console.warn('Failed to get audio URLs:', e)
       }
     }
-
-    return chatMsg
+    return msgs.map(msg => convertMessageToChatMessage(msg, audioUrls))
   }
 
   // 映射消息类型
@@ -197,14 +362,11 @@ export function useChat(sessionId: string): UseChatReturn {
     try {
       const response = await messagesApi.list(sessionId, {
         limit: 20,
-        offset: 0,
         order: 'desc'
       })
 
       // 转换消息格式并获取音频URL
-      const historyMessages = await Promise.all(
-        response.messages.map(convertMessageToChatMessage)
-      )
+      const historyMessages = await convertMessages(response.messages)
 
       // 如果没有历史消息，添加欢迎消息
       if (historyMessages.length === 0) {
@@ -220,7 +382,7 @@ export function useChat(sessionId: string): UseChatReturn {
       }
 
       setHasMoreHistory(response.has_more)
-      setHistoryOffset(response.messages.length)
+      setHistoryCursor(response.before_cursor ?? null)
       setHistoryLoaded(true)
     } catch (error) {
       console.error('Failed to load history:', error)
@@ -246,24 +408,21 @@ export function useChat(sessionId: string): UseChatReturn {
     try {
       const response = await messagesApi.list(sessionId, {
         limit: 20,
-        offset: historyOffset,
-        order: 'desc'
+        before: historyCursor ?? undefined
       })
 
-      const olderMessages = await Promise.all(
-        response.messages.map(convertMessageToChatMessage)
-      )
+      const olderMessages = await convertMessages(response.messages)
 
       // 将旧消息添加到列表开头
       setMessages(prev => [...olderMessages, ...prev])
       setHasMoreHistory(response.has_more)
-      setHistoryOffset(prev => prev + response.messages.length)
+      setHistoryCursor(response.before_cursor ?? null)
     } catch (error) {
       console.error('Failed to load more history:', error)
     } finally {
       setIsLoadingHistory(false)
     }
-  }, [sessionId, historyOffset, isLoadingHistory, hasMoreHistory])
+  }, [sessionId, historyCursor, isLoadingHistory, hasMoreHistory])
 
   // 页面加载时获取历史消息
   useEffect(() => {
@@ -295,7 +454,7 @@ export function useChat(sessionId: string): UseChatReturn {
     setIsFeedbackStreaming(false)
     setFeedbackStreamingContent('')
     setHistoryLoaded(false)
-    setHistoryOffset(0)
+    setHistoryCursor(null)
     setHasMoreHistory(true)
     setIsSubmitted(false)
     setPendingQuery('')
@@ -397,6 +556,12 @@ export function useChat(sessionId: string): UseChatReturn {
             // AI要求开始录音，自动弹出录音卡片
             setAgentStatus('recording')
             const question = message.recording?.question || ''
+            // 保存直传签名 URL，提交录音时直接上传到 OSS
+            audioUploadRef.current = message.upload
+              ? { target: message.upload, expiresAt: Date.now() + message.upload.expires_in * 1000 }
+              : null
+            realtimeEnabledRef.current = message.realtime_asr === true
+            setTranscription(initialTranscriptionState)
             setRecordingState({
               isActive: true,
               isRecording: false,  // 用户需要手动开始
@@ -416,6 +581,11 @@ export function useChat(sessionId: string): UseChatReturn {
 
           case 'transcription':
             console.log('>>> 收到 transcription 消息:', message.timestamp)
+            if (!message.transcription?.is_final && realtimeStatusRef.current === 'streaming') {
+              // 录音过程中的实时识别中间结果，只更新转写文本
+              setTranscription({ text: message.transcription?.text || null, isFinal: false })
+              break
+            }
             setAgentStatus('transcribing')
             setTranscription({
               text: message.transcription?.text || null,
@@ -515,6 +685,13 @@ export function useChat(sessionId: string): UseChatReturn {
             break
 
           case 'error':
+            if (message.realtime_asr === false) {
+              // 实时识别失败：本地录音不受影响，提交时改为上传完整录音
+              console.warn('实时语音识别失败，提交时回退为上传录音:', message.error)
+              realtimeStatusRef.current = 'failed'
+              stopRealtimeCapture()
+              break
+            }
             setAgentStatus('idle')
             setRecordingState(initialRecordingState)
             setIsStreaming(false)
@@ -585,6 +762,10 @@ export function useChat(sessionId: string): UseChatReturn {
           session_id: sessionId,
         })
         setIsConnected(false)
+        // 服务端识别会话随连接关闭，录音改为提交时上传
+        if (realtimeStatusRef.current === 'streaming') {
+          realtimeStatusRef.current = 'failed'
+        }
       }
 
       wsRef.current = ws
@@ -597,11 +778,12 @@ export function useChat(sessionId: string): UseChatReturn {
       if (recordingTimerRef.current) {
         clearInterval(recordingTimerRef.current)
       }
+      stopRealtimeCapture()
       if (wsRef.current) {
         wsRef.current.close()
       }
     }
-  }, [sessionId])
+  }, [sessionId, stopRealtimeCapture])
 
   // 发送文本消息
   const sendMessage = useCallback((content: string, context?: MessageContext) => {
@@ -646,19 +828,70 @@ export function useChat(sessionId: string): UseChatReturn {
   }, [messageContext])
 
   // 提交音频
-  const submitAudio = useCallback((audioData: string, previewUrl?: string) => {
+  const submitAudio = useCallback(async (audio: Blob, previewUrl?: string) => {
     if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
+      const ws = wsRef.current
       const timestamp = new Date().toISOString()
 
       // 埋点：开始计时（录音到反馈）
       performanceTiming.markStart('ttft_feedback')
       performanceTiming.markStart('recording_to_feedback')
 
-      wsRef.current.send(JSON.stringify({
-        type: 'audio',
-        audio_data: audioData,
-        timestamp
-      }))
+      // 边录边识别：服务端已有转写文本和 PCM 录音，只需通知录音结束
+      const realtime = realtimeStatusRef.current === 'streaming'
+      stopRealtimeCapture()
+      realtimeStatusRef.current = 'idle'
+
+      // 否则优先直传 OSS：录音不经过后端中转，只提交 object key
+      const upload = audioUploadRef.current
+      audioUploadRef.current = null
+      let uploadedKey: string | null = null
+      let contentHash: string | null = null
+      if (!realtime && upload && upload.expiresAt > Date.now()) {
+        // 与上传并行计算内容哈希，不增加提交等待
+        const hashPromise = sha256Hex(audio)
+        try {
+          const resp = await fetch(upload.target.url, {
+            method: upload.target.method,
+            headers: upload.target.headers,
+            body: audio
+          })
+          if (resp.ok) {
+            uploadedKey = upload.target.key
+            contentHash = await hashPromise
+          } else {
+            console.warn('录音直传失败，回退为 WebSocket 上传:', resp.status)
+          }
+        } catch (error) {
+          console.warn('录音直传失败，回退为 WebSocket 上传:', error)
+        }
+      }
+
+      if (realtime) {
+        ws.send(JSON.stringify({
+          type: 'audio_chunk',
+          is_last: true,
+          timestamp
+        }))
+      } else if (uploadedKey) {
+        ws.send(JSON.stringify({
+          type: 'submit_audio',
+          oss_key: uploadedKey,
+          content_hash: contentHash,
+          timestamp
+        }))
+      } else {
+        // 二进制帧协议：先发送 JSON 头，再分片发送原始音频字节
+        const buffer = await audio.arrayBuffer()
+        ws.send(JSON.stringify({
+          type: 'audio_upload',
+          size: buffer.byteLength,
+          timestamp
+        }))
+        for (let offset = 0; offset < buffer.byteLength; offset += AUDIO_FRAME_BYTES) {
+          ws.send(new Uint8Array(buffer, offset, Math.min(AUDIO_FRAME_BYTES, buffer.byteLength - offset)))
+        }
+      }
 
       // 保存本地预览URL
       audioPreviewUrlRef.current = previewUrl || null
@@ -685,15 +918,24 @@ export function useChat(sessionId: string): UseChatReturn {
       setIsSubmitted(true)  // 设置为已提交状态
       setAgentStatus('transcribing')
     }
-  }, [])
+  }, [stopRealtimeCapture])
 
-  // 开始录音（用户手动点击）
-  const startRecording = useCallback(() => {
+  // 开始录音（用户手动点击），传入麦克风流时边录边发送 PCM 帧实时识别
+  const startRecording = useCallback((stream?: MediaStream) => {
     setRecordingState((prev) => ({
       ...prev,
       isRecording: true,
       duration: 0
     }))
+    setTranscription(initialTranscriptionState)
+
+    const ws = wsRef.current
+    if (stream && realtimeEnabledRef.current && ws && ws.readyState === WebSocket.OPEN) {
+      startRealtimeCapture(stream)
+    } else {
+      stopRealtimeCapture()
+      realtimeStatusRef.current = 'failed'
+    }
 
     // 开始计时
     recordingTimerRef.current = setInterval(() => {
@@ -702,6 +944,13 @@ export function useChat(sessionId: string): UseChatReturn {
         duration: prev.duration + 1
       }))
     }, 1000)
+  }, [startRealtimeCapture, stopRealtimeCapture])
+
+  // 暂停/继续录音：暂停期间不发送 PCM 帧
+  const pauseRecording = useCallback((paused: boolean) => {
+    if (realtimeCaptureRef.current) {
+      realtimeCaptureRef.current.paused = paused
+    }
   }, [])
 
   // 停止录音
@@ -710,12 +959,13 @@ export function useChat(sessionId: string): UseChatReturn {
       clearInterval(recordingTimerRef.current)
       recordingTimerRef.current = null
     }
+    stopRealtimeCapture()
 
     setRecordingState((prev) => ({
       ...prev,
       isRecording: false
     }))
-  }, [])
+  }, [stopRealtimeCapture])
 
   // 取消录音
   const cancelRecording = useCallback(() => {
@@ -723,6 +973,9 @@ export function useChat(sessionId: string): UseChatReturn {
       clearInterval(recordingTimerRef.current)
       recordingTimerRef.current = null
     }
+    // 服务端收到 cancel_recording 时关闭识别会话
+    stopRealtimeCapture()
+    realtimeStatusRef.current = 'idle'
 
     // 发送取消录音消息到后端（持久化）
     if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
@@ -741,7 +994,7 @@ export function useChat(sessionId: string): UseChatReturn {
 
     setRecordingState(initialRecordingState)
     setAgentStatus('idle')
-  }, [])
+  }, [stopRealtimeCapture])
 
   // 取消生成（停止模型输出）
   const cancelGeneration = useCallback((): string => {
@@ -801,6 +1054,7 @@ export function useChat(sessionId: string): UseChatReturn {
         question: targetMsg.pendingSave.question,
         transcript: targetMsg.pendingSave.transcript,
         project_id: targetMsg.pendingSave.project_id,
+        session_id: sessionId,
         message_id: messageId
       })
       // 保存成功，更新该消息的 saveStatus 为 'saved'
@@ -814,7 +1068,7 @@ export function useChat(sessionId: string): UseChatReturn {
     } catch (error) {
       console.error('保存失败:', error)
     }
-  }, [messages])
+  }, [messages, sessionId])
 
   // 切换消息点赞状态
   const toggleLike = useCallback(async (messageId: string) => {
@@ -837,6 +1091,7 @@ export function useChat(sessionId: string): UseChatReturn {
     setMessageContext,
     submitAudio,
     startRecording,
+    pauseRecording,
     stopRecording,
     cancelRecording,
     cancelGeneration,
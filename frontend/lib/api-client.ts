@@ -1,5 +1,5 @@
 import axios from 'axios'
-import { Project, ProjectCreate, Session, SessionCreate, Message, MessageListResponse, Asset, AssetCreate, AssetUpdate } from './types'
+import { Project, ProjectCreate, Session, SessionCreate, Message, MessageListResponse, Asset, AssetCreate, AssetUpdate, ResumeParseJob } from './types'
 import { getAuthToken } from '@/components/AuthProvider'
 
 // 使用空字符串作为 baseURL，让请求使用相对路径
@@ -70,7 +70,8 @@ export const projectsApi = {
     await apiClient.delete(`/api/projects/${id}`)
   },
 
-  uploadResume: async (id: string, file: File): Promise<Project> => {
+  // 上传简历，返回后台解析任务
+  uploadResume: async (id: string, file: File): Promise<ResumeParseJob> => {
     const formData = new FormData()
     formData.append('file', file)
     const response = await apiClient.post(
@@ -84,6 +85,32 @@ export const projectsApi = {
     )
     return response.data
   },
+
+  getResumeJob: async (id: string, jobId: string): Promise<ResumeParseJob> => {
+    const response = await apiClient.get(`/api/projects/${id}/resume-jobs/${jobId}`)
+    return response.data
+  },
+
+  // 轮询简历解析任务直到结束（超过 timeoutMs 仍未结束时放弃）
+  waitForResumeParse: async (
+    id: string,
+    job: ResumeParseJob,
+    intervalMs = 1000,
+    timeoutMs = 120000
+  ): Promise<ResumeParseJob> => {
+    const deadline = Date.now() + timeoutMs
+    while (job.status === 'pending' || job.status === 'running') {
+      if (Date.now() >= deadline) {
+        throw new Error('简历解析超时，请稍后重试')
+      }
+      await new Promise(resolve => setTimeout(resolve, intervalMs))
+      job = await projectsApi.getResumeJob(id, job.id)
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || '简历解析失败')
+    }
+    return job
+  },
 }
 
 // Sessions API
@@ -113,12 +140,13 @@ export const sessionsApi = {
 export const messagesApi = {
   list: async (
     sessionId: string,
-    options?: { limit?: number; offset?: number; order?: 'asc' | 'desc' }
+    options?: { limit?: number; before?: string; after?: string; order?: 'asc' | 'desc' }
   ): Promise<MessageListResponse> => {
     const params = {
       session_id: sessionId,
       limit: options?.limit || 20,
-      offset: options?.offset || 0,
+      before: options?.before,
+      after: options?.after,
       order: options?.order || 'desc'
     }
     const response = await apiClient.get('/api/messages', { params })
@@ -139,6 +167,15 @@ export const audioApi = {
     return response.data
   },
 
+  // 批量获取一页消息中所有音频的签名 URL
+  getUrls: async (audioFileIds: string[], expiresIn?: number): Promise<{ urls: Record<string, { url: string; expires_in: number }>; missing: string[] }> => {
+    const response = await apiClient.post('/api/audio/urls', {
+      audio_file_ids: audioFileIds,
+      ...(expiresIn ? { expires_in: expiresIn } : {})
+    })
+    return response.data
+  },
+
   triggerCleanup: async (batchSize?: number): Promise<{ deleted: number; failed: number; total_processed: number }> => {
     const params = batchSize ? { batch_size: batchSize } : {}
     const response = await apiClient.post('/api/audio/cleanup', null, { params })
@@ -179,7 +216,7 @@ export const assetsApi = {
   },
 
   // 确认保存（用于答案优化场景，用户确认后保存）
-  confirmSave: async (data: { question: string; transcript: string; project_id: string; message_id?: string }): Promise<{ asset_id: string }> => {
+  confirmSave: async (data: { question: string; transcript: string; project_id: string; session_id?: string; message_id?: string }): Promise<{ asset_id: string }> => {
     const response = await apiClient.post('/api/assets/confirm-save', data)
     return response.data
   },
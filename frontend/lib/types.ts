@@ -50,6 +50,19 @@ export interface Project {
   updated_at: string
 }
 
+// 简历解析任务
+export interface ResumeParseJob {
+  id: string
+  project_id: string
+  status: 'pending' | 'running' | 'succeeded' | 'failed'
+  page_count?: number
+  pages_parsed: number
+  cached: boolean
+  error?: string
+  created_at: string
+  updated_at: string
+}
+
 export interface Session {
   id: string
   project_id: string
@@ -76,10 +89,12 @@ export interface Message {
 // 分页消息列表响应
 export interface MessageListResponse {
   messages: Message[]
-  total: number
+  total?: number
   limit: number
   offset: number
   has_more: boolean
+  before_cursor?: string  // 加载更早消息的游标
+  after_cursor?: string   // 加载更新消息的游标
 }
 
 export interface ProjectCreate {
@@ -201,6 +216,15 @@ export interface ClientMessage {
   timestamp: string
 }
 
+// 录音直传 OSS 的上传目标
+export interface AudioUploadTarget {
+  url: string
+  key: string
+  method: 'PUT'
+  headers: Record<string, string>
+  expires_in: number  // 有效期（秒）
+}
+
 // 服务端返回的消息格式
 export interface ServerMessage {
   type: ServerMessageType
@@ -221,6 +245,11 @@ export interface ServerMessage {
     question: string
   }
 
+  // 录音直传 OSS 的签名 URL（recording_start 时下发）
+  upload?: AudioUploadTarget | null
+  // 是否边录边发送 PCM 帧实时识别（recording_start 时下发；error 中为 false 表示实时识别失败，需提交完整录音）
+  realtime_asr?: boolean
+
   // 转录相关
   transcription?: {
     text: string